@@ -0,0 +1,214 @@
+"""
+网页下载与正文提取模块
+流式下载网页，只接受HTML和纯文本，超过大小上限或不是网页时立即中止；
+从HTML中去掉导航、广告、脚本等，按段落文字密度找出正文所在的区域，只把正文交给分割和嵌入
+"""
+
+# 导入标准库
+import re  # 正则表达式模块，用于识别页面杂项和编码声明
+from typing import Dict, List  # 类型提示
+
+# 导入第三方库
+import httpx  # 异步HTTP客户端
+from bs4 import BeautifulSoup, Tag  # HTML解析库
+
+try:
+    import lxml  # noqa: F401  # C实现的HTML解析器，可选依赖，未安装时使用html.parser
+
+    _PARSER = "lxml"
+except ImportError:
+    _PARSER = "html.parser"
+
+# 接受的内容类型，其余（图片、PDF、压缩包等）直接中止下载
+_ACCEPTED_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+# 与正文无关的标签，解析后整体删除
+_NOISE_TAGS = (
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe",
+    "form", "button", "select", "nav", "header", "footer", "aside",
+)
+# class或id中以这些词为一段（前后是开头、结尾、连字符、下划线或空白）的元素视为导航、广告、评论等页面杂项；
+# 只匹配完整的一段，"unshared"、"download"、"thread"等包含这些字母的名称不会被误判
+_NOISE_PATTERN = re.compile(
+    r"(?:^|[-_\s])(?:nav|navbar|menu|footer|header|sidebar|comments?|advert|ads?|banner|share|"
+    r"breadcrumbs?|related|recommend|popup|modal|cookies?|login|copyright)(?:[-_\s]|$)",
+    re.IGNORECASE,
+)
+# 杂项元素的文字超过全页文字的这个比例时不删除，避免"has-sidebar"之类包住正文的容器连同正文一起被删掉
+_MAX_NOISE_SHARE = 0.5
+# 网页中的编码声明，响应头没有声明编码时使用
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+# 作为段落计分的标签
+_PARAGRAPH_TAGS = ("p", "li", "pre", "blockquote", "h1", "h2", "h3", "h4", "td")
+# 正文区域至少应包含的字符数，不足时退回到整页文本
+_MIN_MAIN_CHARS = 200
+
+
+class DownloadRejected(Exception):
+    """
+    下载被中止：内容类型不是网页，或大小超过上限
+    """
+
+
+def is_accepted(content_type: str | None) -> bool:
+    """
+    判断内容类型是否为网页或纯文本，未声明类型时视为网页
+
+    Args:
+        content_type (str | None): Content-Type响应头
+
+    Returns:
+        bool: 是否接受
+    """
+    if not content_type:
+        return True
+    return content_type.split(";")[0].strip().lower() in _ACCEPTED_TYPES
+
+
+async def read_limited(response: httpx.Response, max_bytes: int) -> bytes:
+    """
+    流式读取响应体，超过大小上限时立即中止，不再继续下载
+
+    Args:
+        response (httpx.Response): 以流式方式发起的请求的响应
+        max_bytes (int): 大小上限
+
+    Returns:
+        bytes: 响应体
+
+    Raises:
+        DownloadRejected: 内容类型不是网页，或大小超过上限
+    """
+    content_type = response.headers.get("Content-Type")
+    if not is_accepted(content_type):
+        raise DownloadRejected(f"内容类型 {content_type} 不是网页")
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise DownloadRejected(f"大小 {content_length} 字节超过上限 {max_bytes}")
+    chunks: List[bytes] = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        size += len(chunk)
+        if size > max_bytes:
+            raise DownloadRejected(f"大小超过上限 {max_bytes} 字节")
+        chunks.append(chunk)
+    content = b"".join(chunks)
+    # 没有声明类型的响应，开头出现空字节时视为二进制文件
+    if not content_type and b"\x00" in content[:1024]:
+        raise DownloadRejected("内容是二进制数据")
+    return content
+
+
+def decode_html(content: bytes, encoding: str | None) -> str:
+    """
+    把网页字节解码为文本，优先使用响应头声明的编码，其次使用网页中的meta声明，都没有时按UTF-8解码
+
+    Args:
+        content (bytes): 网页字节
+        encoding (str | None): 响应头声明的编码
+
+    Returns:
+        str: 网页文本
+    """
+    if not encoding:
+        match = _META_CHARSET.search(content[:4096])
+        encoding = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        return content.decode(encoding, errors="replace")
+    except LookupError:
+        return content.decode("utf-8", errors="replace")
+
+
+def _is_noise(tag: Tag) -> bool:
+    """
+    判断元素是否为导航、广告、评论等页面杂项
+
+    Args:
+        tag (Tag): 元素
+
+    Returns:
+        bool: 是否为杂项
+    """
+    if tag.attrs is None:
+        return False
+    names = " ".join(tag.get("class") or []) + " " + (tag.get("id") or "")
+    return bool(names.strip()) and bool(_NOISE_PATTERN.search(names))
+
+
+def _text_lines(tag: Tag) -> str:
+    """
+    提取元素中的文本，每行去掉首尾空白并丢弃空行
+
+    Args:
+        tag (Tag): 元素
+
+    Returns:
+        str: 按行排列的文本
+    """
+    lines = (line.strip() for line in tag.get_text("\n").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _link_density(tag: Tag) -> float:
+    """
+    计算元素中链接文字占全部文字的比例，导航和推荐列表的链接密度很高
+
+    Args:
+        tag (Tag): 元素
+
+    Returns:
+        float: 链接密度
+    """
+    text_len = len(tag.get_text(strip=True))
+    if text_len == 0:
+        return 1.0
+    link_len = sum(len(a.get_text(strip=True)) for a in tag.find_all("a"))
+    return link_len / text_len
+
+
+def extract_main_text(html: str) -> str:
+    """
+    提取网页正文：删除杂项后，每个段落按字数给父元素计分、给祖父元素计一半分，
+    得分乘以(1-链接密度)最高的元素视为正文区域；页面有article或main且足够长时直接使用
+
+    Args:
+        html (str): 网页内容
+
+    Returns:
+        str: 正文文本，找不到正文区域时返回整页文本
+    """
+    soup = BeautifulSoup(html, _PARSER)
+    for tag in soup(_NOISE_TAGS):
+        tag.decompose()
+    body = soup.body or soup
+    total_chars = len(body.get_text(strip=True))
+    for tag in soup.find_all(_is_noise):
+        # 外层杂项删除后，其中的杂项已随之删除
+        if tag.decomposed or tag.name in ("html", "body"):
+            continue
+        if len(tag.get_text(strip=True)) > total_chars * _MAX_NOISE_SHARE:
+            continue
+        tag.decompose()
+
+    for name in ("article", "main"):
+        tag = body.find(name)
+        if tag is not None:
+            text = _text_lines(tag)
+            if len(text) >= _MIN_MAIN_CHARS:
+                return text
+
+    scores: Dict[int, float] = {}  # 元素id -> 得分
+    candidates: Dict[int, Tag] = {}  # 元素id -> 元素
+    for paragraph in body.find_all(_PARAGRAPH_TAGS):
+        length = len(paragraph.get_text(strip=True))
+        if length < 20:
+            continue
+        for parent, weight in ((paragraph.parent, 1.0), (getattr(paragraph.parent, "parent", None), 0.5)):
+            if isinstance(parent, Tag):
+                scores[id(parent)] = scores.get(id(parent), 0.0) + length * weight
+                candidates[id(parent)] = parent
+    if scores:
+        best = max(candidates.values(), key=lambda tag: scores[id(tag)] * (1 - _link_density(tag)))
+        text = _text_lines(best)
+        if len(text) >= _MIN_MAIN_CHARS:
+            return text
+    return _text_lines(body)
@@ -0,0 +1,345 @@
+"""
+联网搜索的异步网页抓取模块
+在一个常驻的事件循环中用httpx异步客户端抓取搜索引擎结果页和结果网页，连接在各次搜索之间复用，
+同一主机的并发数受限，整次搜索有总的截止时间，所有结果网页并发下载，耗时约为一次网页加载时间。
+网页流式下载，不是网页或超过大小上限时立即中止。
+启用网页缓存时，有效期内的网页直接从磁盘读取，过期的网页用条件请求重新验证
+"""
+
+# 导入标准库
+import asyncio  # 异步IO模块，用于并发抓取
+import time  # 时间相关功能，用于记录缓存验证时间
+import threading  # 线程模块，用于运行常驻事件循环
+import concurrent.futures  # 并发模块，用于等待事件循环中的搜索结果
+from dataclasses import dataclass  # 数据类，用于描述抓取到的网页
+from typing import Dict, List, Tuple  # 类型提示
+from urllib.parse import quote_plus  # URL编码，用于构造搜索地址
+
+# 导入第三方库
+import httpx  # 异步HTTP客户端
+from bs4 import BeautifulSoup  # HTML解析库，用于解析搜索结果页
+
+# 导入项目模块
+from config.config import Config  # 配置管理器，用于读取配置信息
+from Internet.page_cache import INSTANCE as page_cache, CachedPage  # 网页磁盘缓存
+from Internet.extract import DownloadRejected, read_limited, decode_html  # 限制大小的流式下载和解码
+
+# 请求头，模拟浏览器访问；压缩格式由httpx协商
+_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Cache-Control": "max-age=0",
+    "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:22.0) Gecko/20100101 Firefox/22.0",
+}
+
+# 等待搜索结果时在截止时间之外额外等待的时间（秒），超过后取消搜索
+_RESULT_GRACE_SECONDS = 5
+
+# 搜索引擎：搜索地址模板、结果条目的标签和类名、标题标签
+_ENGINES = (
+    ("https://cn.bing.com/search?q={}", "li", "b_algo", "h2"),
+    ("https://www.bing.com/search?q={}", "li", "b_algo", "h2"),
+    ("https://www.baidu.com/s?wd={}", "div", "result", "h3"),
+)
+
+
+@dataclass
+class FetchedPage:
+    """
+    一个抓取到的结果网页
+    """
+
+    url: str  # 网页地址
+    title: str  # 搜索结果中的标题
+    html: str  # 网页内容
+
+
+class AsyncFetcher(object):
+    """
+    异步网页抓取类
+    事件循环运行在后台线程中，各请求线程通过run_coroutine_threadsafe提交抓取任务，共用一个连接池
+    """
+
+    def __init__(self):
+        """
+        从配置中读取抓取参数
+        """
+        self._settings = Config.get_instance().get_with_nested_params("Internet-search")
+        self._loop: asyncio.AbstractEventLoop | None = None  # 后台事件循环
+        self._client: httpx.AsyncClient | None = None  # 异步客户端，只在事件循环线程中创建和使用
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}  # 主机 -> 并发数限制
+        self._lock = threading.Lock()  # 保护事件循环的创建
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        获取后台事件循环，第一次调用时创建并启动
+
+        Returns:
+            asyncio.AbstractEventLoop: 事件循环
+        """
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="internet-fetcher", daemon=True
+                ).start()
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        获取异步客户端，保持长连接以便后续请求复用
+
+        Returns:
+            httpx.AsyncClient: 异步客户端
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=_HEADERS,
+                follow_redirects=True,
+                timeout=httpx.Timeout(float(self._settings["timeout-seconds"])),
+                limits=httpx.Limits(
+                    max_connections=int(self._settings["max-connections"]),
+                    max_keepalive_connections=int(self._settings["max-connections"]),
+                ),
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        """
+        获取网址所属主机的并发数限制
+
+        Args:
+            url (str): 网址
+
+        Returns:
+            asyncio.Semaphore: 该主机的信号量
+        """
+        host = httpx.URL(url).host
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(
+                int(self._settings["max-connections-per-host"])
+            )
+        return self._host_limits[host]
+
+    async def _get(self, url: str) -> str | None:
+        """
+        获取网址的内容：缓存有效时直接使用，过期时带条件请求重新验证，否则下载
+
+        Args:
+            url (str): 网址
+
+        Returns:
+            str | None: 网页内容，下载失败时返回None
+        """
+        cached = None
+        if page_cache is not None:
+            cached = await asyncio.to_thread(page_cache.get, url)
+            if cached is not None and cached.is_fresh(page_cache.ttl_seconds):
+                page_cache.record_hit()
+                return cached.html
+        try:
+            async with self._host_limit(url):
+                async with self._get_client().stream(
+                    "GET", url, headers=cached.validators() if cached is not None else None
+                ) as response:
+                    status_code = response.status_code
+                    headers = response.headers
+                    html = None
+                    if status_code == 200:
+                        # 边下载边检查，不是网页或超过大小上限时关闭连接，不再下载剩余内容
+                        content = await read_limited(
+                            response, int(self._settings["max-page-kb"]) * 1024
+                        )
+                        html = decode_html(content, response.charset_encoding)
+        except DownloadRejected as e:
+            print(f"Skipped {url}: {e}")
+            return None
+        except (httpx.HTTPError, httpx.InvalidURL, ValueError) as e:
+            print(f"Error downloading {url}: {e}")
+            # 网络失败时退回到过期的缓存
+            return cached.html if cached is not None else None
+        if status_code == 304 and cached is not None:
+            # 网页未变化，刷新验证时间后继续使用缓存
+            page_cache.record_hit(revalidated=True)
+            cached.fetched_at = time.time()
+            await asyncio.to_thread(page_cache.save, cached)
+            return cached.html
+        if status_code != 200:
+            print(f"Failed to download {url}: Status code {status_code}")
+            return None
+        if page_cache is not None and html:
+            # 网页已变化，之前提取的正文和分块向量一并作废
+            await asyncio.to_thread(
+                page_cache.save,
+                CachedPage(
+                    url,
+                    html,
+                    etag=headers.get("ETag"),
+                    last_modified=headers.get("Last-Modified"),
+                    fetched_at=time.time(),
+                ),
+            )
+        return html
+
+    async def _search_results(
+        self, query: str, engine: Tuple[str, str, str, str], num_results: int
+    ) -> List[Tuple[str, str]]:
+        """
+        获取一个搜索引擎的前若干条搜索结果
+
+        Args:
+            query (str): 搜索查询
+            engine (Tuple[str, str, str, str]): 搜索地址模板、结果条目的标签和类名、标题标签
+            num_results (int): 结果数
+
+        Returns:
+            List[Tuple[str, str]]: (标题, 链接)列表
+        """
+        url_template, item_tag, item_class, title_tag = engine
+        url = url_template.format(quote_plus(query))
+        try:
+            html = await self._get(url)
+        except Exception as e:
+            # 一个搜索引擎出错不影响其他搜索引擎的结果
+            print(f"Error searching {url}: {e}")
+            return []
+        if not html:
+            return []
+        soup = BeautifulSoup(html, "html.parser")
+        results = []
+        for item in soup.find_all(item_tag, class_=item_class):
+            title = item.find(title_tag)
+            anchor = item.find("a")
+            if title is None or anchor is None or not anchor.get("href"):
+                continue
+            results.append((title.text.strip(), anchor["href"].split("#")[0]))  # 删除 '#' 后的部分
+            if len(results) >= num_results:
+                break
+        return results
+
+    async def _fetch_page(self, title: str, link: str, pages: List[FetchedPage]):
+        """
+        下载一个结果网页，成功时加入结果列表
+
+        Args:
+            title (str): 标题
+            link (str): 链接
+            pages (List[FetchedPage]): 结果列表
+        """
+        try:
+            html = await self._get(link)
+        except Exception as e:
+            # 一个网页出错（如链接格式无效、缓存读写失败）不影响其他网页，取消则照常向上传递
+            print(f"Error downloading {link}: {e}")
+            return
+        if not html:
+            return
+        pages.append(FetchedPage(link, title, html))
+        print(f"Downloaded: {link}")
+
+    async def _search(self, queries: List[str], num_results: int, pages: List[FetchedPage]):
+        """
+        并发查询所有搜索引擎，再并发下载全部结果网页
+
+        Args:
+            queries (List[str]): 搜索查询
+            num_results (int): 每个搜索引擎取的结果数
+            pages (List[FetchedPage]): 结果列表，下载完成的网页随时加入，截止时间到达时已下载的网页仍然可用
+        """
+        # 某个任务意外出错时其余任务照常完成，出错的任务按没有结果处理
+        result_lists = await asyncio.gather(
+            *(
+                self._search_results(query, engine, num_results)
+                for query in queries
+                for engine in _ENGINES
+            ),
+            return_exceptions=True,
+        )
+        # 同一链接只下载一次
+        unique: Dict[str, str] = {}
+        for results in result_lists:
+            if isinstance(results, BaseException):
+                print(f"搜索失败: {results}")
+                continue
+            for title, link in results:
+                unique.setdefault(link, title)
+        if not unique:
+            print("访问搜索引擎失败，请检查网络代理")
+            return
+        await asyncio.gather(
+            *(self._fetch_page(title, link, pages) for link, title in unique.items()),
+            return_exceptions=True,
+        )
+
+    async def _search_with_deadline(self, queries: List[str], num_results: int) -> List[FetchedPage]:
+        """
+        在截止时间内搜索，超时后取消未完成的下载
+
+        Args:
+            queries (List[str]): 搜索查询
+            num_results (int): 每个搜索引擎取的结果数
+
+        Returns:
+            List[FetchedPage]: 截止时间前下载完成的网页
+        """
+        pages: List[FetchedPage] = []
+        try:
+            await asyncio.wait_for(
+                self._search(queries, num_results, pages),
+                timeout=float(self._settings["deadline-seconds"]),
+            )
+        except asyncio.TimeoutError:
+            print(f"联网搜索超过 {self._settings['deadline-seconds']} 秒，只使用已下载的 {len(pages)} 个网页")
+        return pages
+
+    def search(self, queries: List[str], num_results: int | None = None) -> List[FetchedPage]:
+        """
+        搜索并下载结果网页，可在任意线程中并发调用。
+        每次调用的网页只保存在本次调用自己的结果列表中，不写入共享目录，调用之间互不影响。
+        截止时间到达时未完成的下载会被取消，但取消是异步进行的：超过等待时间返回时，
+        事件循环中的任务可能仍在结束过程中，已交给线程执行的缓存读写也可能在返回后才完成
+
+        Args:
+            queries (List[str]): 搜索查询
+            num_results (int | None): 每个搜索引擎取的结果数，未传入时使用配置值
+
+        Returns:
+            List[FetchedPage]: 下载到的网页
+        """
+        if num_results is None:
+            num_results = int(self._settings["results-per-engine"])
+        queries = [query.strip() for query in queries if query.strip()]
+        future = asyncio.run_coroutine_threadsafe(
+            self._search_with_deadline(queries, num_results), self._ensure_loop()
+        )
+        try:
+            return future.result(
+                timeout=float(self._settings["deadline-seconds"]) + _RESULT_GRACE_SECONDS
+            )
+        except concurrent.futures.TimeoutError:
+            # 截止时间之后仍未结束（如缓存读写卡住），取消本次搜索
+            future.cancel()
+            print("联网搜索未能在截止时间内结束，已取消")
+        except Exception as e:
+            print(f"联网搜索失败: {e}")
+        return []
+
+    def pending_tasks(self) -> int:
+        """
+        统计事件循环中尚未结束的任务数，所有搜索都返回且取消完成后应为0
+
+        Returns:
+            int: 未结束的任务数，事件循环尚未启动时为0
+        """
+        if self._loop is None:
+            return 0
+
+        async def count() -> int:
+            current = asyncio.current_task()
+            return sum(1 for task in asyncio.all_tasks() if task is not current)
+
+        return asyncio.run_coroutine_threadsafe(count(), self._loop).result(timeout=5)
+
+
+# 创建AsyncFetcher类的单例实例
+INSTANCE = AsyncFetcher()
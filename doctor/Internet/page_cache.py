@@ -0,0 +1,240 @@
+"""
+联网搜索网页磁盘缓存模块
+按网址缓存抓取到的网页（包括搜索引擎结果页）及其正文和分块向量，有效期内直接使用本地数据；
+过期后带ETag/Last-Modified条件请求重新验证，网页未变化时只刷新时间；总大小超过上限时淘汰最久未使用的条目
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于文件和目录操作
+import time  # 时间相关功能，用于判断条目是否过期
+import pickle  # 序列化模块，用于保存缓存条目
+import hashlib  # 哈希模块，用于由网址生成文件名
+import threading  # 线程模块，用于保护缓存的并发访问
+from collections import OrderedDict  # 有序字典，用于实现LRU
+from dataclasses import dataclass, field  # 数据类，用于描述缓存条目
+from typing import Dict, List, Tuple  # 类型提示
+
+# 导入项目模块
+from config.config import Config  # 配置管理器，用于读取配置信息
+from env import get_app_root  # 获取应用根目录的函数
+
+
+@dataclass
+class CachedPage:
+    """
+    一个缓存的网页
+    """
+
+    url: str  # 网址
+    html: str  # 网页内容
+    etag: str | None = None  # 响应的ETag，用于条件请求
+    last_modified: str | None = None  # 响应的Last-Modified，用于条件请求
+    fetched_at: float = 0.0  # 最近一次下载或验证的时间
+    text: str | None = None  # 提取出的正文，尚未提取时为None
+    chunks: Dict[str, Tuple[List[str], List[List[float]]]] = field(default_factory=dict)  # 嵌入模型 -> (分块文本, 分块向量)
+
+    def is_fresh(self, ttl_seconds: float) -> bool:
+        """
+        判断条目是否仍在有效期内
+
+        Args:
+            ttl_seconds (float): 有效期（秒）
+
+        Returns:
+            bool: 是否无需重新验证即可使用
+        """
+        return time.time() - self.fetched_at <= ttl_seconds
+
+    def validators(self) -> Dict[str, str]:
+        """
+        生成条件请求的请求头
+
+        Returns:
+            Dict[str, str]: If-None-Match和If-Modified-Since请求头，响应中没有对应字段时为空
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache(object):
+    """
+    网页磁盘缓存类
+    每个网址一个文件，内存中只保存各条目的大小和使用顺序
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_bytes: int):
+        """
+        初始化网页缓存，扫描缓存目录中已有的条目
+
+        Args:
+            path (str): 缓存目录
+            ttl_seconds (float): 有效期（秒）
+            max_bytes (int): 缓存文件的总大小上限
+        """
+        self._path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self._max_bytes = int(max_bytes)
+        self._lock = threading.Lock()  # 保护使用顺序和总大小的锁
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()  # 键 -> 文件大小，越靠后越近使用
+        self._bytes = 0  # 缓存文件的总大小
+        self._hits = 0  # 有效期内命中次数
+        self._revalidated = 0  # 条件请求确认未变化的次数
+        os.makedirs(path, exist_ok=True)
+        # 按修改时间从旧到新加入，重启后仍大致保持使用顺序
+        entries = []
+        for name in os.listdir(path):
+            if ".pkl.tmp-" in name:
+                # 上次运行中断时未写完的临时文件
+                os.remove(os.path.join(path, name))
+            elif name.endswith(".pkl"):
+                stat = os.stat(os.path.join(path, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._bytes += size
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self._path, f"{key}.pkl")
+
+    def get(self, url: str) -> CachedPage | None:
+        """
+        读取缓存的网页，不判断是否过期
+
+        Args:
+            url (str): 网址
+
+        Returns:
+            CachedPage | None: 缓存的网页，不存在或读取失败时返回None
+        """
+        key = self._key(url)
+        with self._lock:
+            if key not in self._sizes:
+                return None
+            self._sizes.move_to_end(key)
+        try:
+            # 缓存文件由本程序自己写入，反序列化是安全的
+            with open(self._file(key), "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"读取网页缓存 {url} 失败: {e}")
+            self._remove(key)
+            return None
+
+    def save(self, page: CachedPage):
+        """
+        写入或覆盖网页，总大小超过上限时淘汰最久未使用的条目
+
+        Args:
+            page (CachedPage): 网页
+        """
+        key = self._key(page.url)
+        file_path = self._file(key)
+        tmp_path = f"{file_path}.tmp-{threading.get_ident()}"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(page, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, file_path)
+        except OSError as e:
+            print(f"写入网页缓存 {page.url} 失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        size = os.path.getsize(file_path)
+        with self._lock:
+            self._bytes += size - self._sizes.pop(key, 0)
+            self._sizes[key] = size
+            victims = []
+            while self._bytes > self._max_bytes and len(self._sizes) > 1:
+                victim, victim_size = self._sizes.popitem(last=False)
+                self._bytes -= victim_size
+                victims.append(victim)
+        for victim in victims:
+            try:
+                os.remove(self._file(victim))
+            except OSError:
+                pass
+
+    def _remove(self, key: str):
+        """
+        删除条目
+
+        Args:
+            key (str): 键
+        """
+        with self._lock:
+            self._bytes -= self._sizes.pop(key, 0)
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def temp_files(self) -> List[str]:
+        """
+        列出缓存目录中尚未改名的临时文件，没有正在进行的写入时应为空
+
+        Returns:
+            List[str]: 临时文件路径
+        """
+        return [
+            os.path.join(self._path, name)
+            for name in os.listdir(self._path)
+            if ".pkl.tmp-" in name
+        ]
+
+    def record_hit(self, revalidated: bool = False):
+        """
+        记录一次命中
+
+        Args:
+            revalidated (bool): 是否经条件请求确认未变化
+        """
+        with self._lock:
+            if revalidated:
+                self._revalidated += 1
+            else:
+                self._hits += 1
+
+    def stats(self) -> Dict[str, float]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict[str, float]: 条目数、总大小、上限、命中次数和确认未变化次数
+        """
+        with self._lock:
+            return {
+                "entries": len(self._sizes),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "revalidated": self._revalidated,
+            }
+
+
+def create_page_cache() -> PageCache | None:
+    """
+    按配置创建网页缓存
+
+    Returns:
+        PageCache | None: 网页缓存，未启用时返回None
+    """
+    settings = Config.get_instance().get_with_nested_params("Internet-page-cache")
+    if not settings["enabled"]:
+        return None
+    return PageCache(
+        os.path.join(get_app_root(), settings["path"]),
+        settings["ttl-seconds"],
+        int(settings["max-mb"]) * 1024 * 1024,
+    )
+
+
+# 创建网页缓存的单例实例，未启用时为None
+INSTANCE = create_page_cache()
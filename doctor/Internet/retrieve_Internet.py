@@ -2,12 +2,13 @@
 from typing import List,Tuple
 from langchain_core.documents import Document
 from model.Internet.Internet_service import retrieve
+from Internet.fetcher import FetchedPage
 
 def format_docs(docs:List[Document]):
     return "\n-------------分割线--------------\n".join(doc.page_content for doc in docs)
 
-def retrieve_html(question:str)->Tuple[List[Document],str]:
-    docs = retrieve(question) # 这里的到的是文件
+def retrieve_html(question:str, pages:List[FetchedPage])->Tuple[List[Document],str]:
+    docs = retrieve(question, pages) # 在本次下载的网页中检索
     _context = format_docs(docs) # 这里处理成文本
     print(_context)
     return (docs,_context)
\ No newline at end of file
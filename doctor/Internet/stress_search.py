@@ -0,0 +1,124 @@
+"""
+联网搜索并发压测脚本
+同时发起N个不同主题的搜索，每个搜索下载网页并在自己的请求级向量库中检索，统计耗时；
+全部搜索返回后检查共享状态没有残留：抓取事件循环中没有未结束的任务，网页缓存目录中没有未改名的临时文件，
+旧版本使用的共享下载目录 data/cache/internet 中没有新写入的文件
+在doctor目录下运行：python -m Internet.stress_search -n 8
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于检查共享目录
+import argparse  # 命令行参数解析
+import time  # 时间相关功能，用于统计耗时
+from concurrent.futures import ThreadPoolExecutor  # 线程池，用于并发发起搜索
+from typing import Dict, Any, List  # 类型提示
+
+# 导入项目模块
+from env import get_app_root  # 获取应用根目录的函数
+from Internet.fetcher import INSTANCE as fetcher  # 异步网页抓取器
+from Internet.page_cache import INSTANCE as page_cache  # 网页磁盘缓存
+from model.Internet.Internet_model import get_instance as get_internet_model  # 联网搜索检索模型
+
+# 旧版本各请求共用的网页下载目录，现在不应再有文件写入
+_LEGACY_DIR = os.path.join(get_app_root(), "data/cache/internet")
+# 全部搜索返回后等待取消和缓存写入结束的最长时间（秒）
+_SETTLE_SECONDS = 10
+
+# 默认的搜索主题，数量不足时循环使用
+_DEFAULT_QUERIES = [
+    "高血压患者饮食注意事项",
+    "二甲双胍的不良反应",
+    "儿童发热如何物理降温",
+    "失眠的非药物治疗方法",
+    "缺铁性贫血的症状",
+    "胃食管反流病的生活方式调整",
+    "痛风急性发作的处理",
+    "甲状腺结节需要手术吗",
+]
+
+
+def run_one(index: int, query: str) -> Dict[str, Any]:
+    """
+    执行一次完整的搜索和检索
+
+    Args:
+        index (int): 搜索编号
+        query (str): 搜索主题
+
+    Returns:
+        Dict[str, Any]: 编号、主题、网页数、检索结果数和各阶段耗时
+    """
+    start = time.perf_counter()
+    pages = fetcher.search([query])
+    fetch_seconds = time.perf_counter() - start
+    docs = get_internet_model().retrieve(pages, query)
+    return {
+        "index": index,
+        "query": query,
+        "pages": len(pages),
+        "docs": len(docs),
+        "fetch_seconds": round(fetch_seconds, 2),
+        "total_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def legacy_files() -> List[str]:
+    """
+    列出旧版本共享下载目录中的文件
+
+    Returns:
+        List[str]: 文件路径，目录不存在时为空
+    """
+    if not os.path.isdir(_LEGACY_DIR):
+        return []
+    return [
+        os.path.join(root, name) for root, _, files in os.walk(_LEGACY_DIR) for name in files
+    ]
+
+
+def leftovers() -> Dict[str, Any]:
+    """
+    检查共享状态中的残留，等待最多_SETTLE_SECONDS秒让取消和缓存写入结束
+
+    Returns:
+        Dict[str, Any]: 未结束的任务数和缓存目录中的临时文件
+    """
+    deadline = time.time() + _SETTLE_SECONDS
+    while True:
+        tasks = fetcher.pending_tasks()
+        temp_files = page_cache.temp_files() if page_cache is not None else []
+        if (not tasks and not temp_files) or time.time() >= deadline:
+            return {"pending_tasks": tasks, "temp_files": temp_files}
+        time.sleep(0.5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发联网搜索压测，检查请求结束后没有遗留的任务和文件")
+    parser.add_argument("-n", type=int, default=8, help="同时进行的搜索数")
+    parser.add_argument("--queries", nargs="+", help="搜索主题，默认使用内置的医学主题")
+    args = parser.parse_args()
+
+    queries = args.queries or _DEFAULT_QUERIES
+    legacy_before = set(legacy_files())
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.n) as executor:
+        results = list(
+            executor.map(run_one, range(args.n), (queries[i % len(queries)] for i in range(args.n)))
+        )
+    elapsed = time.perf_counter() - start
+    for row in results:
+        print(row)
+
+    state = leftovers()
+    legacy_new = sorted(set(legacy_files()) - legacy_before)
+    print(
+        f"{args.n} 个并发搜索共耗时 {elapsed:.2f} 秒，下载网页 {sum(row['pages'] for row in results)} 个；"
+        f"未结束的任务 {state['pending_tasks']} 个，缓存临时文件 {len(state['temp_files'])} 个，"
+        f"共享下载目录新文件 {len(legacy_new)} 个"
+    )
+    for file_path in state["temp_files"] + legacy_new:
+        print(f"  残留: {file_path}")
+    if page_cache is not None:
+        print(f"网页缓存: {page_cache.stats()}")
+    if state["pending_tasks"] or state["temp_files"] or legacy_new:
+        raise SystemExit("搜索结束后仍有残留的任务或文件")
@@ -25,6 +25,8 @@ from question_answer.answer import get_answer  # 获取答案的函数
 from question_answer.question_parser import parse_question  # 解析问题类型的函数
 from question_answer.function_tool import process_image_describe_tool  # 图片描述工具
 from question_answer.purpose_type import userPurposeType  # 用户问题类型枚举
+from model.RAG.kb_watcher import start_watcher  # 知识库目录监视器
+from model.rerank.rerank_service import warm_up as warm_up_rerank  # 在后台预先加载重排序模型
 
 # 导入音频相关模块
 from audio.audio_generate import audio_generate  # 音频生成函数
@@ -654,6 +656,8 @@ def start_gradio():
     """
     启动Gradio应用
     """
+    start_watcher()  # 监视知识库目录，文件变化后自动增量更新索引
+    warm_up_rerank()  # 在后台加载重排序模型，加载完成前按原检索顺序回答
     demo.launch(server_port=10086, share=True)  # 启动应用并分享
 
 
@@ -1,30 +1,31 @@
 '''联网搜索的RAG检索模型类'''
 # 导入标准库
+import os  # 操作系统接口模块，用于拼接嵌入模型路径
+import threading  # 线程模块，用于保护单例的创建
 from model.model_base import Modelbase  # 基础模型类，提供模型的基本功能
 from model.model_base import ModelStatus  # 模型状态枚举，定义模型的不同状态
 
-import os  # 操作系统接口模块，用于文件和目录操作
-from env import get_app_root  # 获取应用根目录的函数
+from typing import List  # 类型提示
 
 # 导入第三方库
-from langchain_community.embeddings import ModelScopeEmbeddings  # ModelScope嵌入模型，用于文本向量化
-from langchain_core.vectorstores import VectorStoreRetriever  # 向量存储检索器基类
-from langchain_community.document_loaders import DirectoryLoader, MHTMLLoader, UnstructuredHTMLLoader  # 文档加载器
+from langchain_core.documents import Document  # 文档类
 from langchain_text_splitters import RecursiveCharacterTextSplitter  # 递归字符文本分割器，用于分割文档
 from langchain_community.vectorstores.faiss import FAISS  # FAISS向量存储，用于高效相似性搜索
 
 # 导入项目模块
 from config.config import Config  # 配置管理器，用于读取配置信息
+from model.embedding.embedding_model import get_embedding, embedding_backend_key  # 批量嵌入模型和推理后端标识
+from Internet.fetcher import FetchedPage  # 抓取到的结果网页
+from Internet.page_cache import INSTANCE as page_cache  # 网页磁盘缓存，保存提取的正文和分块向量
+from Internet.extract import extract_main_text  # 网页正文提取
+
 
 # 检索模型
 class InternetModel(Modelbase):
     """
     联网搜索的RAG检索模型类
-    用于处理从互联网搜索获取的HTML和MHTML文档，构建向量库以支持检索增强生成
+    每次搜索下载的网页在内存中提取正文、分割和嵌入，建立只属于本次请求的小型向量库，不经过磁盘文件
     """
-    
-    # 声明_retriever属性，类型为VectorStoreRetriever
-    _retriever: VectorStoreRetriever
 
     def __init__(self,*args,**krgs):
         """
@@ -34,58 +35,126 @@ class InternetModel(Modelbase):
         super().__init__(*args,**krgs)
 
         # 此处请自行改成下载embedding模型的位置
-        # 从配置中获取嵌入模型的路径
-        self._embedding_model_path =Config.get_instance().get_with_nested_params("model", "embedding", "model-name")
-        # 设置文本分割器为递归字符分割器
-        self._text_splitter = RecursiveCharacterTextSplitter
+        # 从配置中获取嵌入模型的路径，与知识库检索模型使用同一路径，从而共用同一个嵌入模型实例
+        self._embedding_model_path = os.path.join(
+            Config.get_instance().get_with_nested_params("model", "embedding", "model-path"),
+            Config.get_instance().get_with_nested_params("model", "embedding", "model-name"),
+        )
         #self._embedding = OpenAIEmbeddings()
-        # 设置嵌入模型为ModelScope嵌入模型
-        self._embedding = ModelScopeEmbeddings(model_id=self._embedding_model_path)
-        # 构建数据路径，指向应用根目录下的data/cache/internet文件夹
-        self._data_path = os.path.join(get_app_root(), "data/cache/internet")
-        
+        # 设置嵌入模型为ModelScope嵌入模型，按配置的批量大小和线程数分批嵌入
+        self._embedding = get_embedding(self._embedding_model_path)
+        # 网页缓存中分块向量的键，嵌入模型或推理后端变化后缓存的向量不再使用
+        self._embedding_key = "{}@{}#{}".format(
+            self._embedding_model_path,
+            Config.get_instance().get_with_nested_params("model", "embedding", "model-version"),
+            embedding_backend_key(),
+        )
+        # 创建一个 RecursiveCharacterTextSplitter 对象，用于将文档分割成块，chunk_size为最大块大小，chunk_overlap块之间可以重叠的大小
+        self._text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
+        # 模型本身不保存任何请求的数据，可被并发请求共用
+        self._model_status = ModelStatus.READY
+
         #self._logger: Logger = Logger("rag_retriever")
 
-    # 建立向量库
-    def build(self):
+    def _page_chunks(self, page: FetchedPage) -> tuple:
         """
-        建立向量库，加载HTML和MHTML文档并构建向量存储
+        获取网页的正文、分块文本和分块向量，网页缓存中有提取结果或本嵌入模型的向量时直接使用
+
+        Args:
+            page (FetchedPage): 网页
+
+        Returns:
+            tuple: (正文, 分块文本列表, 分块向量列表)，尚未嵌入时向量列表为None
         """
-        # 加载html文件
-        html_loader = DirectoryLoader(self._data_path, glob="**/*.html", loader_cls=UnstructuredHTMLLoader, silent_errors=True, use_multithreading=True)
-        html_docs = html_loader.load()
-        
-        # 加载mhtml文件
-        mhtml_loader = DirectoryLoader(self._data_path, glob="**/*.mhtml", loader_cls=MHTMLLoader, silent_errors=True, use_multithreading=True)
-        mhtml_docs = mhtml_loader.load()
-        
-        
-        #合并文档
-        docs =  html_docs + mhtml_docs
-        
-        # 创建一个 RecursiveCharacterTextSplitter 对象，用于将文档分割成块，chunk_size为最大块大小，chunk_overlap块之间可以重叠的大小
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
-        splits = text_splitter.split_documents(docs)
-        
-        # 使用 FAISS 创建一个向量数据库，存储分割后的文档及其嵌入向量
-        vectorstore = FAISS.from_documents(documents=splits, embedding=self._embedding)
-        # 将向量存储转换为检索器，设置检索参数 k 为 6，即返回最相似的 6 个文档
-        self._retriever = vectorstore.as_retriever(search_kwargs={"k": 6})
-        
-
-        
-    @property
-    def retriever(self)-> VectorStoreRetriever:
+        cached = page_cache.get(page.url) if page_cache is not None else None
+        if cached is not None and cached.html == page.html and cached.text is not None:
+            if self._embedding_key in cached.chunks:
+                return (cached.text, *cached.chunks[self._embedding_key])
+            return cached.text, self._text_splitter.split_text(cached.text), None
+        # 只提取正文，导航、广告和脚本不参与分割和嵌入
+        text = extract_main_text(page.html)
+        return text, self._text_splitter.split_text(text), None
+
+    def _remember(self, page: FetchedPage, text: str, text_chunks: List[str], vectors: List[List[float]]):
+        """
+        把网页的正文、分块文本和分块向量写入网页缓存，相同网页再次被搜到时无需重新提取和嵌入
+
+        Args:
+            page (FetchedPage): 网页
+            text (str): 正文
+            text_chunks (List[str]): 分块文本
+            vectors (List[List[float]]): 分块向量
+        """
+        if page_cache is None:
+            return
+        cached = page_cache.get(page.url)
+        if cached is None or cached.html != page.html:
+            return
+        cached.text = text
+        cached.chunks[self._embedding_key] = (text_chunks, vectors)
+        page_cache.save(cached)
+
+    def build(self, pages: List[FetchedPage]) -> FAISS | None:
+        """
+        为本次搜索下载的网页建立向量库，所有待嵌入的分块一次性分批嵌入
+
+        Args:
+            pages (List[FetchedPage]): 网页
+
+        Returns:
+            FAISS | None: 只属于本次请求的向量库，没有可用文本时返回None
         """
-        获取检索器属性，每次访问时都会重新构建向量库
-        
+        page_chunks = [(page, *self._page_chunks(page)) for page in pages]
+        # 收集缓存中没有向量的分块，一次嵌入
+        pending = [
+            chunk for _, _, chunks, vectors in page_chunks if vectors is None for chunk in chunks
+        ]
+        new_vectors = iter(self._embedding.embed_documents(pending) if pending else [])
+
+        text_embeddings = []
+        metadatas = []
+        for page, text, chunks, vectors in page_chunks:
+            if vectors is None:
+                vectors = [next(new_vectors) for _ in chunks]
+                if chunks:
+                    self._remember(page, text, chunks, vectors)
+            text_embeddings.extend(zip(chunks, vectors))
+            metadatas.extend({"source": page.url, "title": page.title} for _ in chunks)
+        if not text_embeddings:
+            return None
+        return FAISS.from_embeddings(text_embeddings, self._embedding, metadatas=metadatas)
+
+    def retrieve(self, pages: List[FetchedPage], query: str, k: int = 6) -> List[Document]:
+        """
+        在本次搜索下载的网页中检索与查询最相关的分块
+
+        Args:
+            pages (List[FetchedPage]): 网页
+            query (str): 查询文本
+            k (int): 返回结果数
+
         Returns:
-            VectorStoreRetriever: 向量存储检索器
+            List[Document]: 检索到的文档
         """
-        # 每次获取retriever时都重新构建向量库
-        self.build()
-        # 返回检索器
-        return self._retriever
+        vectorstore = self.build(pages)
+        if vectorstore is None:
+            return []
+        # 返回最相似的 k 个文档，向量库随本次请求结束而释放
+        return vectorstore.similarity_search(query, k=k)
+
+_instance = None  # InternetModel类的单例实例，第一次使用时才创建
+_instance_lock = threading.Lock()  # 保护单例的创建
+
 
-# 创建InternetModel类的单例实例
-INSTANCE = InternetModel()
\ No newline at end of file
+def get_instance() -> InternetModel:
+    """
+    获取联网搜索检索模型的单例实例，第一次调用时才加载嵌入模型，导入本模块不会创建实例
+
+    Returns:
+        InternetModel: 联网搜索检索模型
+    """
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = InternetModel()
+        return _instance
@@ -1,7 +1,8 @@
 # 该函数用于对外界提供retreive服务，调用的是Internet_model 中的接口
 from typing import List
-from model.Internet.Internet_model import INSTANCE
+from model.Internet.Internet_model import get_instance
 from langchain_core.documents import Document
+from Internet.fetcher import FetchedPage
 
-def retrieve(query:str) ->List[Document]:
-    return INSTANCE.retriever.invoke(query)
\ No newline at end of file
+def retrieve(query:str, pages:List[FetchedPage]) ->List[Document]:
+    return get_instance().retrieve(pages, query)
@@ -0,0 +1,149 @@
+"""
+BM25关键词索引模块
+面向中文医学文本的倒排索引，药名、编码（如ICD编码）和罕见病名等稀有词在向量检索中容易漏召回，由关键词检索补充
+"""
+
+# 导入标准库
+import re  # 正则表达式模块，用于切分中英文
+import math  # 数学函数，用于计算IDF
+import heapq  # 堆模块，用于取得分最高的结果
+from typing import Dict, Iterable, List, Set, Tuple  # 类型提示
+
+# 导入第三方库
+import jieba  # 中文分词库
+
+jieba.setLogLevel(60)
+
+# 英文单词、数字和编码（如 E11.9、HbA1c、COVID-19），整体作为一个词
+_ASCII_TOKEN = re.compile(r"[A-Za-z0-9][A-Za-z0-9.\-_]*[A-Za-z0-9]|[A-Za-z0-9]")
+# 连续的中文字符
+_CJK_RUN = re.compile(r"[一-鿿]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    中文感知分词：英文和编码整体保留并转小写，中文用jieba搜索引擎模式切分
+
+    Args:
+        text (str): 原始文本
+
+    Returns:
+        List[str]: 词列表
+    """
+    tokens = [token.lower() for token in _ASCII_TOKEN.findall(text)]
+    for run in _CJK_RUN.findall(text):
+        tokens.extend(word for word in jieba.lcut_for_search(run) if word.strip())
+    return tokens
+
+
+class BM25Index(object):
+    """
+    BM25倒排索引类
+    以向量库中的文档ID为键，与FAISS向量库同步增删
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        初始化BM25索引
+
+        Args:
+            k1 (float): 词频饱和参数
+            b (float): 文档长度归一化参数
+        """
+        self._k1 = k1
+        self._b = b
+        self._postings: Dict[str, Dict[str, int]] = {}  # 词 -> {文档ID: 词频}
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}  # 文档ID -> 文档中出现的词，用于删除
+        self._doc_len: Dict[str, int] = {}  # 文档ID -> 文档长度（词数）
+        self._total_len = 0  # 所有文档的总长度
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        """
+        加入文档
+
+        Args:
+            ids (Iterable[str]): 文档ID
+            texts (Iterable[str]): 与ID一一对应的文本
+        """
+        for doc_id, text in zip(ids, texts):
+            if doc_id in self._doc_len:
+                self.delete([doc_id])
+            counts: Dict[str, int] = {}
+            tokens = tokenize(text)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                self._postings.setdefault(token, {})[doc_id] = count
+            self._doc_terms[doc_id] = tuple(counts)
+            self._doc_len[doc_id] = len(tokens)
+            self._total_len += len(tokens)
+
+    def delete(self, ids: Iterable[str]):
+        """
+        删除文档，不存在的ID会被忽略
+
+        Args:
+            ids (Iterable[str]): 文档ID
+        """
+        for doc_id in ids:
+            if doc_id not in self._doc_len:
+                continue
+            for token in self._doc_terms.pop(doc_id):
+                posting = self._postings.get(token)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self._postings[token]
+            self._total_len -= self._doc_len.pop(doc_id)
+
+    def search(
+        self, query: str, k: int, allowed: Set[str] | None = None
+    ) -> List[Tuple[str, float]]:
+        """
+        检索与查询最相关的文档
+
+        Args:
+            query (str): 查询文本
+            k (int): 返回结果数
+            allowed (Set[str] | None): 只在这些文档ID中检索，为None时检索全部文档
+
+        Returns:
+            List[Tuple[str, float]]: (文档ID, BM25得分)列表，按得分从高到低排列
+        """
+        n_docs = len(self._doc_len)
+        if n_docs == 0:
+            return []
+        avg_len = self._total_len / n_docs
+        scores: Dict[str, float] = {}
+        for token in set(tokenize(query)):
+            posting = self._postings.get(token)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self._k1 * (1 - self._b + self._b * self._doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self._k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[str]:
+    """
+    倒数排名融合（RRF）：文档得分为其在各路排名中 1/(k+名次) 之和
+
+    Args:
+        rankings (Iterable[List[str]]): 各路检索的文档ID排名
+        k (int): 平滑常数，越大越弱化头部名次的优势
+
+    Returns:
+        List[str]: 融合后的文档ID排名
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
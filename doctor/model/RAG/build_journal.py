@@ -0,0 +1,115 @@
+"""
+知识库构建日志模块
+构建过程中的每一步（删除文件的向量、加入一批已嵌入的分块）依次追加为日志中的一个记录文件，
+每个记录只写入一次，检查点的写入量与本次构建处理的分块数成正比，与知识库总大小无关；
+构建中断后在上次完整的索引上按顺序重放日志即可继续，无需重新解析和嵌入已处理的文件
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于文件和目录操作
+import json  # JSON处理，用于读写日志头
+import pickle  # 序列化模块，用于保存日志记录
+import shutil  # 高级文件操作模块，用于删除日志目录
+from typing import Any, Dict, Iterator, Tuple  # 类型提示
+
+# 日志头文件名，记录日志所基于的索引版本和构建配置
+_HEADER_FILE = "header.json"
+# 记录文件的后缀
+_RECORD_SUFFIX = ".pkl"
+
+
+class BuildJournal(object):
+    """
+    知识库构建日志类
+    日志头说明日志所基于的索引，记录按编号顺序保存，只追加不修改
+    """
+
+    def __init__(self, path: str):
+        """
+        初始化构建日志
+
+        Args:
+            path (str): 日志目录
+        """
+        self._path = path
+        self._count = 0  # 已写入的记录数，新记录的编号
+
+    def header(self) -> Dict[str, Any] | None:
+        """
+        读取日志头
+
+        Returns:
+            Dict[str, Any] | None: 日志头，日志不存在或已损坏时返回None
+        """
+        header_file = os.path.join(self._path, _HEADER_FILE)
+        if not os.path.exists(header_file):
+            return None
+        try:
+            with open(header_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取构建日志 {header_file} 失败: {e}")
+            return None
+
+    def start(self, header: Dict[str, Any]):
+        """
+        丢弃已有的日志，开始一份新的日志
+
+        Args:
+            header (Dict[str, Any]): 日志头，说明日志所基于的索引版本和构建配置
+        """
+        self.clear()
+        os.makedirs(self._path, exist_ok=True)
+        self._write(_HEADER_FILE, lambda f: f.write(json.dumps(header, ensure_ascii=False).encode("utf-8")))
+        self._count = 0
+
+    def records(self) -> Iterator[Tuple[str, Any]]:
+        """
+        按写入顺序读取全部记录，读取后新记录接着已有记录编号
+
+        Yields:
+            Tuple[str, Any]: (记录类型, 记录内容)
+        """
+        names = sorted(
+            name for name in os.listdir(self._path) if name.endswith(_RECORD_SUFFIX)
+        )
+        for name in names:
+            # 日志由本程序自己写入，反序列化是安全的
+            with open(os.path.join(self._path, name), "rb") as f:
+                yield pickle.load(f)
+        self._count = len(names)
+
+    def append(self, kind: str, payload: Any):
+        """
+        追加一个记录，写完后才出现在日志中，中途失败不会留下不完整的记录
+
+        Args:
+            kind (str): 记录类型
+            payload (Any): 记录内容
+        """
+        self._write(
+            f"{self._count:08d}{_RECORD_SUFFIX}",
+            lambda f: pickle.dump((kind, payload), f, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+        self._count += 1
+
+    def clear(self):
+        """
+        删除日志，构建完成并保存完整的索引后调用
+        """
+        shutil.rmtree(self._path, ignore_errors=True)
+        self._count = 0
+
+    def _write(self, name: str, write):
+        """
+        先写入临时文件再改名，保证日志中的文件都是完整的
+
+        Args:
+            name (str): 文件名
+            write (Callable): 向打开的二进制文件写入内容的函数
+        """
+        file_path = os.path.join(self._path, name)
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, file_path)
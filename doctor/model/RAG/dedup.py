@@ -0,0 +1,170 @@
+"""
+近重复分块去重模块
+分割之后、嵌入之前用SimHash找出与已入库分块几乎相同的分块（同一指南的不同版本、重复的页眉页脚等）并丢弃，
+减少嵌入耗时和索引内存，也避免检索结果的前几名被同样的内容占满
+"""
+
+# 导入标准库
+import hashlib  # 哈希模块，用于计算稳定的64位词元哈希
+from typing import Dict, Iterable, List, Set, Tuple  # 类型提示
+
+# 导入第三方库
+import numpy as np  # 数值计算库，用于批量计算SimHash
+
+# 导入项目模块
+from model.embedding.embedding_cache import normalize_text  # 规范化文本
+
+# SimHash位数
+_BITS = 64
+_BIT_SHIFTS = np.arange(_BITS, dtype=np.uint64)
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    计算文本的64位SimHash，以去掉空白后的连续字符片段为特征，对中文无需分词
+
+    Args:
+        text (str): 文本
+        shingle_size (int): 字符片段长度
+
+    Returns:
+        int: SimHash指纹
+    """
+    chars = "".join(normalize_text(text).split())
+    shingles = {chars[i : i + shingle_size] for i in range(max(1, len(chars) - shingle_size + 1))}
+    hashes = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+            for s in shingles
+        ),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    # 每一位上取值为1的特征多于一半时，指纹的该位为1
+    ones = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).sum(axis=0)
+    bits = ones * 2 > len(hashes)
+    return int(sum(1 << i for i in np.flatnonzero(bits)))
+
+
+class SimHashIndex(object):
+    """
+    SimHash近重复索引类
+    把指纹切成(最大汉明距离+1)段，两个指纹的距离不超过最大距离时至少有一段完全相同，只需比较同段相同的候选
+    """
+
+    def __init__(self, max_distance: int = 3, shingle_size: int = 3, min_chars: int = 50):
+        """
+        初始化近重复索引
+
+        Args:
+            max_distance (int): 视为近重复的最大汉明距离
+            shingle_size (int): 字符片段长度
+            min_chars (int): 短于该长度的分块不参与去重，短文本的SimHash不可靠
+        """
+        self.max_distance = int(max_distance)
+        self.shingle_size = int(shingle_size)
+        self.min_chars = int(min_chars)
+        self._band_bits = _BITS // (self.max_distance + 1)  # 每段的位数
+        self._fingerprints: Dict[str, int] = {}  # 分块ID -> 指纹
+        self._bands: Dict[Tuple[int, int], Set[str]] = {}  # (段号, 段值) -> 分块ID
+        self._dependents: Dict[str, Set[str]] = {}  # 保留的分块ID -> 因与其重复而丢弃了分块的文件
+
+    def settings(self) -> Tuple[int, int, int]:
+        """
+        获取去重参数，参数变化后需要重新建立索引
+
+        Returns:
+            Tuple[int, int, int]: 最大汉明距离、字符片段长度和最短字符数
+        """
+        return (self.max_distance, self.shingle_size, self.min_chars)
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        mask = (1 << self._band_bits) - 1
+        return [
+            (band, (fingerprint >> (band * self._band_bits)) & mask)
+            for band in range(self.max_distance + 1)
+        ]
+
+    def _find(self, fingerprint: int) -> str | None:
+        """
+        查找与指纹近重复的已入库分块
+
+        Args:
+            fingerprint (int): 指纹
+
+        Returns:
+            str | None: 近重复分块的ID，没有时返回None
+        """
+        for key in self._band_keys(fingerprint):
+            for doc_id in self._bands.get(key, ()):
+                if bin(self._fingerprints[doc_id] ^ fingerprint).count("1") <= self.max_distance:
+                    return doc_id
+        return None
+
+    def _add(self, doc_id: str, fingerprint: int):
+        self._fingerprints[doc_id] = fingerprint
+        for key in self._band_keys(fingerprint):
+            self._bands.setdefault(key, set()).add(doc_id)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        """
+        不经去重直接加入分块，用于根据已有文档库重新建立索引
+
+        Args:
+            ids (Iterable[str]): 分块ID
+            texts (Iterable[str]): 与ID一一对应的文本
+        """
+        for doc_id, text in zip(ids, texts):
+            if len(text) >= self.min_chars:
+                self._add(doc_id, simhash(text, self.shingle_size))
+
+    def filter(self, ids: List[str], texts: List[str], rel_path: str) -> List[bool]:
+        """
+        判断一个文件的分块是否保留，保留的分块加入索引；同一文件内部的重复分块也会被丢弃
+
+        Args:
+            ids (List[str]): 分块ID
+            texts (List[str]): 与ID一一对应的文本
+            rel_path (str): 分块所属文件的相对路径，记录下来以便被依赖的分块删除后重新处理该文件
+
+        Returns:
+            List[bool]: 每个分块是否保留
+        """
+        keep = []
+        for doc_id, text in zip(ids, texts):
+            if len(text) < self.min_chars:
+                keep.append(True)
+                continue
+            fingerprint = simhash(text, self.shingle_size)
+            duplicate = self._find(fingerprint)
+            if duplicate is None:
+                self._add(doc_id, fingerprint)
+                keep.append(True)
+            else:
+                self._dependents.setdefault(duplicate, set()).add(rel_path)
+                keep.append(False)
+        return keep
+
+    def delete(self, ids: Iterable[str]) -> Set[str]:
+        """
+        删除分块
+
+        Args:
+            ids (Iterable[str]): 分块ID
+
+        Returns:
+            Set[str]: 曾因与被删除分块重复而丢弃了分块的文件，这些文件需要重新处理
+        """
+        dependents = set()
+        for doc_id in ids:
+            fingerprint = self._fingerprints.pop(doc_id, None)
+            if fingerprint is None:
+                continue
+            for key in self._band_keys(fingerprint):
+                band = self._bands.get(key)
+                if band is not None:
+                    band.discard(doc_id)
+                    if not band:
+                        del self._bands[key]
+            dependents |= self._dependents.pop(doc_id, set())
+        return dependents
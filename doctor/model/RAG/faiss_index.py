@@ -0,0 +1,208 @@
+"""
+FAISS索引工厂模块
+根据配置创建精确索引（flat）、标量量化索引（sq8、sq-fp16）或近似索引（IVF-Flat、IVF-PQ、HNSW），并设置检索参数
+"""
+
+# 导入标准库
+from typing import Dict, Any, List, Sequence  # 类型提示
+
+# 导入第三方库
+import numpy as np  # 数值计算库
+import faiss  # FAISS向量检索库
+from langchain_core.documents import Document  # 文档类
+from langchain_core.embeddings import Embeddings  # 嵌入模型基类
+from langchain_community.docstore.in_memory import InMemoryDocstore  # 内存文档库
+from langchain_community.vectorstores.faiss import FAISS  # FAISS向量存储
+
+# 导入项目模块
+from config.config import Config  # 配置管理器，用于读取配置信息
+
+# 支持的索引类型
+INDEX_TYPES = ("flat", "sq8", "sq-fp16", "ivf-flat", "ivf-pq", "hnsw")
+
+# 标量量化索引类型对应的量化方式：int8每维1字节，fp16每维2字节，分别为float32的1/4和1/2
+_SQ_TYPES = {
+    "sq8": "QT_8bit",
+    "sq-fp16": "QT_fp16",
+}
+
+# 训练IVF时每个聚类中心至少需要的样本数，低于该值FAISS会给出警告且聚类质量变差
+_MIN_POINTS_PER_CENTROID = 39
+
+# 影响索引结构的配置项，变化后需要重新构建索引
+_BUILD_KEYS = ("type", "nlist", "pq-m", "pq-nbits", "hnsw-m", "ef-construction")
+
+
+def index_settings() -> Dict[str, Any]:
+    """
+    读取向量索引配置
+
+    Returns:
+        Dict[str, Any]: 配置字典
+    """
+    settings = dict(Config.get_instance().get_with_nested_params("model", "index"))
+    if settings.get("type") not in INDEX_TYPES:
+        raise ValueError(f"不支持的索引类型 {settings.get('type')}，可选 {INDEX_TYPES}")
+    return settings
+
+
+def build_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    提取影响索引结构的配置项，记录在索引元数据中，用于判断是否需要重新构建
+
+    Args:
+        settings (Dict[str, Any]): 向量索引配置
+
+    Returns:
+        Dict[str, Any]: 影响索引结构的配置项
+    """
+    return {key: settings.get(key) for key in _BUILD_KEYS}
+
+
+def create_index(dim: int, settings: Dict[str, Any], train_vectors: np.ndarray) -> faiss.Index:
+    """
+    创建并训练FAISS索引，训练样本不足以支撑配置的聚类中心数时自动减少中心数，
+    不足以训练乘积量化码本或pq-m不能整除维度时改用IVF-Flat
+
+    Args:
+        dim (int): 向量维度
+        settings (Dict[str, Any]): 向量索引配置
+        train_vectors (np.ndarray): 训练样本，形状为(n, dim)
+
+    Returns:
+        faiss.Index: 创建好的索引
+    """
+    index_type = settings["type"]
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, int(settings["hnsw-m"]))
+        index.hnsw.efConstruction = int(settings["ef-construction"])
+        return index
+
+    if index_type in _SQ_TYPES:
+        # 逐个向量精确比较，但向量按int8或fp16存储；int8需要在样本上统计每一维的取值范围
+        index = faiss.IndexScalarQuantizer(
+            dim, getattr(faiss.ScalarQuantizer, _SQ_TYPES[index_type]), faiss.METRIC_L2
+        )
+        index.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+        return index
+
+    if index_type in ("ivf-flat", "ivf-pq"):
+        nlist = min(int(settings["nlist"]), len(train_vectors) // _MIN_POINTS_PER_CENTROID)
+        if nlist >= 2 and index_type == "ivf-pq":
+            pq_m, pq_nbits = int(settings["pq-m"]), int(settings["pq-nbits"])
+            if dim % pq_m != 0:
+                # 乘积量化把向量等分为pq-m段，不能整除时FAISS无法创建索引
+                print(f"pq-m={pq_m} 不能整除向量维度 {dim}，改用 ivf-flat 索引")
+                index_type = "ivf-flat"
+            elif len(train_vectors) < 2 ** pq_nbits:
+                # 每段的码本有 2^pq-nbits 个中心，样本数少于中心数时FAISS训练会失败
+                print(
+                    f"训练样本只有 {len(train_vectors)} 个，少于乘积量化码本大小 {2 ** pq_nbits}，"
+                    f"改用 ivf-flat 索引"
+                )
+                index_type = "ivf-flat"
+        if nlist >= 2:
+            quantizer = faiss.IndexFlatL2(dim)
+            if index_type == "ivf-flat":
+                index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+            else:
+                index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits)
+            index.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+            print(f"已用 {len(train_vectors)} 个样本训练 {index_type} 索引，聚类中心数 {nlist}")
+            return index
+        print(f"训练样本只有 {len(train_vectors)} 个，不足以训练 {index_type} 索引，改用精确索引")
+
+    return faiss.IndexFlatL2(dim)
+
+
+def apply_search_params(index: faiss.Index, settings: Dict[str, Any]):
+    """
+    设置近似索引的检索参数：IVF的nprobe和HNSW的efSearch
+
+    Args:
+        index (faiss.Index): FAISS索引
+        settings (Dict[str, Any]): 向量索引配置
+    """
+    params = faiss.ParameterSpace()
+    if isinstance(index, faiss.IndexIVF):
+        params.set_index_parameter(index, "nprobe", int(settings["nprobe"]))
+    elif isinstance(index, faiss.IndexHNSW):
+        params.set_index_parameter(index, "efSearch", int(settings["ef-search"]))
+
+
+def supports_delete(index: faiss.Index) -> bool:
+    """
+    判断向量库能否按位置删除向量。LangChain删除向量后把位置重新编号为0..n-1，
+    只有删除后剩余向量依次前移的索引（flat、标量量化）才与之一致；
+    IVF删除后剩余向量保留原来的编号，HNSW不支持删除
+
+    Args:
+        index (faiss.Index): FAISS索引
+
+    Returns:
+        bool: 能否删除向量
+    """
+    return not isinstance(index, (faiss.IndexIVF, faiss.IndexHNSW))
+
+
+def search_parameters(
+    index: faiss.Index, settings: Dict[str, Any], positions: np.ndarray
+) -> faiss.SearchParameters:
+    """
+    创建只在给定向量位置中检索的参数，过滤在FAISS检索内部进行，无需多取结果再丢弃。
+    带参数检索时索引上设置的nprobe/efSearch不生效，需要在参数中重新指定
+
+    Args:
+        index (faiss.Index): FAISS索引
+        settings (Dict[str, Any]): 向量索引配置
+        positions (np.ndarray): 允许返回的向量位置
+
+    Returns:
+        faiss.SearchParameters: 检索参数
+    """
+    selector = faiss.IDSelectorBatch(np.ascontiguousarray(positions, dtype=np.int64))
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=int(settings["nprobe"]))
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(settings["ef-search"]))
+    return faiss.SearchParameters(sel=selector)
+
+
+def create_vectorstore(
+    documents: List[Document],
+    vectors: Sequence[Sequence[float]],
+    ids: List[str],
+    embedding: Embeddings,
+    settings: Dict[str, Any],
+) -> FAISS:
+    """
+    用已经嵌入好的文档创建向量库，先在样本上训练索引再加入全部向量
+
+    Args:
+        documents (List[Document]): 文档分块
+        vectors (Sequence[Sequence[float]]): 与文档一一对应的嵌入向量
+        ids (List[str]): 与文档一一对应的向量ID
+        embedding (Embeddings): 查询时使用的嵌入模型
+        settings (Dict[str, Any]): 向量索引配置
+
+    Returns:
+        FAISS: 创建好的向量库
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    sample_size = min(len(matrix), int(settings["train-sample-size"]))
+    sample = matrix[np.random.default_rng(0).choice(len(matrix), sample_size, replace=False)]
+    index = create_index(matrix.shape[1], settings, sample)
+    apply_search_params(index, settings)
+
+    vectorstore = FAISS(
+        embedding_function=embedding,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    vectorstore.add_embeddings(
+        zip([doc.page_content for doc in documents], matrix.tolist()),
+        metadatas=[doc.metadata for doc in documents],
+        ids=ids,
+    )
+    return vectorstore
@@ -0,0 +1,236 @@
+"""
+向量索引评测模块
+以精确检索结果为基准，测量当前索引在不同nprobe/efSearch下的召回率、单次检索延迟和向量占用，并把结果记录到磁盘
+在doctor目录下运行：python -m model.RAG.index_benchmark
+用同一批向量比较多种索引类型（如量化前后的召回损失和体积）：python -m model.RAG.index_benchmark --compare flat sq8 sq-fp16
+"""
+
+# 导入标准库
+import json  # JSON处理，用于保存评测结果
+import argparse  # 命令行参数解析
+import time  # 时间相关功能，用于测量延迟
+from typing import Dict, Any, List  # 类型提示
+
+# 导入第三方库
+import numpy as np  # 数值计算库
+import faiss  # FAISS向量检索库
+from langchain_core.embeddings import Embeddings  # 嵌入模型基类
+from langchain_community.vectorstores.faiss import FAISS  # FAISS向量存储
+
+# 导入项目模块
+from model.RAG.faiss_index import (  # 按配置创建索引
+    INDEX_TYPES,  # 支持的索引类型
+    index_settings,  # 读取向量索引配置
+    create_index,  # 创建并训练索引
+    apply_search_params,  # 设置nprobe/efSearch
+)
+
+# 查询文本取分块开头的字符数，模拟用户的短问题
+_QUERY_CHARS = 64
+
+# 各类索引评测时尝试的检索参数
+_NPROBE_GRID = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+_EF_SEARCH_GRID = (16, 32, 64, 128, 256, 512)
+
+
+def _measure(index: faiss.Index, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, float]:
+    """
+    逐条检索，统计召回率和延迟
+
+    Args:
+        index (faiss.Index): 被评测的索引
+        queries (np.ndarray): 查询向量
+        truth (np.ndarray): 精确检索得到的前k个结果
+        k (int): 返回结果数
+
+    Returns:
+        Dict[str, float]: 召回率、平均延迟和p99延迟（毫秒）
+    """
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, found = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(set(found[0].tolist()) & set(expected.tolist())) / k)
+    return {
+        "recall": float(np.mean(recalls)),
+        "latency_ms": float(np.mean(latencies)),
+        "p99_latency_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def index_bytes(index: faiss.Index) -> int:
+    """
+    计算索引序列化后的体积，近似为加载后占用的内存或映射的文件大小
+
+    Args:
+        index (faiss.Index): FAISS索引
+
+    Returns:
+        int: 字节数
+    """
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def _queries(
+    vectorstore: FAISS, embedding: Embeddings, sample_size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    取出向量库中全部分块的向量，并随机抽取分块，用其开头的文字作为查询
+
+    Args:
+        vectorstore (FAISS): 向量库
+        embedding (Embeddings): 嵌入模型，库中分块的向量一般可以直接从嵌入缓存读取
+        sample_size (int): 查询数量
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: 全部分块的float32向量和查询向量
+    """
+    ntotal = vectorstore.index.ntotal
+    texts = [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]).page_content
+        for i in range(ntotal)
+    ]
+    base = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+    rng = np.random.default_rng(0)
+    picks = rng.choice(ntotal, min(sample_size, ntotal), replace=False)
+    queries = np.asarray(
+        embedding.embed_documents([texts[i][:_QUERY_CHARS] for i in picks]), dtype=np.float32
+    )
+    return base, queries
+
+
+def benchmark(
+    vectorstore: FAISS, embedding: Embeddings, sample_size: int = 200, k: int = 6
+) -> Dict[str, Any]:
+    """
+    评测向量库的召回率与延迟
+
+    Args:
+        vectorstore (FAISS): 被评测的向量库
+        embedding (Embeddings): 嵌入模型，库中分块的向量一般可以直接从嵌入缓存读取
+        sample_size (int): 查询数量
+        k (int): 返回结果数
+
+    Returns:
+        Dict[str, Any]: 评测结果
+    """
+    index = vectorstore.index
+    ntotal = index.ntotal
+
+    # 以全部分块向量建立精确索引作为基准
+    base, queries = _queries(vectorstore, embedding, sample_size)
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+
+    results: List[Dict[str, Any]] = []
+    params = faiss.ParameterSpace()
+    if isinstance(index, faiss.IndexIVF):
+        original = index.nprobe
+        for nprobe in _NPROBE_GRID:
+            if nprobe > index.nlist:
+                break
+            params.set_index_parameter(index, "nprobe", nprobe)
+            results.append({"nprobe": nprobe, **_measure(index, queries, truth, k)})
+        params.set_index_parameter(index, "nprobe", original)
+    elif isinstance(index, faiss.IndexHNSW):
+        original = index.hnsw.efSearch
+        for ef_search in _EF_SEARCH_GRID:
+            params.set_index_parameter(index, "efSearch", ef_search)
+            results.append({"efSearch": ef_search, **_measure(index, queries, truth, k)})
+        params.set_index_parameter(index, "efSearch", original)
+    else:
+        results.append(_measure(index, queries, truth, k))
+
+    return {
+        "index": type(index).__name__,
+        "ntotal": ntotal,
+        "k": k,
+        "queries": len(queries),
+        "index_bytes": index_bytes(index),
+        "float32_bytes": int(base.nbytes),
+        "created_at": time.time(),
+        "results": results,
+    }
+
+
+def compare(
+    vectorstore: FAISS,
+    embedding: Embeddings,
+    index_types: List[str],
+    sample_size: int = 200,
+    k: int = 6,
+) -> Dict[str, Any]:
+    """
+    用向量库中的同一批向量分别建立多种类型的索引，比较召回率、延迟和体积，用于评估量化带来的召回损失
+
+    Args:
+        vectorstore (FAISS): 提供分块的向量库
+        embedding (Embeddings): 嵌入模型
+        index_types (List[str]): 要比较的索引类型，如 flat、sq8、sq-fp16
+        sample_size (int): 查询数量
+        k (int): 返回结果数
+
+    Returns:
+        Dict[str, Any]: 评测结果
+    """
+    base, queries = _queries(vectorstore, embedding, sample_size)
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+
+    results: List[Dict[str, Any]] = []
+    for index_type in index_types:
+        settings = dict(index_settings(), type=index_type)
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"不支持的索引类型 {index_type}，可选 {INDEX_TYPES}")
+        train_size = min(len(base), int(settings["train-sample-size"]))
+        sample = base[np.random.default_rng(0).choice(len(base), train_size, replace=False)]
+        index = create_index(base.shape[1], settings, sample)
+        apply_search_params(index, settings)
+        index.add(base)
+        size = index_bytes(index)
+        results.append(
+            {
+                "type": index_type,
+                "index": type(index).__name__,
+                "index_bytes": size,
+                "compression": base.nbytes / size if size else 0.0,
+                **_measure(index, queries, truth, k),
+            }
+        )
+
+    return {
+        "ntotal": len(base),
+        "k": k,
+        "queries": len(queries),
+        "float32_bytes": int(base.nbytes),
+        "created_at": time.time(),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    # 构建或加载知识库索引后进行评测，结果保存在索引目录旁边
+    from model.RAG.retrieve_model import get_instance
+
+    parser = argparse.ArgumentParser(description="评测知识库向量索引的召回率、延迟和体积")
+    parser.add_argument("--compare", nargs="+", metavar="TYPE", help="用同一批向量比较多种索引类型")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量")
+    args = parser.parse_args()
+
+    model = get_instance()
+    model.build()
+    if args.compare:
+        report = compare(model.vectorstore, model.embedding, args.compare, args.queries)
+        report_path = f"{model.index_path}.compare.json"
+    else:
+        report = benchmark(model.vectorstore, model.embedding, args.queries)
+        report_path = f"{model.index_path}.benchmark.json"
+    for row in report["results"]:
+        print(row)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"评测结果已保存到 {report_path}")
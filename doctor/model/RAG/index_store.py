@@ -0,0 +1,280 @@
+"""
+知识库索引持久化模块
+负责把FAISS向量库（索引、文档库、嵌入模型指纹）保存为带版本号的磁盘产物，并在启动时快速加载。
+每次保存写入索引目录下的一个新版本子目录，再原子地改写CURRENT指针文件指向它；
+已被内存映射的旧版本目录不会被移动或改名，在Windows上同样可以保存
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于文件和目录操作
+import json  # JSON处理，用于读写索引元数据
+import time  # 时间相关功能，用于记录索引创建时间
+import pickle  # 序列化模块，用于保存文档库
+import shutil  # 高级文件操作模块，用于替换和删除目录
+import hashlib  # 哈希模块，用于计算指纹
+from typing import Dict, Any  # 类型提示
+
+# 导入第三方库
+import faiss  # FAISS向量检索库
+from langchain_core.embeddings import Embeddings  # 嵌入模型基类
+from langchain_community.vectorstores.faiss import FAISS  # FAISS向量存储
+
+# 索引产物的格式版本，产物结构发生变化时递增，旧版本产物会被重新构建
+INDEX_FORMAT_VERSION = 2
+
+# 索引产物中各个文件的名称
+_INDEX_FILE = "index.faiss"  # FAISS索引文件
+_DOCSTORE_FILE = "index.pkl"  # 文档库与索引位置到文档ID的映射
+_META_FILE = "meta.json"  # 元数据文件，记录版本和指纹
+_MANIFEST_FILE = "manifest.json"  # 知识库清单，记录每个文件对应的向量ID
+_CURRENT_FILE = "CURRENT"  # 指针文件，内容为当前版本子目录的名称
+_VERSION_PREFIX = "v-"  # 版本子目录名称的前缀
+
+_warned_mmap_ifc = False  # 是否已提示过FAISS不支持映射向量编码
+
+
+def embedding_fingerprint(model_name: str, model_version: str, model_path: str) -> str:
+    """
+    计算嵌入模型的指纹，模型名称、版本或权重文件发生变化时指纹随之变化
+
+    Args:
+        model_name (str): 嵌入模型名称
+        model_version (str): 嵌入模型版本
+        model_path (str): 嵌入模型本地路径
+
+    Returns:
+        str: 嵌入模型指纹
+    """
+    sha = hashlib.sha256()
+    sha.update(f"{model_name}@{model_version}".encode("utf-8"))
+    # 模型目录下顶层文件的名称和大小，权重更新后大小一般会改变
+    if os.path.isdir(model_path):
+        for name in sorted(os.listdir(model_path)):
+            file_path = os.path.join(model_path, name)
+            if os.path.isfile(file_path):
+                sha.update(f"{name}:{os.path.getsize(file_path)}".encode("utf-8"))
+    return sha.hexdigest()
+
+
+def _read_current(index_path: str) -> str | None:
+    """
+    读取指针文件中的当前版本子目录名称
+
+    Args:
+        index_path (str): 索引目录
+
+    Returns:
+        str | None: 版本子目录名称，指针文件不存在或读取失败时返回None
+    """
+    try:
+        with open(os.path.join(index_path, _CURRENT_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return name or None
+
+
+def _artifact_dir(index_path: str) -> str:
+    """
+    获取当前版本产物所在的目录。没有指针文件时是旧的布局，产物直接位于索引目录中
+
+    Args:
+        index_path (str): 索引目录
+
+    Returns:
+        str: 产物目录
+    """
+    name = _read_current(index_path)
+    return os.path.join(index_path, name) if name else index_path
+
+
+def read_meta(index_path: str) -> Dict[str, Any] | None:
+    """
+    读取索引产物的元数据
+
+    Args:
+        index_path (str): 索引产物目录
+
+    Returns:
+        Dict[str, Any] | None: 元数据字典，产物不存在或不完整时返回None
+    """
+    artifact_dir = _artifact_dir(index_path)
+    meta_file = os.path.join(artifact_dir, _META_FILE)
+    # 产物中的文件缺一不可，否则视为产物不存在
+    for name in (_INDEX_FILE, _DOCSTORE_FILE, _META_FILE, _MANIFEST_FILE):
+        if not os.path.exists(os.path.join(artifact_dir, name)):
+            return None
+    try:
+        with open(meta_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取索引元数据 {meta_file} 失败: {e}")
+        return None
+
+
+def read_manifest(index_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    读取索引产物中的知识库清单
+
+    Args:
+        index_path (str): 索引产物目录
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 清单条目，读取失败时返回空字典
+    """
+    manifest_file = os.path.join(_artifact_dir(index_path), _MANIFEST_FILE)
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取知识库清单 {manifest_file} 失败: {e}")
+        return {}
+
+
+def save_index(
+    vectorstore: FAISS,
+    index_path: str,
+    meta: Dict[str, Any],
+    manifest: Dict[str, Dict[str, Any]],
+    sidecars: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """
+    保存向量库到磁盘：先写入新的版本子目录，写完后原子地改写指针文件，中途失败不会影响当前版本。
+    当前版本和上一个版本（可能仍被其他进程内存映射）保留，更早的版本被删除；删除失败时（如Windows上仍被映射）下次保存时再删除
+
+    Args:
+        vectorstore (FAISS): 要保存的向量库
+        index_path (str): 索引产物目录
+        meta (Dict[str, Any]): 需要额外记录的元数据，如嵌入模型指纹
+        manifest (Dict[str, Dict[str, Any]]): 知识库清单，与索引一起保存以保证两者一致
+        sidecars (Dict[str, Any] | None): 与向量库同步维护的附属索引（如BM25索引），按名称各自序列化保存
+
+    Returns:
+        Dict[str, Any]: 实际写入的元数据，包括格式版本、创建时间和向量数
+    """
+    os.makedirs(index_path, exist_ok=True)
+    previous = _read_current(index_path)
+    version = f"{_VERSION_PREFIX}{time.time_ns()}-{os.getpid()}"
+    version_path = os.path.join(index_path, version)
+    os.makedirs(version_path)
+
+    try:
+        # 写入FAISS索引
+        faiss.write_index(vectorstore.index, os.path.join(version_path, _INDEX_FILE))
+        # 写入文档库和索引位置到文档ID的映射
+        with open(os.path.join(version_path, _DOCSTORE_FILE), "wb") as f:
+            pickle.dump((vectorstore.docstore, vectorstore.index_to_docstore_id), f)
+        # 写入元数据
+        meta = dict(meta)
+        meta["format_version"] = INDEX_FORMAT_VERSION
+        meta["created_at"] = time.time()
+        meta["ntotal"] = vectorstore.index.ntotal
+        with open(os.path.join(version_path, _META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        # 写入知识库清单
+        with open(os.path.join(version_path, _MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        # 写入附属索引
+        for name, sidecar in (sidecars or {}).items():
+            with open(os.path.join(version_path, f"{name}.pkl"), "wb") as f:
+                pickle.dump(sidecar, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # 改写指针文件切换到新版本，替换的是一个小文件而不是已被映射的目录
+        current_file = os.path.join(index_path, _CURRENT_FILE)
+        tmp_file = f"{current_file}.tmp-{os.getpid()}"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp_file, current_file)
+    except Exception:
+        shutil.rmtree(version_path, ignore_errors=True)
+        raise
+
+    _remove_old_versions(index_path, keep=(version, previous))
+    return meta
+
+
+def _remove_old_versions(index_path: str, keep: tuple):
+    """
+    删除不再使用的版本子目录、中断的保存留下的目录，以及旧布局中直接位于索引目录下的产物文件
+
+    Args:
+        index_path (str): 索引目录
+        keep (tuple): 需要保留的版本子目录名称
+    """
+    for name in os.listdir(index_path):
+        path = os.path.join(index_path, name)
+        if name.startswith(_VERSION_PREFIX) and os.path.isdir(path):
+            if name not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+        elif name != _CURRENT_FILE and os.path.isfile(path) and name.endswith((".faiss", ".pkl", ".json")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def load_index(index_path: str, embedding: Embeddings, mmap: bool = True) -> FAISS:
+    """
+    从磁盘加载向量库，优先以内存映射方式读取FAISS索引。
+    FAISS提供IO_FLAG_MMAP_IFC时flat和标量量化索引的向量也直接映射索引文件，多个工作进程通过页缓存共享同一份向量，
+    此时索引只读，需要增删向量时应以mmap=False加载。requirement.txt中的faiss-cpu 1.9.0没有该标志，
+    flat和标量量化索引的向量仍由每个进程各自读入内存
+
+    Args:
+        index_path (str): 索引产物目录
+        embedding (Embeddings): 查询时使用的嵌入模型
+        mmap (bool): 是否尝试内存映射读取索引
+
+    Returns:
+        FAISS: 加载后的向量库
+    """
+    global _warned_mmap_ifc
+    artifact_dir = _artifact_dir(index_path)
+    index_file = os.path.join(artifact_dir, _INDEX_FILE)
+    index = None
+    if mmap:
+        try:
+            # IO_FLAG_MMAP_IFC使flat和标量量化索引的编码也映射文件，faiss-cpu 1.9.0及更早的版本没有该标志
+            flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+            if not hasattr(faiss, "IO_FLAG_MMAP_IFC") and not _warned_mmap_ifc:
+                _warned_mmap_ifc = True
+                print("当前FAISS版本不支持映射flat和标量量化索引的向量，向量将读入本进程内存")
+            index = faiss.read_index(index_file, flags)
+        except RuntimeError as e:
+            # 部分索引类型不支持内存映射，退回到普通读取
+            print(f"内存映射读取索引失败，改为普通读取: {e}")
+    if index is None:
+        index = faiss.read_index(index_file)
+
+    # 文档库由本程序自己写入，反序列化是安全的
+    with open(os.path.join(artifact_dir, _DOCSTORE_FILE), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    return FAISS(
+        embedding_function=embedding,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def load_sidecar(index_path: str, name: str) -> Any | None:
+    """
+    加载与向量库一起保存的附属索引
+
+    Args:
+        index_path (str): 索引产物目录
+        name (str): 附属索引名称
+
+    Returns:
+        Any | None: 附属索引，不存在或读取失败时返回None
+    """
+    sidecar_file = os.path.join(_artifact_dir(index_path), f"{name}.pkl")
+    if not os.path.exists(sidecar_file):
+        return None
+    try:
+        with open(sidecar_file, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"读取附属索引 {sidecar_file} 失败: {e}")
+        return None
@@ -0,0 +1,79 @@
+"""
+知识库文档解析模块
+只遍历一次目录，按文件后缀选择加载器，并在进程池中并行解析文档；同时解析的文件数有上限，内存占用与知识库大小无关
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于遍历目录
+import multiprocessing  # 多进程模块，用于指定子进程的启动方式
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED  # 进程池，绕开GIL并行解析文档
+from typing import Iterable, Iterator, List, Tuple  # 类型提示
+
+# 导入第三方库
+from langchain_core.documents import Document  # 文档类
+
+# 导入项目模块
+from model.RAG.parse_worker import LOADERS, load_file  # 文件后缀到加载器的映射和在子进程中执行的解析函数
+
+
+def walk_files(data_path: str) -> Iterator[str]:
+    """
+    遍历一次目录，返回所有支持解析的文件路径
+
+    Args:
+        data_path (str): 要遍历的目录
+
+    Yields:
+        str: 文件路径
+    """
+    for root, dirs, files in os.walk(data_path):
+        # 跳过隐藏目录
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        for name in files:
+            if os.path.splitext(name)[1].lower() in LOADERS:
+                yield os.path.join(root, name)
+
+
+def iter_documents(
+    file_paths: Iterable[str], max_workers: int | None = None
+) -> Iterator[Tuple[str, List[Document]]]:
+    """
+    在进程池中并行解析文件，哪个文件先解析完就先返回哪个。
+    最多同时提交进程数两倍的文件，调用方处理得慢时不会在内存中堆积大量已解析的文档
+
+    Args:
+        file_paths (Iterable[str]): 要解析的文件路径
+        max_workers (int | None): 进程数，为空或小于等于0时使用CPU核心数
+
+    Yields:
+        Tuple[str, List[Document]]: 文件路径和文件中的文档
+    """
+    file_paths = list(file_paths)
+    if not max_workers or max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(file_paths))
+
+    # 文件很少时不值得启动进程池
+    if max_workers <= 1:
+        for file_path in file_paths:
+            yield load_file(file_path)
+        return
+
+    # 各平台统一用spawn启动子进程：不复制父进程中的线程、锁和已加载的模型，
+    # 子进程只导入解析模块，主模块的入口代码由 if __name__ == "__main__" 保护
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        pending = set()
+        remaining = iter(file_paths)
+        while True:
+            # 补充提交文件，保持在途文件数不超过上限
+            for file_path in remaining:
+                pending.add(executor.submit(load_file, file_path))
+                if len(pending) >= max_workers * 2:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
@@ -0,0 +1,155 @@
+"""
+知识库目录监视模块
+用APScheduler定期扫描知识库目录的文件大小和修改时间，变化稳定一段时间后在后台增量更新知识库索引
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于读取文件状态
+import time  # 时间相关功能，用于防抖
+import threading  # 线程模块，用于保护监视器状态
+from typing import Dict, Tuple  # 类型提示
+
+# 导入第三方库
+from apscheduler.schedulers.background import BackgroundScheduler  # 后台定时任务调度器
+
+# 导入项目模块
+from config.config import Config  # 配置管理器，用于读取配置信息
+from model.RAG.ingest import walk_files  # 遍历知识库目录中支持解析的文件
+
+
+def scan(data_path: str) -> Dict[str, Tuple[int, int]]:
+    """
+    扫描目录，只读取文件状态，不读取文件内容
+
+    Args:
+        data_path (str): 知识库目录
+
+    Returns:
+        Dict[str, Tuple[int, int]]: 文件路径到(大小, 修改时间纳秒)的映射
+    """
+    snapshot = {}
+    for file_path in walk_files(data_path):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            # 扫描期间被删除的文件
+            continue
+        snapshot[file_path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class KnowledgeBaseWatcher(object):
+    """
+    知识库目录监视器类
+    目录发生变化后等待一段时间没有新的变化（如大文件仍在复制）再触发更新，连续放入多个文件只触发一次构建
+    """
+
+    def __init__(self, model, data_path: str, interval_seconds: float = 30, debounce_seconds: float = 60):
+        """
+        初始化知识库目录监视器
+
+        Args:
+            model (Retrievemodel): 知识库检索模型
+            data_path (str): 知识库目录
+            interval_seconds (float): 扫描间隔（秒）
+            debounce_seconds (float): 目录停止变化多久后开始更新（秒）
+        """
+        self._model = model
+        self._data_path = data_path
+        self._interval = max(1.0, float(interval_seconds))
+        self._debounce = max(0.0, float(debounce_seconds))
+        self._snapshot = scan(data_path)  # 上次扫描的结果
+        self._indexed = self._snapshot  # 上次更新成功时的目录状态
+        self._changed_at = None  # 最近一次发现变化的时间，没有待处理的变化时为None
+        self._lock = threading.Lock()  # 防止扫描任务重叠执行
+        self._scheduler = None  # 定时任务调度器
+
+    def start(self):
+        """
+        开始定期扫描
+        """
+        if self._scheduler is not None:
+            return
+        self._scheduler = BackgroundScheduler(daemon=True)
+        self._scheduler.add_job(
+            self.check, "interval", seconds=self._interval, max_instances=1, coalesce=True
+        )
+        self._scheduler.start()
+        print(f"开始监视知识库目录 {self._data_path}，每 {self._interval:.0f} 秒扫描一次")
+
+    def stop(self):
+        """
+        停止扫描
+        """
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+    def check(self):
+        """
+        扫描一次目录，变化已稳定超过防抖时间时在后台增量更新索引。
+        构建本身只解析和嵌入新增、修改的文件并删除已删除文件的向量，期间旧索引照常提供检索
+        """
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            snapshot = scan(self._data_path)
+            now = time.time()
+            if snapshot != self._snapshot:
+                # 目录仍在变化，重新开始计时
+                self._snapshot = snapshot
+                self._changed_at = now
+                return
+            if self._changed_at is None or now - self._changed_at < self._debounce:
+                return
+            if snapshot == self._indexed:
+                # 变化后又恢复原状，无需更新
+                self._changed_at = None
+                return
+            if self._model.update_in_background(
+                lambda success: self._on_update_done(snapshot, success)
+            ):
+                self._changed_at = None
+                print("知识库目录已变化，开始在后台增量更新索引")
+        finally:
+            self._lock.release()
+
+    def _on_update_done(self, snapshot: Dict[str, Tuple[int, int]], success: bool):
+        """
+        后台更新结束后调用：成功时才把触发更新时的目录状态记为已索引，失败时在防抖时间后重新尝试
+
+        Args:
+            snapshot (Dict[str, Tuple[int, int]]): 触发更新时的目录状态
+            success (bool): 更新是否成功
+        """
+        if success:
+            self._indexed = snapshot
+        else:
+            self._changed_at = time.time()
+
+
+_watcher = None  # 全局知识库目录监视器
+
+
+def start_watcher() -> KnowledgeBaseWatcher | None:
+    """
+    按配置启动知识库目录监视器，重复调用只启动一次
+
+    Returns:
+        KnowledgeBaseWatcher | None: 监视器，未启用时返回None
+    """
+    global _watcher
+    settings = Config.get_instance().get_with_nested_params("Knowledge-base-watch")
+    if not settings["enabled"]:
+        return None
+    if _watcher is None:
+        from model.RAG.retrieve_model import get_instance
+
+        _watcher = KnowledgeBaseWatcher(
+            get_instance(),
+            Config.get_instance().get_with_nested_params("Knowledge-base-path"),
+            settings["interval-seconds"],
+            settings["debounce-seconds"],
+        )
+        _watcher.start()
+    return _watcher
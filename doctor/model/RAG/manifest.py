@@ -0,0 +1,216 @@
+"""
+知识库清单模块
+记录知识库中每个文件的路径、大小、修改时间、内容哈希以及对应的向量ID，用于增量构建索引
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于读取文件信息
+import hashlib  # 哈希模块，用于计算文件内容哈希
+from dataclasses import dataclass, field  # 数据类相关功能
+from typing import Dict, List, Iterable, Tuple, Any  # 类型提示
+
+# 计算文件哈希时每次读取的字节数
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    分块计算文件内容的sha256，避免一次性读入大文件
+
+    Args:
+        file_path (str): 文件路径
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@dataclass
+class ManifestDiff(object):
+    """
+    知识库目录与清单之间的差异
+    """
+
+    added: List[str] = field(default_factory=list)  # 新增的文件（相对路径）
+    changed: List[str] = field(default_factory=list)  # 内容发生变化的文件
+    deleted: List[str] = field(default_factory=list)  # 已被删除的文件
+    # 内容未变但大小或修改时间变化的文件，只需更新清单，值为(大小, 修改时间, 哈希)
+    touched: Dict[str, Tuple[int, int, str]] = field(default_factory=dict)
+    # 需要重新解析的文件对应的(大小, 修改时间, 哈希)
+    stats: Dict[str, Tuple[int, int, str]] = field(default_factory=dict)
+
+    def is_empty(self) -> bool:
+        """
+        判断是否存在需要重新索引的变化
+
+        Returns:
+            bool: 没有新增、修改和删除时返回True
+        """
+        return not (self.added or self.changed or self.deleted)
+
+
+class Manifest(object):
+    """
+    知识库清单类
+    以文件相对路径为键，记录文件的大小、修改时间、内容哈希和向量ID
+    """
+
+    def __init__(self, entries: Dict[str, Dict[str, Any]] | None = None):
+        """
+        初始化清单
+
+        Args:
+            entries (Dict[str, Dict[str, Any]] | None): 已有的清单条目
+        """
+        self._entries = entries or {}  # 相对路径 -> {"size", "mtime_ns", "sha256", "ids"}
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """
+        转换为可以写入JSON的字典
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 清单条目
+        """
+        return self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ids(self, rel_path: str) -> List[str]:
+        """
+        获取文件对应的向量ID
+
+        Args:
+            rel_path (str): 文件相对路径
+
+        Returns:
+            List[str]: 向量ID列表，文件不在清单中时返回空列表
+        """
+        entry = self._entries.get(rel_path)
+        return list(entry["ids"]) if entry else []
+
+    def stats(self, rel_path: str) -> Tuple[int, int, str] | None:
+        """
+        获取文件在清单中记录的大小、修改时间和内容哈希
+
+        Args:
+            rel_path (str): 文件相对路径
+
+        Returns:
+            Tuple[int, int, str] | None: (大小, 修改时间, 哈希)，文件不在清单中时返回None
+        """
+        entry = self._entries.get(rel_path)
+        return (entry["size"], entry["mtime_ns"], entry["sha256"]) if entry else None
+
+    def set(self, rel_path: str, size: int, mtime_ns: int, sha256: str, ids: List[str]):
+        """
+        新增或覆盖文件的清单条目
+
+        Args:
+            rel_path (str): 文件相对路径
+            size (int): 文件大小
+            mtime_ns (int): 文件修改时间（纳秒）
+            sha256 (str): 文件内容哈希
+            ids (List[str]): 文件分块后对应的向量ID
+        """
+        self._entries[rel_path] = {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": sha256,
+            "ids": list(ids),
+        }
+
+    def touch(self, rel_path: str, size: int, mtime_ns: int):
+        """
+        只更新文件的大小和修改时间，保留原有向量ID
+
+        Args:
+            rel_path (str): 文件相对路径
+            size (int): 文件大小
+            mtime_ns (int): 文件修改时间（纳秒）
+        """
+        entry = self._entries.get(rel_path)
+        if entry:
+            entry["size"] = size
+            entry["mtime_ns"] = mtime_ns
+
+    def remove(self, rel_path: str):
+        """
+        删除文件的清单条目
+
+        Args:
+            rel_path (str): 文件相对路径
+        """
+        self._entries.pop(rel_path, None)
+
+    def hashes(self) -> Dict[str, Tuple[int, int, str]]:
+        """
+        获取清单中所有文件的大小、修改时间和内容哈希，可作为diff的已知哈希
+
+        Returns:
+            Dict[str, Tuple[int, int, str]]: 相对路径 -> (大小, 修改时间, 哈希)
+        """
+        return {
+            rel_path: (entry["size"], entry["mtime_ns"], entry["sha256"])
+            for rel_path, entry in self._entries.items()
+        }
+
+    def diff(
+        self,
+        data_path: str,
+        file_paths: Iterable[str],
+        known: Dict[str, Tuple[int, int, str]] | None = None,
+    ) -> ManifestDiff:
+        """
+        比较知识库目录中的文件与清单，大小和修改时间都未变化的文件直接视为未变化，其余文件再比较内容哈希
+
+        Args:
+            data_path (str): 知识库目录，清单中的路径相对于该目录
+            file_paths (Iterable[str]): 知识库目录中参与构建的文件路径
+            known (Dict[str, Tuple[int, int, str]] | None): 已经算过的(大小, 修改时间, 哈希)，
+                大小和修改时间与文件一致时直接使用其中的哈希，不再读取文件内容
+
+        Returns:
+            ManifestDiff: 差异结果
+        """
+        result = ManifestDiff()
+        seen = set()
+        known = known or {}
+
+        for file_path in file_paths:
+            rel_path = os.path.relpath(file_path, data_path).replace(os.sep, "/")
+            seen.add(rel_path)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+
+            entry = self._entries.get(rel_path)
+            if (
+                entry is not None
+                and entry["size"] == stat.st_size
+                and entry["mtime_ns"] == stat.st_mtime_ns
+            ):
+                continue
+
+            cached = known.get(rel_path)
+            if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+                sha256 = cached[2]
+            else:
+                sha256 = file_sha256(file_path)
+            if entry is None:
+                result.added.append(rel_path)
+                result.stats[rel_path] = (stat.st_size, stat.st_mtime_ns, sha256)
+            elif entry["sha256"] != sha256:
+                result.changed.append(rel_path)
+                result.stats[rel_path] = (stat.st_size, stat.st_mtime_ns, sha256)
+            else:
+                result.touched[rel_path] = (stat.st_size, stat.st_mtime_ns, sha256)
+
+        result.deleted = [rel_path for rel_path in self._entries if rel_path not in seen]
+        return result
@@ -0,0 +1,179 @@
+"""
+分块元数据列式索引模块
+按FAISS索引中的向量顺序逐列保存每个分块的来源文件、文档类型、科室和修改日期，
+检索时先在列上算出满足过滤条件的向量位置，再作为ID选择器交给FAISS，只在这些向量中检索
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于解析文件路径
+import time  # 时间相关功能，用于格式化修改日期
+from typing import Any, Dict, Iterable, List  # 类型提示
+
+# 导入第三方库
+import numpy as np  # 数值计算库，用于列式存储和过滤
+
+# 字符串列：取值经字典编码后以int32存储
+STRING_FIELDS = ("source", "doc_type", "department")
+# 数值列：修改日期以YYYYMMDD整数存储，支持范围过滤
+NUMERIC_FIELDS = ("modified",)
+FIELDS = STRING_FIELDS + NUMERIC_FIELDS
+
+# 范围过滤支持的运算符
+_RANGE_OPS = {
+    "gt": np.greater,
+    "gte": np.greater_equal,
+    "lt": np.less,
+    "lte": np.less_equal,
+}
+
+
+def file_metadata(rel_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """
+    根据文件在知识库中的相对路径生成元数据，知识库第一级子目录视为科室
+
+    Args:
+        rel_path (str): 文件相对路径，以"/"分隔
+        mtime_ns (int): 文件修改时间（纳秒）
+
+    Returns:
+        Dict[str, Any]: 来源文件、文档类型、科室和修改日期
+    """
+    parts = rel_path.split("/")
+    return {
+        "source": rel_path,
+        "doc_type": os.path.splitext(rel_path)[1].lstrip(".").lower(),
+        "department": parts[0] if len(parts) > 1 else "",
+        "modified": int(time.strftime("%Y%m%d", time.localtime(mtime_ns / 1e9))),
+    }
+
+
+def _date_value(value: Any) -> int:
+    """
+    把日期转换为YYYYMMDD整数，支持 20240101、"20240101" 和 "2024-01-01"
+
+    Args:
+        value (Any): 日期
+
+    Returns:
+        int: YYYYMMDD整数
+    """
+    return int(str(value).replace("-", ""))
+
+
+class MetadataIndex(object):
+    """
+    分块元数据列式索引类
+    行顺序与FAISS索引中的向量位置一致，向量库增删向量时同步增删
+    """
+
+    def __init__(self):
+        """
+        初始化空索引
+        """
+        self._ids: List[str] = []  # 每一行对应的文档ID
+        self._dictionaries: Dict[str, Dict[str, int]] = {name: {} for name in STRING_FIELDS}  # 字符串取值 -> 编码
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.empty(0, dtype=np.int32) for name in FIELDS
+        }
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def aligned(self, ids: List[str]) -> bool:
+        """
+        判断行顺序是否与向量库中的向量顺序一致
+
+        Args:
+            ids (List[str]): 按向量位置排列的文档ID
+
+        Returns:
+            bool: 是否一致
+        """
+        return self._ids == ids
+
+    def add(self, ids: List[str], metadatas: Iterable[Dict[str, Any]]):
+        """
+        按向量加入顺序追加行
+
+        Args:
+            ids (List[str]): 文档ID
+            metadatas (Iterable[Dict[str, Any]]): 与ID一一对应的元数据，缺少的字段记为空值
+        """
+        new_columns: Dict[str, List[int]] = {name: [] for name in FIELDS}
+        for metadata in metadatas:
+            for name in STRING_FIELDS:
+                dictionary = self._dictionaries[name]
+                value = str(metadata.get(name, ""))
+                new_columns[name].append(dictionary.setdefault(value, len(dictionary)))
+            for name in NUMERIC_FIELDS:
+                new_columns[name].append(int(metadata.get(name, 0) or 0))
+        self._ids.extend(ids)
+        for name in FIELDS:
+            self._columns[name] = np.concatenate(
+                [self._columns[name], np.asarray(new_columns[name], dtype=np.int32)]
+            )
+
+    def delete(self, ids: Iterable[str]):
+        """
+        删除行，其余行保持原有顺序，与向量库删除向量后的位置一致
+
+        Args:
+            ids (Iterable[str]): 文档ID
+        """
+        removed = set(ids)
+        keep = np.fromiter((doc_id not in removed for doc_id in self._ids), dtype=bool, count=len(self._ids))
+        self._ids = [doc_id for doc_id, k in zip(self._ids, keep) if k]
+        for name in FIELDS:
+            self._columns[name] = self._columns[name][keep]
+
+    def select(self, filter: Dict[str, Any]) -> np.ndarray:
+        """
+        计算满足过滤条件的向量位置
+
+        过滤条件是字段到条件的字典，多个字段之间为“且”：
+          - 单个值：等于该值，如 {"department": "心内科"}
+          - 列表：等于其中任一值，如 {"doc_type": ["pdf", "docx"]}
+          - 范围：gt/gte/lt/lte组成的字典，如 {"modified": {"gte": "2024-01-01"}}
+
+        Args:
+            filter (Dict[str, Any]): 过滤条件
+
+        Returns:
+            np.ndarray: 满足条件的向量位置（int64）
+
+        Raises:
+            ValueError: 字段或运算符不受支持
+        """
+        mask = np.ones(len(self._ids), dtype=bool)
+        for name, condition in filter.items():
+            if name not in FIELDS:
+                raise ValueError(f"不支持按 {name} 过滤，可选 {FIELDS}")
+            column = self._columns[name]
+            if name in STRING_FIELDS:
+                if isinstance(condition, dict):
+                    raise ValueError(f"{name} 不支持范围过滤")
+                values = condition if isinstance(condition, (list, tuple, set)) else [condition]
+                dictionary = self._dictionaries[name]
+                codes = [dictionary[str(value)] for value in values if str(value) in dictionary]
+                mask &= np.isin(column, codes)
+            elif isinstance(condition, dict):
+                for op, value in condition.items():
+                    if op not in _RANGE_OPS:
+                        raise ValueError(f"不支持的运算符 {op}，可选 {tuple(_RANGE_OPS)}")
+                    mask &= _RANGE_OPS[op](column, _date_value(value))
+            else:
+                values = condition if isinstance(condition, (list, tuple, set)) else [condition]
+                mask &= np.isin(column, [_date_value(value) for value in values])
+        return np.flatnonzero(mask).astype(np.int64)
+
+    def doc_ids(self, positions: np.ndarray) -> List[str]:
+        """
+        把向量位置转换为文档ID
+
+        Args:
+            positions (np.ndarray): 向量位置
+
+        Returns:
+            List[str]: 文档ID
+        """
+        return [self._ids[position] for position in positions]
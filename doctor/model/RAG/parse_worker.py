@@ -0,0 +1,52 @@
+"""
+知识库文档解析子进程模块
+只包含文件后缀到加载器的映射和单个文件的解析函数，进程池以spawn方式启动子进程时只需导入本模块，
+不会加载嵌入模型、索引或其他单例
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于获取文件后缀
+from typing import List, Tuple  # 类型提示
+
+# 导入第三方库
+from langchain_core.documents import Document  # 文档类
+from langchain_community.document_loaders import (  # 文档加载器，用于加载不同格式的文档
+    PyPDFLoader,  # PDF文档加载器
+    MHTMLLoader,  # MHTML文档加载器
+    TextLoader,  # 文本文件加载器
+    CSVLoader,  # CSV文件加载器
+    UnstructuredWordDocumentLoader,  # 非结构化Word文档加载器
+    UnstructuredHTMLLoader,  # 非结构化HTML文档加载器
+    UnstructuredMarkdownLoader,  # 非结构化Markdown文档加载器
+)
+
+# 文件后缀到文档加载器及其参数的映射，决定了哪些文件会被加入知识库
+# 要利用json数据要设置jq语句和content_key提取特定字段，这在不同json数据结构中有所不同，较为繁琐，因此暂不支持。
+# 官方文档：https://api.python.langchain.com/en/latest/document_loaders/langchain_community.document_loaders.json_loader.JSONLoader.html
+LOADERS = {
+    ".pdf": (PyPDFLoader, {}),  # PDF文件
+    ".docx": (UnstructuredWordDocumentLoader, {}),  # Word文件
+    ".txt": (TextLoader, {"autodetect_encoding": True}),  # txt文件
+    ".csv": (CSVLoader, {"autodetect_encoding": True}),  # csv文件
+    ".html": (UnstructuredHTMLLoader, {}),  # html文件
+    ".mhtml": (MHTMLLoader, {}),  # mhtml文件
+    ".md": (UnstructuredMarkdownLoader, {}),  # markdown文件
+}
+
+
+def load_file(file_path: str) -> Tuple[str, List[Document]]:
+    """
+    根据文件后缀选择加载器加载单个文件，加载失败时返回空列表。该函数在子进程中执行
+
+    Args:
+        file_path (str): 文件路径
+
+    Returns:
+        Tuple[str, List[Document]]: 文件路径和文件中的文档
+    """
+    loader_cls, loader_kwargs = LOADERS[os.path.splitext(file_path)[1].lower()]
+    try:
+        return file_path, loader_cls(file_path, **loader_kwargs).load()
+    except Exception as e:
+        print(f"加载文件 {file_path} 失败: {e}")
+        return file_path, []
@@ -6,38 +6,74 @@ from config.config import Config  # 配置管理器，用于读取配置信息
 from env import get_app_root  # 获取应用根目录的函数
 
 import os  # 操作系统接口模块，用于文件和目录操作
+import time  # 时间相关功能，用于限制构建失败后的重试频率
+import json  # JSON处理，用于保存去重报告
+import uuid  # UUID模块，用于生成向量ID
+import threading  # 线程模块，用于在后台构建向量库
+from typing import Any, Callable, Dict, List  # 类型提示
+from dataclasses import dataclass, field  # 数据类，用于描述一份完整的索引状态
 import shutil  # 高级文件操作模块，用于删除目录等操作
 import markdown  # Markdown处理模块（虽然导入了但未使用）
 import unstructured  # 非结构化数据处理模块（虽然导入了但未使用）
 import docx  # Word文档处理模块（虽然导入了但未使用）
 
 # 导入第三方库
-from langchain_community.embeddings import ModelScopeEmbeddings  # ModelScope嵌入模型，用于文本向量化
+import numpy as np  # 数值计算库，用于构造查询向量
 from langchain_core.vectorstores import VectorStoreRetriever  # 向量存储检索器基类
-from langchain_community.document_loaders import (  # 文档加载器，用于加载不同格式的文档
-    DirectoryLoader,  # 目录加载器，用于批量加载目录中的文件
-    PyPDFLoader,  # PDF文档加载器
-    JSONLoader,  # JSON文档加载器
-    MHTMLLoader,  # MHTML文档加载器
-    TextLoader,  # 文本文件加载器
-    CSVLoader,  # CSV文件加载器
-)
-from langchain_community.document_loaders import (  # 更多文档加载器
-    UnstructuredWordDocumentLoader,  # 非结构化Word文档加载器
-    UnstructuredHTMLLoader,  # 非结构化HTML文档加载器
-    UnstructuredMarkdownLoader,  # 非结构化Markdown文档加载器
-)
+from langchain_core.documents import Document  # 文档类
 from langchain_text_splitters import RecursiveCharacterTextSplitter  # 递归字符文本分割器，用于分割文档
 from langchain_community.vectorstores.faiss import FAISS  # FAISS向量存储，用于高效相似性搜索
 from modelscope.hub.snapshot_download import snapshot_download  # ModelScope模型下载函数
 
+# 导入项目模块
+from model.RAG.index_store import (  # 知识库索引的持久化与加载
+    INDEX_FORMAT_VERSION,  # 索引产物格式版本
+    embedding_fingerprint,  # 嵌入模型指纹
+    read_meta,  # 读取索引元数据
+    read_manifest,  # 读取知识库清单
+    save_index,  # 保存索引产物
+    load_index,  # 加载索引产物
+    load_sidecar,  # 加载附属索引
+)
+from model.RAG.manifest import Manifest, ManifestDiff  # 知识库清单和差异，用于增量构建
+from model.RAG.build_journal import BuildJournal  # 只追加的构建日志，用于中断后继续构建
+from model.RAG.ingest import walk_files, iter_documents  # 单次遍历目录、进程池并行解析文档
+from model.embedding.embedding_model import get_embedding, embedding_backend_key  # 批量嵌入模型和推理后端标识
+from model.RAG.bm25_index import BM25Index, reciprocal_rank_fusion  # BM25关键词索引和RRF融合
+from model.RAG.dedup import SimHashIndex  # 近重复分块去重
+from model.RAG.metadata_index import MetadataIndex, file_metadata  # 分块元数据列式索引，用于过滤检索
+from model.RAG.user_store_cache import UserStoreCache  # 内存受限的用户向量库LRU缓存
+from model.RAG.user_jobs import UserJobQueue  # 用户文件的后台索引任务
+from model.RAG.faiss_index import (  # 按配置创建精确或近似FAISS索引
+    index_settings,  # 读取向量索引配置
+    build_settings,  # 影响索引结构的配置项
+    apply_search_params,  # 设置nprobe/efSearch
+    search_parameters,  # 只在指定向量中检索的参数
+    supports_delete,  # 索引能否按位置删除向量
+    create_vectorstore,  # 训练索引并创建向量库
+)
+
+# 构建失败后重新尝试构建的最小间隔（秒）
+_RETRY_SECONDS = 60
+
+
+@dataclass
+class _IndexState:
+    """
+    一份完整的知识库索引：向量库、清单、BM25索引和元数据索引始终一起替换，检索时不会看到不一致的组合
+    """
+
+    vectorstore: FAISS | None = None  # 知识库向量库
+    manifest: Manifest = field(default_factory=Manifest)  # 知识库清单
+    bm25: BM25Index = field(default_factory=BM25Index)  # 与向量库同步的BM25关键词索引
+    version: str | None = None  # 索引版本，每次索引内容变化后更新，用于使依赖知识库的缓存失效
+    dedup: SimHashIndex | None = None  # 近重复分块索引，未启用去重时为None
+    metadata: MetadataIndex = field(default_factory=MetadataIndex)  # 与向量位置对齐的元数据索引
+
 
 # 检索模型类，继承自Modelbase
 class Retrievemodel(Modelbase):
 
-    # 声明_retriever属性，类型为VectorStoreRetriever
-    _retriever: VectorStoreRetriever
-
     def __init__(self, *args, **krgs):
         """初始化检索模型"""
         # 调用父类初始化方法
@@ -74,8 +110,8 @@ class Retrievemodel(Modelbase):
         # 设置文本分割器为递归字符分割器
         self._text_splitter = RecursiveCharacterTextSplitter
         # self._embedding = OpenAIEmbeddings()
-        # 设置嵌入模型为ModelScope嵌入模型
-        self._embedding = ModelScopeEmbeddings(model_id=self._embedding_model_path)
+        # 设置嵌入模型为ModelScope嵌入模型，按配置的批量大小和线程数分批嵌入
+        self._embedding = get_embedding(self._embedding_model_path)
         # 从配置中获取数据路径
         self._data_path = Config.get_instance().get_with_nested_params(
             "Knowledge-base-path"
@@ -83,330 +119,1073 @@ class Retrievemodel(Modelbase):
         # 如果数据路径不存在，则创建该目录
         if not os.path.exists(self._data_path):
             os.makedirs(self._data_path)
-        # 初始化用户检索器字典，用于存储不同用户的检索器
-        self._user_retrievers = {}
-
+        # 用户向量库保存在各自的用户目录中，内存中只按LRU保留配置总大小以内的向量库
+        self._user_stores = UserStoreCache(
+            int(Config.get_instance().get_with_nested_params("User-store-memory-mb"))
+            * 1024
+            * 1024,
+            self._load_user_store,
+        )
+        # 用户上传或删除文件后在后台增量更新向量库，从配置中获取同时执行的任务数
+        self._user_jobs = UserJobQueue(
+            Config.get_instance().get_with_nested_params("User-store-index-workers")
+        )
 
-    # 建立向量库
-    def build(self):
-        """建立向量库，加载各种格式的文档并构建向量存储"""
-
-        # 加载PDF文件
-        pdf_loader = DirectoryLoader(
-            self._data_path,
-            glob="**/*.pdf",
-            loader_cls=PyPDFLoader,
-            silent_errors=True,
-            use_multithreading=True,
+        # 从配置中获取解析文档的进程数，0表示使用CPU核心数
+        self._ingest_workers = Config.get_instance().get_with_nested_params(
+            "Knowledge-base-ingest-workers"
         )
-        pdf_docs = pdf_loader.load()
-
-        # 加载Word文件
-        docx_loader = DirectoryLoader(
-            self._data_path,
-            glob="**/*.docx",
-            loader_cls=UnstructuredWordDocumentLoader,
-            silent_errors=True,
-            use_multithreading=True,
+
+        # 从配置中获取构建时每批嵌入的分块数，每批加入索引后追加到构建日志中作为检查点
+        self._build_batch_size = int(
+            Config.get_instance().get_with_nested_params("Knowledge-base-build-batch-size")
         )
-        docx_docs = docx_loader.load()
-
-        # 加载txt文件
-        txt_loader = DirectoryLoader(
-            self._data_path,
-            glob="**/*.txt",
-            loader_cls=TextLoader,
-            silent_errors=True,
-            loader_kwargs={"autodetect_encoding": True},
-            use_multithreading=True,
+
+        # 从配置中获取近重复分块去重参数
+        self._dedup_settings = Config.get_instance().get_with_nested_params(
+            "Knowledge-base-dedup"
         )
-        txt_docs = txt_loader.load()
-
-        # 加载csv文件
-        csv_loader = DirectoryLoader(
-            self._data_path,
-            glob="**/*.csv",
-            loader_cls=CSVLoader,
-            silent_errors=True,
-            loader_kwargs={"autodetect_encoding": True},
-            use_multithreading=True,
+
+        # 从配置中获取知识库索引产物的保存路径，相对路径以应用根目录为基准
+        self._index_path = os.path.join(
+            get_app_root(),
+            Config.get_instance().get_with_nested_params("Knowledge-base-index-path"),
         )
-        csv_docs = csv_loader.load()
-
-        # 加载html文件
-        html_loader = DirectoryLoader(
-            self._data_path,
-            glob="**/*.html",
-            loader_cls=UnstructuredHTMLLoader,
-            silent_errors=True,
-            use_multithreading=True,
+        # 构建日志保存在索引目录旁边，构建完成并保存索引后删除
+        self._journal = BuildJournal(f"{self._index_path}.journal")
+        # 嵌入模型指纹，模型或推理后端发生变化时已保存的索引作废
+        self._embedding_fingerprint = embedding_fingerprint(
+            self._embedding_model_name,
+            "{}#{}".format(
+                Config.get_instance().get_with_nested_params(
+                    "model", "embedding", "model-version"
+                ),
+                embedding_backend_key(),
+            ),
+            self._embedding_model_path,
         )
-        html_docs = html_loader.load()
-
-        # 加载mhtml文件
-        mhtml_loader = DirectoryLoader(
-            self._data_path,
-            glob="**/*.mhtml",
-            loader_cls=MHTMLLoader,
-            silent_errors=True,
-            use_multithreading=True,
+        # 从配置中获取向量索引类型及其参数
+        self._index_settings = index_settings()
+        # 当前对外提供检索的索引状态，构建在另一份索引上进行，完成后整体替换
+        self._state = _IndexState()
+        self._build_lock = threading.Lock()  # 防止同时进行多个构建
+        self._last_failure = 0.0  # 上次构建失败的时间，用于限制重试频率
+        self._model_status = ModelStatus.INITIAL
+        # 启动时尝试加载已保存的索引，避免首次提问时重新构建
+        state = self._load_index()
+        if state is not None:
+            self._state = state
+            self._model_status = ModelStatus.READY
+            # 在后台比较索引与知识库目录，不一致时增量更新，旧索引继续提供检索，启动时不读取文件内容
+            self._build_in_background()
+
+    def _load_index(self, mmap: bool = True) -> "_IndexState | None":
+        """
+        加载磁盘上的索引产物和清单，只有格式版本、嵌入模型和索引结构配置都未变化时才会加载
+
+        Args:
+            mmap (bool): 是否尝试内存映射读取索引
+
+        Returns:
+            _IndexState | None: 加载的索引状态，不存在或已失效时返回None
+        """
+        meta = read_meta(self._index_path)
+        if meta is None:
+            return None
+        if meta.get("format_version") != INDEX_FORMAT_VERSION:
+            print("知识库索引格式版本已变化，需要重新构建")
+            return None
+        if meta.get("embedding") != self._embedding_fingerprint:
+            print("嵌入模型已变化，需要重新构建知识库索引")
+            return None
+        if meta.get("index") != build_settings(self._index_settings):
+            print("向量索引类型或参数已变化，需要重新构建知识库索引")
+            return None
+
+        try:
+            vectorstore = load_index(self._index_path, self._embedding, mmap=mmap)
+        except Exception as e:
+            print(f"加载知识库索引失败: {e}")
+            return None
+        apply_search_params(vectorstore.index, self._index_settings)
+        # 加载BM25索引，旧产物中没有时根据文档库重新建立，无需重新嵌入
+        bm25 = load_sidecar(self._index_path, "bm25")
+        if bm25 is None:
+            bm25 = BM25Index()
+            ids = list(vectorstore.index_to_docstore_id.values())
+            bm25.add(ids, (vectorstore.docstore.search(i).page_content for i in ids))
+        # 加载近重复分块索引，没有或参数已变化时根据文档库重新建立
+        dedup = None
+        if self._dedup_settings["enabled"]:
+            dedup = load_sidecar(self._index_path, "dedup")
+            expected = self._new_dedup_index()
+            if dedup is None or dedup.settings() != expected.settings():
+                dedup = expected
+                ids = list(vectorstore.index_to_docstore_id.values())
+                dedup.add(ids, [vectorstore.docstore.search(i).page_content for i in ids])
+        manifest = Manifest(read_manifest(self._index_path))
+        # 加载元数据索引，没有或与向量顺序不一致时根据清单重新建立
+        metadata = load_sidecar(self._index_path, "metadata")
+        ids = list(vectorstore.index_to_docstore_id.values())
+        if metadata is None or not metadata.aligned(ids):
+            metadata = self._rebuild_metadata(manifest, ids)
+        print(f"已从 {self._index_path} 加载知识库索引，共 {meta.get('ntotal')} 个向量")
+        return _IndexState(
+            vectorstore=vectorstore,
+            manifest=manifest,
+            bm25=bm25,
+            version=str(meta.get("created_at")),
+            dedup=dedup,
+            metadata=metadata,
         )
-        mhtml_docs = mhtml_loader.load()
-
-        # 加载markdown文件
-        markdown_loader = DirectoryLoader(
-            self._data_path,
-            glob="**/*.md",
-            loader_cls=UnstructuredMarkdownLoader,
-            silent_errors=True,
-            use_multithreading=True,
+
+    @staticmethod
+    def _rebuild_metadata(manifest: Manifest, ids: List[str]) -> MetadataIndex:
+        """
+        根据清单中每个文件的向量ID重新建立元数据索引，无需重新解析文档
+
+        Args:
+            manifest (Manifest): 知识库清单
+            ids (List[str]): 按向量位置排列的文档ID
+
+        Returns:
+            MetadataIndex: 元数据索引
+        """
+        by_id = {}  # 文档ID -> 所属文件的元数据
+        for rel_path, entry in manifest.to_dict().items():
+            metadata = file_metadata(rel_path, entry["mtime_ns"])
+            for doc_id in entry["ids"]:
+                by_id[doc_id] = metadata
+        index = MetadataIndex()
+        index.add(ids, [by_id.get(doc_id, {}) for doc_id in ids])
+        return index
+
+    def _new_dedup_index(self) -> SimHashIndex | None:
+        """
+        按配置创建空的近重复分块索引
+
+        Returns:
+            SimHashIndex | None: 近重复分块索引，未启用去重时返回None
+        """
+        if not self._dedup_settings["enabled"]:
+            return None
+        return SimHashIndex(
+            self._dedup_settings["max-distance"],
+            self._dedup_settings["shingle-size"],
+            self._dedup_settings["min-chars"],
         )
-        markdown_docs = markdown_loader.load()
-
-        # 要利用json数据要设置jq语句和content_key提取特定字段，这在不同json数据结构中有所不同，较为繁琐。
-        # 官方文档：https://api.python.langchain.com/en/latest/document_loaders/langchain_community.document_loaders.json_loader.JSONLoader.html
-        # json_loader = DirectoryLoader(self._data_path, glob="**/*.json", loader_kwargs={"jq_schema": ".","text_content":False},loader_cls=JSONLoader, silent_errors=True)
-        # json_docs = json_loader.load()
-
-        # 合并所有文档
-        docs = (
-            pdf_docs
-            + docx_docs
-            + txt_docs
-            + csv_docs
-            + html_docs
-            + mhtml_docs
-            + markdown_docs
+
+    def _save_index(self, state: "_IndexState", changed: bool) -> bool:
+        """
+        保存索引、文档库、清单和BM25索引，构建过程中也用于保存检查点
+
+        Args:
+            state (_IndexState): 要保存的索引状态
+            changed (bool): 索引内容是否有变化，有变化时更新索引版本
+
+        Returns:
+            bool: 是否保存成功
+        """
+        if changed:
+            # 先更新版本，保存成功后改用产物的创建时间，重启后版本保持一致
+            state.version = uuid.uuid4().hex
+        try:
+            meta = save_index(
+                state.vectorstore,
+                self._index_path,
+                {
+                    "embedding": self._embedding_fingerprint,
+                    "index": build_settings(self._index_settings),
+                },
+                state.manifest.to_dict(),
+                {"bm25": state.bm25, "dedup": state.dedup, "metadata": state.metadata},
+            )
+        except Exception as e:
+            print(f"保存知识库索引失败: {e}")
+            return False
+        if changed:
+            state.version = str(meta["created_at"])
+        print(f"知识库索引已保存到 {self._index_path}，共 {meta['ntotal']} 个向量")
+        return True
+
+    def _add_batch(
+        self,
+        state: "_IndexState",
+        splits: List[Document],
+        ids: List[str],
+        vectors: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        嵌入一批分块并加入向量库、BM25索引和元数据索引，第一批分块同时用于训练近似索引
+
+        Args:
+            state (_IndexState): 正在构建的索引状态
+            splits (List[Document]): 文档分块
+            ids (List[str]): 与分块一一对应的向量ID
+            vectors (np.ndarray | None): 已有的分块向量（重放构建日志时），为None时嵌入分块
+
+        Returns:
+            np.ndarray: 分块向量
+        """
+        texts = [split.page_content for split in splits]
+        if vectors is None:
+            vectors = np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+        if state.vectorstore is None:
+            state.vectorstore = create_vectorstore(
+                splits, vectors, ids, self._embedding, self._index_settings
+            )
+        else:
+            state.vectorstore.add_embeddings(
+                zip(texts, vectors),
+                metadatas=[split.metadata for split in splits],
+                ids=ids,
+            )
+        # 同一批次中更新BM25索引和元数据索引，保持与向量库一致
+        state.bm25.add(ids, texts)
+        state.metadata.add(ids, [split.metadata for split in splits])
+        return vectors
+
+    # 建立向量库
+    def build(self):
+        """
+        建立向量库，只重新解析和嵌入新增或修改过的文件，并删除已删除文件的向量。
+        构建在从磁盘以非内存映射方式重新加载的另一份索引上进行，期间当前索引照常提供检索，完成后整体替换，
+        因此构建期间内存中同时有新旧两份索引，峰值内存约为索引大小的两倍。
+        同一时间只进行一个构建，其他调用等待其完成
+        """
+        with self._build_lock:
+            self._model_status = ModelStatus.BUILDING
+            try:
+                self._build()
+            except Exception:
+                self._last_failure = time.time()
+                self._model_status = ModelStatus.FAILED
+                raise
+            self._model_status = ModelStatus.READY
+
+    def _build(self):
+        """
+        增量构建知识库索引并替换当前索引，调用方需持有构建锁。
+        文件按解析→分割→嵌入→加入索引的流水线分批处理，内存中只保留一个批次的分块；
+        每一步都追加到构建日志中，构建中断后再次构建时在上次完整的索引上重放日志，从中断处继续。
+        完整的索引只在构建结束时保存一次
+        """
+        # 遍历一次知识库目录，与当前索引的清单比较，没有变化时无需构建
+        file_paths = list(walk_files(self._data_path))
+        diff = self._state.manifest.diff(self._data_path, file_paths)
+        if self._state.vectorstore is not None and diff.is_empty() and not diff.touched:
+            return
+        # 本次构建中的其余比较都复用这里的哈希，每个文件的内容最多读取一次
+        known = {**self._state.manifest.hashes(), **diff.stats, **diff.touched}
+
+        # 从磁盘加载一份可修改的索引并重放上次中断的构建日志，不影响正在提供检索的索引
+        state, resumed = self._resume_state()
+        if state.manifest.to_dict() != self._state.manifest.to_dict():
+            diff = state.manifest.diff(self._data_path, file_paths, known)
+        print(
+            f"知识库变化：新增 {len(diff.added)} 个，修改 {len(diff.changed)} 个，删除 {len(diff.deleted)} 个文件"
         )
 
+        # 删除已删除和已修改文件的旧向量
+        try:
+            removed = self._delete_stale(state, diff)
+        except RuntimeError as e:
+            # IVF、HNSW索引删除向量后位置与文档ID对不上或不支持删除，只能重新构建整个索引
+            print(f"当前索引不支持删除向量，重新构建整个知识库索引: {e}")
+            state, resumed = _IndexState(dedup=self._new_dedup_index()), False
+            diff = state.manifest.diff(self._data_path, file_paths, known)
+            self._journal.start(self._journal_header(None))
+        else:
+            if removed:
+                self._journal.append("delete", removed)
+        # 内容未变化的文件只更新大小和修改时间
+        for rel_path, (size, mtime_ns, _) in diff.touched.items():
+            state.manifest.touch(rel_path, size, mtime_ns)
+
         # 创建一个 RecursiveCharacterTextSplitter 对象，用于将文档分割成块，chunk_size为最大块大小，chunk_overlap块之间可以重叠的大小
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=2000, chunk_overlap=100
         )
-        splits = text_splitter.split_documents(docs)
 
-        # 使用 FAISS 创建一个向量数据库，存储分割后的文档及其嵌入向量
-        vectorstore = FAISS.from_documents(documents=splits, embedding=self._embedding)
-        # 将向量存储转换为检索器，设置检索参数 k 为 6，即返回最相似的 6 个文档
-        self._retriever = vectorstore.as_retriever(search_kwargs={"k": 6})
+        # 只在进程池中解析新增和修改过的文件，每个文件解析完后立即分割，攒够一批分块后嵌入并加入索引
+        splits = []  # 当前批次的分块
+        ids = []  # 当前批次的向量ID
+        records = []  # 当前批次包含的文件，批次加入索引后才写入清单和构建日志
+        report = {"chunks": 0, "dropped": 0, "files": {}}  # 去重报告：检查的分块数、丢弃数和各文件丢弃数
+        for file_path, docs in iter_documents(
+            [os.path.join(self._data_path, rel_path) for rel_path in diff.added + diff.changed],
+            self._ingest_workers,
+        ):
+            rel_path = os.path.relpath(file_path, self._data_path).replace(os.sep, "/")
+            file_splits = text_splitter.split_documents(docs)
+            file_ids = [uuid.uuid4().hex for _ in file_splits]
+            # 记录来源文件、文档类型、科室和修改日期，检索时可按这些字段过滤
+            metadata = file_metadata(rel_path, diff.stats[rel_path][1])
+            for split in file_splits:
+                split.metadata.update(metadata)
+            # 构建日志中保存文件的全部分块，重放时重新去重，去重索引与本次构建保持一致
+            record = {
+                "rel_path": rel_path,
+                "stats": diff.stats[rel_path],
+                "ids": file_ids,
+                "texts": [split.page_content for split in file_splits],
+                "metadatas": [split.metadata for split in file_splits],
+                "keep": None,
+            }
+            # 丢弃与已入库分块近重复的分块，不再嵌入
+            if state.dedup is not None:
+                keep = state.dedup.filter(file_ids, record["texts"], rel_path)
+                record["keep"] = keep
+                report["chunks"] += len(keep)
+                dropped = keep.count(False)
+                if dropped:
+                    report["dropped"] += dropped
+                    report["files"][rel_path] = dropped
+                    file_splits = [split for split, k in zip(file_splits, keep) if k]
+                    file_ids = [doc_id for doc_id, k in zip(file_ids, keep) if k]
+            splits.extend(file_splits)
+            ids.extend(file_ids)
+            records.append(record)
+
+            # 第一次建立近似索引时，第一批要攒够训练样本
+            threshold = self._build_batch_size
+            if state.vectorstore is None and self._index_settings["type"] != "flat":
+                threshold = max(threshold, int(self._index_settings["train-sample-size"]))
+            if len(splits) < threshold:
+                continue
+
+            self._flush_batch(state, splits, ids, records)
+            splits, ids, records = [], [], []
+
+        # 处理最后一个不满的批次
+        if records:
+            self._flush_batch(state, splits, ids, records)
+
+        if state.dedup is not None and report["chunks"]:
+            self._write_dedup_report(report)
+
+        if state.vectorstore is None:
+            print(f"知识库目录 {self._data_path} 中没有可用的文档")
+            self._journal.clear()
+            return
+
+        # 将索引、文档库和清单保存到磁盘，下次启动或构建时只处理变化的文件；保存成功后构建日志不再需要
+        changed = resumed or not diff.is_empty()
+        if changed or diff.touched:
+            if self._save_index(state, changed=changed):
+                self._journal.clear()
+
+        # 整体替换当前索引，正在进行的检索继续使用它们已取得的旧索引
+        self._state = state
+        print("知识库索引已更新")
+
+    def _journal_header(self, base: str | None) -> Dict[str, Any]:
+        """
+        生成构建日志头，只有基于同一份索引、且嵌入模型和构建配置都未变化时日志才能重放
+
+        Args:
+            base (str | None): 日志所基于的索引版本，从空索引开始构建时为None
+
+        Returns:
+            Dict[str, Any]: 日志头
+        """
+        header = {
+            "base": base,
+            "format_version": INDEX_FORMAT_VERSION,
+            "embedding": self._embedding_fingerprint,
+            "index": build_settings(self._index_settings),
+            "dedup": dict(self._dedup_settings),
+            "batch_size": self._build_batch_size,
+        }
+        # 经过一次JSON往返，与从文件读出的日志头可以直接比较
+        return json.loads(json.dumps(header))
+
+    def _resume_state(self) -> "tuple[_IndexState, bool]":
+        """
+        从磁盘加载一份可修改的索引，存在与之对应的构建日志时按顺序重放，否则开始一份新的日志
+
+        Returns:
+            tuple[_IndexState, bool]: 索引状态，以及是否重放了上次中断的构建
+        """
+        state = self._load_index(mmap=False) or _IndexState(dedup=self._new_dedup_index())
+        header = self._journal_header(state.version if state.vectorstore is not None else None)
+        if self._journal.header() == header:
+            try:
+                count = 0
+                for kind, payload in self._journal.records():
+                    if kind == "delete":
+                        self._remove_files(state, payload)
+                    else:
+                        self._replay_batch(state, payload)
+                    count += 1
+                if count:
+                    print(f"已重放构建日志中的 {count} 个记录，从上次中断处继续构建")
+                return state, count > 0
+            except Exception as e:
+                # 日志与索引对不上时放弃日志，从上次完整的索引重新构建
+                print(f"重放构建日志失败，放弃上次中断的构建: {e}")
+                state = self._load_index(mmap=False) or _IndexState(dedup=self._new_dedup_index())
+        self._journal.start(header)
+        return state, False
+
+    def _flush_batch(
+        self, state: "_IndexState", splits: List[Document], ids: List[str], records: List[dict]
+    ):
+        """
+        把一批分块嵌入并加入索引，把批次中的文件写入清单，再把批次追加到构建日志
+
+        Args:
+            state (_IndexState): 正在构建的索引状态
+            splits (List[Document]): 去重后保留的分块
+            ids (List[str]): 与分块一一对应的向量ID
+            records (List[dict]): 批次中各文件的日志记录
+        """
+        vectors = self._add_batch(state, splits, ids) if splits else None
+        self._set_files(state, records)
+        self._journal.append("batch", {"files": records, "vectors": vectors})
+
+    def _replay_batch(self, state: "_IndexState", payload: dict):
+        """
+        重放构建日志中的一个批次：按相同顺序重新去重，用日志中的向量加入索引，无需重新嵌入
+
+        Args:
+            state (_IndexState): 正在构建的索引状态
+            payload (dict): 批次记录，包括各文件的全部分块和保留分块的向量
+
+        Raises:
+            ValueError: 去重结果与日志不一致
+        """
+        splits = []
+        ids = []
+        for record in payload["files"]:
+            keep = [True] * len(record["ids"])
+            if state.dedup is not None:
+                keep = state.dedup.filter(record["ids"], record["texts"], record["rel_path"])
+            if keep != (record["keep"] or [True] * len(record["ids"])):
+                raise ValueError(f"文件 {record['rel_path']} 的去重结果与构建日志不一致")
+            for doc_id, text, metadata, k in zip(record["ids"], record["texts"], record["metadatas"], keep):
+                if k:
+                    splits.append(Document(page_content=text, metadata=metadata))
+                    ids.append(doc_id)
+        if splits:
+            self._add_batch(state, splits, ids, payload["vectors"])
+        self._set_files(state, payload["files"])
+
+    @staticmethod
+    def _set_files(state: "_IndexState", records: List[dict]):
+        """
+        把已加入索引的文件及其保留分块的向量ID写入清单
+
+        Args:
+            state (_IndexState): 正在构建的索引状态
+            records (List[dict]): 各文件的日志记录
+        """
+        for record in records:
+            size, mtime_ns, sha256 = record["stats"]
+            kept = [
+                doc_id
+                for doc_id, k in zip(record["ids"], record["keep"] or [True] * len(record["ids"]))
+                if k
+            ]
+            state.manifest.set(record["rel_path"], size, mtime_ns, sha256, kept)
+
+    def _delete_stale(self, state: "_IndexState", diff: ManifestDiff) -> List[str]:
+        """
+        删除已删除和已修改文件的向量，并从清单中移除这些文件。
+        被删除的分块若曾使其他文件的近重复分块被丢弃，这些文件也加入待处理列表重新处理，避免内容从知识库中消失
+
+        Args:
+            state (_IndexState): 正在构建的索引状态
+            diff (ManifestDiff): 本次构建的差异，重新处理的文件会加入其中
+
+        Returns:
+            List[str]: 从索引中移除的全部文件，写入构建日志
+
+        Raises:
+            RuntimeError: 索引不支持按位置删除向量（IVF、HNSW）
+        """
+        removed = []
+        pending = diff.deleted + diff.changed
+        while pending:
+            removed.extend(pending)
+            dependents = self._remove_files(state, pending)
+            pending = []
+            for rel_path in dependents:
+                stats = state.manifest.stats(rel_path)
+                if stats is not None:
+                    diff.changed.append(rel_path)
+                    diff.stats[rel_path] = stats
+                    pending.append(rel_path)
+            if pending:
+                print(f"{len(pending)} 个文件的重复分块所依赖的内容已删除，重新处理这些文件")
+        return removed
+
+    @staticmethod
+    def _remove_files(state: "_IndexState", rel_paths: List[str]) -> set:
+        """
+        从向量库、BM25索引、元数据索引、去重索引和清单中删除文件的向量
+
+        Args:
+            state (_IndexState): 正在构建的索引状态
+            rel_paths (List[str]): 要删除的文件
+
+        Returns:
+            set: 曾因与被删除分块重复而丢弃了分块的文件
+
+        Raises:
+            RuntimeError: 索引不支持按位置删除向量（IVF、HNSW）
+        """
+        stale_ids = []
+        for rel_path in rel_paths:
+            stale_ids.extend(state.manifest.ids(rel_path))
+            state.manifest.remove(rel_path)
+        if not stale_ids or state.vectorstore is None:
+            return set()
+        if not supports_delete(state.vectorstore.index):
+            # IVF的remove_ids保留剩余向量原来的编号，而LangChain会把位置重新编号，之后的检索会返回错误的文档
+            raise RuntimeError(f"{type(state.vectorstore.index).__name__} 不支持删除向量")
+        state.vectorstore.delete(stale_ids)
+        state.bm25.delete(stale_ids)
+        state.metadata.delete(stale_ids)
+        if state.dedup is None:
+            return set()
+        return state.dedup.delete(stale_ids)
+
+    def _write_dedup_report(self, report: dict):
+        """
+        打印并保存本次构建的去重报告，报告保存在索引目录旁边
 
-        # 设置模型状态为 BUILDING
-        self._model_status = ModelStatus.BUILDING
+        Args:
+            report (dict): 检查的分块数、丢弃数和各文件丢弃数
+        """
+        report = dict(report, ratio=report["dropped"] / report["chunks"], created_at=time.time())
+        print(
+            f"近重复去重：检查 {report['chunks']} 个分块，丢弃 {report['dropped']} 个（{report['ratio']:.1%}）"
+        )
+        report_path = f"{self._index_path}.dedup.json"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"保存去重报告失败: {e}")
 
     @property
-    def retriever(self) -> VectorStoreRetriever:
+    def vectorstore(self) -> FAISS | None:
         """
-        获取检索器属性
-        
+        获取知识库向量库
+
+        Returns:
+            FAISS | None: 向量库，尚未构建时为None
+        """
+        return self._state.vectorstore
+
+    @property
+    def embedding(self):
+        """
+        获取嵌入模型
+
+        Returns:
+            BatchEmbeddings: 批量嵌入模型
+        """
+        return self._embedding
+
+    @property
+    def index_version(self) -> str | None:
+        """
+        获取当前知识库索引的版本，知识库重新构建后会变化
+
+        Returns:
+            str | None: 索引版本，尚未构建时为None
+        """
+        return self._state.version
+
+    @property
+    def index_path(self) -> str:
+        """
+        获取知识库索引产物的保存目录
+
+        Returns:
+            str: 索引目录
+        """
+        return self._index_path
+
+    def _dense_search(
+        self, vectorstore: FAISS, query: str, k: int, allowed: np.ndarray | None = None
+    ) -> List[str]:
+        """
+        向量检索，返回文档ID
+
+        Args:
+            vectorstore (FAISS): 向量库
+            query (str): 查询文本
+            k (int): 返回结果数
+            allowed (np.ndarray | None): 只在这些向量位置中检索，为None时检索全部向量
+
         Returns:
-            VectorStoreRetriever: 向量存储检索器
+            List[str]: 按相似度排列的文档ID
         """
-        # 如果模型状态为FAILED，则重新构建模型
-        if self._model_status == ModelStatus.FAILED:
-            self.build()
-            return self._retriever
+        vector = np.asarray([self._embedding.embed_query(query)], dtype=np.float32)
+        if allowed is None:
+            _, positions = vectorstore.index.search(vector, k)
         else:
-            # 否则直接返回检索器
-            return self._retriever
+            # 过滤条件作为ID选择器在FAISS内部生效，返回的都是满足条件的向量
+            _, positions = vectorstore.index.search(
+                vector, k, params=search_parameters(vectorstore.index, self._index_settings, allowed)
+            )
+        return [
+            vectorstore.index_to_docstore_id[position]
+            for position in positions[0]
+            if position != -1
+        ]
+
+    def _build_in_background(self, on_done: Callable[[bool], None] | None = None):
+        """
+        在后台线程中构建向量库，已有构建在进行时直接返回
+
+        Args:
+            on_done (Callable[[bool], None] | None): 构建结束后在后台线程中调用，参数为是否成功
+        """
+        if self._build_lock.locked():
+            return
+
+        def run():
+            try:
+                self.build()
+            except Exception as e:
+                print(f"构建知识库索引失败: {e}")
+                success = False
+            else:
+                success = True
+            if on_done is not None:
+                on_done(success)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def update_in_background(self, on_done: Callable[[bool], None] | None = None) -> bool:
+        """
+        在后台增量更新知识库索引，供目录监视器在发现文件变化后调用
+
+        Args:
+            on_done (Callable[[bool], None] | None): 更新结束后调用，参数为是否成功
+
+        Returns:
+            bool: 是否已开始更新，已有构建在进行时返回False，调用方稍后再试
+        """
+        if self._build_lock.locked():
+            return False
+        self._build_in_background(on_done)
+        return True
+
+    def _ensure_built(self):
+        """
+        尚未构建过索引，或上次构建失败且已超过重试间隔时，在后台开始构建
+        """
+        if self._model_status == ModelStatus.INITIAL or (
+            self._model_status == ModelStatus.FAILED
+            and time.time() - self._last_failure >= _RETRY_SECONDS
+        ):
+            self._build_in_background()
+
+    def search(
+        self, query: str, k: int = 6, filter: Dict[str, Any] | None = None
+    ) -> List[Document]:
+        """
+        混合检索：向量检索和BM25关键词检索各召回若干候选，用RRF融合后返回前k个文档。
+        检索从不等待构建：索引尚未就绪时在后台构建并返回空结果，重建期间继续使用旧索引。
+        传入过滤条件时先在元数据索引上算出满足条件的向量，两路检索都只在这些向量中进行
 
-    def build_user_vector_store(self):
-        """根据用户的ID加载用户文件夹中的文件并为用户构建向量库"""
+        Args:
+            query (str): 查询文本
+            k (int): 返回结果数
+            filter (Dict[str, Any] | None): 按来源文件、文档类型、科室和修改日期过滤，格式见MetadataIndex.select
+
+        Returns:
+            List[Document]: 检索到的文档
+        """
+        self._ensure_built()
+        # 取得当前索引的引用，检索过程中即使索引被替换也使用同一份
+        state = self._state
+        if state.vectorstore is None:
+            print("知识库索引正在构建中，暂时没有可用的检索结果")
+            return []
+
+        allowed = None  # 满足过滤条件的向量位置
+        allowed_ids = None  # 满足过滤条件的文档ID
+        if filter:
+            allowed = state.metadata.select(filter)
+            if len(allowed) == 0:
+                return []
+            allowed_ids = set(state.metadata.doc_ids(allowed))
+
+        hybrid = Config.get_instance().get_with_nested_params("model", "hybrid")
+        if not hybrid["enabled"]:
+            if allowed is None:
+                return state.vectorstore.similarity_search(query, k=k)
+            ids = self._dense_search(state.vectorstore, query, k, allowed)
+            return [state.vectorstore.docstore.search(doc_id) for doc_id in ids]
+        candidates = max(k, int(hybrid["candidates"]))
+        dense_ids = self._dense_search(state.vectorstore, query, candidates, allowed)
+        lexical_ids = [
+            doc_id for doc_id, _ in state.bm25.search(query, candidates, allowed_ids)
+        ]
+        ids = reciprocal_rank_fusion([dense_ids, lexical_ids], k=int(hybrid["rrf-k"]))[:k]
+        return [state.vectorstore.docstore.search(doc_id) for doc_id in ids]
+
+    @property
+    def retriever(self) -> VectorStoreRetriever | None:
+        """
+        获取检索器属性，索引尚未就绪时在后台构建并返回None
+        
+        Returns:
+            VectorStoreRetriever | None: 向量存储检索器
+        """
+        self._ensure_built()
+        vectorstore = self._state.vectorstore
+        if vectorstore is None:
+            return None
+        # 将向量存储转换为检索器，设置检索参数 k 为 6，即返回最相似的 6 个文档
+        return vectorstore.as_retriever(search_kwargs={"k": 6})
+
+    def _resolve_user_id(self, user_id: str | None) -> str:
+        """
+        确定本次调用的用户ID。并发请求应显式传入用户ID，未传入时才退回到实例上的user_id
+
+        Args:
+            user_id (str | None): 调用方传入的用户ID
+
+        Returns:
+            str: 用户ID
+        """
+        if user_id is None:
+            user_id = self.user_id
+        if user_id is None:
+            raise ValueError("未指定用户ID")
+        return user_id
+
+    def _user_index_path(self, user_id: str) -> str:
+        """
+        获取用户向量库的保存目录，位于用户文件夹内的隐藏目录，解析文件时会被跳过
+
+        Args:
+            user_id (str): 用户ID
+
+        Returns:
+            str: 索引目录
+        """
+        return os.path.join("user_data", user_id, ".index")
+
+    def _load_user_store(self, user_id: str, mmap: bool = True) -> FAISS | None:
+        """
+        从磁盘加载用户的向量库，格式版本或嵌入模型变化时视为不存在
+
+        Args:
+            user_id (str): 用户ID
+            mmap (bool): 是否尝试内存映射读取索引，需要增删向量时为False
+
+        Returns:
+            FAISS | None: 用户的向量库，不存在或已失效时返回None
+        """
+        index_path = self._user_index_path(user_id)
+        meta = read_meta(index_path)
+        if meta is None:
+            return None
+        if (
+            meta.get("format_version") != INDEX_FORMAT_VERSION
+            or meta.get("embedding") != self._embedding_fingerprint
+        ):
+            print(f"用户 {user_id} 的向量库已失效，需要重新构建")
+            return None
+        try:
+            vectorstore = load_index(index_path, self._embedding, mmap=mmap)
+        except Exception as e:
+            print(f"加载用户 {user_id} 的向量库失败: {e}")
+            return None
+        print(f"已从 {index_path} 加载用户 {user_id} 的向量库")
+        return vectorstore
+
+    def build_user_vector_store(self, user_id: str | None = None):
+        """
+        根据用户的ID加载用户文件夹中的文件并为用户构建向量库，构建完成后保存到用户文件夹
+
+        Args:
+            user_id (str | None): 用户ID，未传入时使用实例上的user_id
+        """
+        user_id = self._resolve_user_id(user_id)
         # 构建用户数据路径，每个用户有独立的文件夹
-        user_data_path = os.path.join("user_data", self.user_id)  # 用户独立文件夹
+        user_data_path = os.path.join("user_data", user_id)  # 用户独立文件夹
         # 检查用户文件夹是否存在
         if not os.path.exists(user_data_path):
             print(f"用户文件夹 {user_data_path} 不存在")
             return
 
-        try:
-            # 清理旧的向量库（如果已经存在）
-            if self.user_id in self._user_retrievers:
-                del self._user_retrievers[self.user_id]
-                print(f"用户 {self.user_id} 的旧向量库已删除")
-
-                # 加载用户文件夹中的文件并构建向量库
-                # 加载PDF文件
-            pdf_loader = DirectoryLoader(
-                user_data_path,
-                glob="**/*.pdf",
-                loader_cls=PyPDFLoader,
-                silent_errors=True,
-                use_multithreading=True,
-            )
-            pdf_docs = pdf_loader.load()
-
-            # 加载Word文件
-            docx_loader = DirectoryLoader(
-                user_data_path,
-                glob="**/*.docx",
-                loader_cls=UnstructuredWordDocumentLoader,
-                silent_errors=True,
-                use_multithreading=True,
-            )
-            docx_docs = docx_loader.load()
-
-            # 加载txt文件
-            txt_loader = DirectoryLoader(
-                user_data_path,
-                glob="**/*.txt",
-                loader_cls=TextLoader,
-                silent_errors=True,
-                loader_kwargs={"autodetect_encoding": True},
-                use_multithreading=True,
-            )
-            txt_docs = txt_loader.load()
-
-            # 加载csv文件
-            csv_loader = DirectoryLoader(
-                user_data_path,
-                glob="**/*.csv",
-                loader_cls=CSVLoader,
-                silent_errors=True,
-                loader_kwargs={"autodetect_encoding": True},
-                use_multithreading=True,
-            )
-            csv_docs = csv_loader.load()
-
-            # 加载html文件
-            html_loader = DirectoryLoader(
-                user_data_path,
-                glob="**/*.html",
-                loader_cls=UnstructuredHTMLLoader,
-                silent_errors=True,
-                use_multithreading=True,
-            )
-            html_docs = html_loader.load()
-
-            # 加载mhtml文件
-            mhtml_loader = DirectoryLoader(
-                user_data_path,
-                glob="**/*.mhtml",
-                loader_cls=MHTMLLoader,
-                silent_errors=True,
-                use_multithreading=True,
-            )
-            mhtml_docs = mhtml_loader.load()
-
-            # 加载markdown文件
-            markdown_loader = DirectoryLoader(
-                user_data_path,
-                glob="**/*.md",
-                loader_cls=UnstructuredMarkdownLoader,
-                silent_errors=True,
-                use_multithreading=True,
-            )
-            markdown_docs = markdown_loader.load()
-
-            # 要利用json数据要设置jq语句和content_key提取特定字段，这在不同json数据结构中有所不同，较为繁琐。
-            # 官方文档：https://api.python.langchain.com/en/latest/document_loaders/langchain_community.document_loaders.json_loader.JSONLoader.html
-            # json_loader = DirectoryLoader(self._data_path, glob="**/*.json", loader_kwargs={"jq_schema": ".","text_content":False},loader_cls=JSONLoader, silent_errors=True)
-            # json_docs = json_loader.load()
-
-            # 合并文档
-            docs = (
-                pdf_docs
-                + docx_docs
-                + txt_docs
-                + csv_docs
-                + html_docs
-                + mhtml_docs
-                + markdown_docs
-            )
+        # 同一用户的构建与加载互斥，不影响其他用户
+        with self._user_stores.user_lock(user_id):
+            self._build_user_vector_store(user_id, user_data_path)
 
-            # 检查是否有文档被加载
-            if not docs:
-                print(f"用户 {self.user_id} 文件夹中没有找到文档")
-                return
+    def _build_user_vector_store(self, user_id: str, user_data_path: str):
+        """
+        构建并保存用户的向量库，调用方需持有该用户的锁
+
+        Args:
+            user_id (str): 用户ID
+            user_data_path (str): 用户文件夹
+        """
+        try:
+            # 清理内存中的旧向量库（如果已经存在）
+            self._user_stores.discard(user_id)
 
-            # 创建文本分割器并分割文档
+            # 遍历一次用户文件夹，在进程池中解析文件，并记录每个文件的分块ID
+            manifest = Manifest()
+            diff = manifest.diff(user_data_path, walk_files(user_data_path))
             text_splitter = RecursiveCharacterTextSplitter(
                 chunk_size=2000, chunk_overlap=100
             )
-            splits = text_splitter.split_documents(docs)
+            splits = []
+            ids = []
+            for file_path, docs in iter_documents(
+                [os.path.join(user_data_path, rel_path) for rel_path in diff.added],
+                self._ingest_workers,
+            ):
+                rel_path = os.path.relpath(file_path, user_data_path).replace(os.sep, "/")
+                file_splits = text_splitter.split_documents(docs)
+                file_ids = [uuid.uuid4().hex for _ in file_splits]
+                splits.extend(file_splits)
+                ids.extend(file_ids)
+                size, mtime_ns, sha256 = diff.stats[rel_path]
+                manifest.set(rel_path, size, mtime_ns, sha256, file_ids)
+
+            # 检查是否有文档被加载
+            if not splits:
+                print(f"用户 {user_id} 文件夹中没有找到文档")
+                shutil.rmtree(self._user_index_path(user_id), ignore_errors=True)
+                return
 
             # 为该用户构建向量库
             vectorstore = FAISS.from_documents(
-                documents=splits, embedding=self._embedding
+                documents=splits, embedding=self._embedding, ids=ids
+            )
+            # 保存到用户文件夹，被移出内存后可以重新加载
+            save_index(
+                vectorstore,
+                self._user_index_path(user_id),
+                {"embedding": self._embedding_fingerprint},
+                manifest.to_dict(),
             )
-            # 创建用户特定的检索器
-            user_retriever = vectorstore.as_retriever(search_kwargs={"k": 6})
 
-            # 将用户的retriever存储到字典中
-            self._user_retrievers[self.user_id] = user_retriever
-            print(f"用户 {self.user_id} 的向量库已构建完成")
+            # 将用户的向量库放入缓存，必要时淘汰最近最少使用的其他用户的向量库
+            self._user_stores.put(user_id, vectorstore)
+            print(f"用户 {user_id} 的向量库已构建完成")
 
         except Exception as e:
             # 处理构建向量库时的异常
-            print(f"构建用户 {self.user_id} 向量库时出错: {e}")
+            print(f"构建用户 {user_id} 向量库时出错: {e}")
+
+    def _sync_user_file(self, user_id: str, filename: str):
+        """
+        按文件当前在磁盘上的状态增量更新用户的向量库：文件存在且内容有变化时只解析和嵌入这一个文件，
+        文件已删除时删除其向量。任务按文件状态而不是提交顺序处理，同一文件的上传和删除任务乱序执行也能得到正确结果。
+        修改在从磁盘加载的另一份向量库上进行，完成后保存并替换缓存，正在检索的请求继续使用旧向量库
+
+        Args:
+            user_id (str): 用户ID
+            filename (str): 用户文件夹中的文件名
+        """
+        user_data_path = os.path.join("user_data", user_id)
+        index_path = self._user_index_path(user_id)
+        file_path = os.path.join(user_data_path, filename)
+        rel_path = filename.replace(os.sep, "/")
+        with self._user_stores.user_lock(user_id):
+            vectorstore = self._load_user_store(user_id, mmap=False)
+            if vectorstore is None:
+                # 还没有向量库或已失效时，完整构建一次
+                if os.path.exists(user_data_path):
+                    self._build_user_vector_store(user_id, user_data_path)
+                return
+            manifest = Manifest(read_manifest(index_path))
+            stale_ids = manifest.ids(rel_path)
+
+            if os.path.isfile(file_path):
+                diff = manifest.diff(user_data_path, [file_path])
+                if rel_path in diff.touched:
+                    # 内容未变化，只更新大小和修改时间
+                    size, mtime_ns, _ = diff.touched[rel_path]
+                    manifest.touch(rel_path, size, mtime_ns)
+                elif rel_path in diff.stats:
+                    # 新增或内容变化：只解析、分割和嵌入这一个文件
+                    text_splitter = RecursiveCharacterTextSplitter(
+                        chunk_size=2000, chunk_overlap=100
+                    )
+                    docs = [
+                        doc
+                        for _, file_docs in iter_documents([file_path], 1)
+                        for doc in file_docs
+                    ]
+                    splits = text_splitter.split_documents(docs)
+                    ids = [uuid.uuid4().hex for _ in splits]
+                    if stale_ids:
+                        vectorstore.delete(stale_ids)
+                    if splits:
+                        vectorstore.add_documents(splits, ids=ids)
+                    size, mtime_ns, sha256 = diff.stats[rel_path]
+                    manifest.set(rel_path, size, mtime_ns, sha256, ids)
+                else:
+                    return
+            elif rel_path in manifest.to_dict():
+                # 文件已删除：删除其向量
+                if stale_ids:
+                    vectorstore.delete(stale_ids)
+                manifest.remove(rel_path)
+            else:
+                return
+
+            if len(manifest) == 0:
+                # 最后一个文件已删除，同时删除向量库
+                self._user_stores.discard(user_id)
+                shutil.rmtree(index_path, ignore_errors=True)
+                print(f"用户 {user_id} 的文件已全部删除，向量库已移除")
+                return
+            save_index(
+                vectorstore,
+                index_path,
+                {"embedding": self._embedding_fingerprint},
+                manifest.to_dict(),
+            )
+            self._user_stores.put(user_id, vectorstore)
+            print(f"用户 {user_id} 的向量库已按文件 {filename} 增量更新，共 {vectorstore.index.ntotal} 个向量")
+
+    def user_job_status(self, job_id: str) -> dict | None:
+        """
+        查询用户文件索引任务的状态
+
+        Args:
+            job_id (str): 上传或删除文件时返回的任务ID
 
-    def get_user_retriever(self) -> VectorStoreRetriever:
+        Returns:
+            dict | None: 任务状态（pending、running、done或failed）及失败原因，任务不存在时返回None
         """
-        获取用户的retriever，如果不存在则返回None
+        return self._user_jobs.status(job_id)
+
+    def user_jobs(self, user_id: str | None = None) -> List[dict]:
+        """
+        查询用户的文件索引任务
+
+        Args:
+            user_id (str | None): 用户ID，未传入时使用实例上的user_id
+
+        Returns:
+            List[dict]: 按提交顺序排列的任务状态
+        """
+        return self._user_jobs.user_jobs(self._resolve_user_id(user_id))
+
+    def get_user_retriever(self, user_id: str | None = None) -> VectorStoreRetriever | None:
+        """
+        获取用户的retriever，向量库不在内存中时从磁盘加载，如果不存在则返回None
+
+        Args:
+            user_id (str | None): 用户ID，未传入时使用实例上的user_id
         
         Returns:
             VectorStoreRetriever: 用户的检索器或None
         """
-        # 从用户检索器字典中获取当前用户的检索器
-        return self._user_retrievers.get(self.user_id, None)
+        user_id = self._resolve_user_id(user_id)
+        # 从用户向量库缓存中获取当前用户的向量库
+        vectorstore = self._user_stores.get(user_id)
+        if vectorstore is None:
+            return None
+        return vectorstore.as_retriever(search_kwargs={"k": 6})
+
+    def user_store_metrics(self) -> dict:
+        """
+        获取用户向量库缓存的指标
+
+        Returns:
+            dict: 内存中的向量库数、占用字节数、上限、命中、加载和淘汰次数
+        """
+        return self._user_stores.metrics()
 
-    def upload_user_file(self, file):
+    def upload_user_file(self, file, user_id: str | None = None) -> str:
         """
-        将用户上传的文件存储到用户的文件夹中
+        将用户上传的文件存储到用户的文件夹中，并在后台把该文件加入用户的向量库
         
         Args:
             file: 用户上传的文件对象
+            user_id (str | None): 用户ID，未传入时使用实例上的user_id
+
+        Returns:
+            str: 索引任务ID，可用user_job_status查询进度
         """
+        user_id = self._resolve_user_id(user_id)
         # 构建用户数据路径
-        user_data_path = os.path.join("user_data", self.user_id)
+        user_data_path = os.path.join("user_data", user_id)
         # 确保用户文件夹存在，如果不存在则创建
         os.makedirs(user_data_path, exist_ok=True)  # 确保用户文件夹存在
 
-        # 构建文件完整路径
-        file_path = os.path.join(user_data_path, file.name)
-        # 将文件内容写入到指定路径
+        # 构建文件完整路径，只取文件名，避免写到用户文件夹之外
+        filename = os.path.basename(file.name)
+        file_path = os.path.join(user_data_path, filename)
+        # 分块写入到指定路径，不把整个文件读入内存
         with open(file_path, "wb") as f:
-            f.write(file.read())
+            shutil.copyfileobj(file, f, 1024 * 1024)
 
-        print(f"文件 {file.name} 已成功上传到用户 {self.user_id} 的文件夹")
+        print(f"文件 {filename} 已成功上传到用户 {user_id} 的文件夹")
+        # 在后台解析和嵌入该文件，追加到用户的向量库
+        return self._user_jobs.submit(
+            user_id, "upload", filename, lambda: self._sync_user_file(user_id, filename)
+        )
 
     # 展示用户已上传的文件
-    def list_uploaded_files(self):
+    def list_uploaded_files(self, user_id: str | None = None):
         """
         展示用户文件夹中已经上传的文件
+
+        Args:
+            user_id (str | None): 用户ID，未传入时使用实例上的user_id
         
         Returns:
             list: 用户已上传的文件列表
         """
+        user_id = self._resolve_user_id(user_id)
         # 构建用户数据路径
-        user_data_path = os.path.join("user_data", self.user_id)
+        user_data_path = os.path.join("user_data", user_id)
         # 检查用户文件夹是否存在
         if not os.path.exists(user_data_path):
             print(f"用户文件夹 {user_data_path} 不存在")
             return []
 
-        # 获取文件夹中的所有文件
-        files = os.listdir(user_data_path)
+        # 获取文件夹中的所有文件，跳过保存向量库的隐藏目录
+        files = [
+            name
+            for name in os.listdir(user_data_path)
+            if not name.startswith(".")
+            and os.path.isfile(os.path.join(user_data_path, name))
+        ]
         # 如果文件夹不为空，则打印文件列表
         if files:
-            print(f"用户 {self.user_id} 已上传的文件：")
+            print(f"用户 {user_id} 已上传的文件：")
             for file in files:
                 print(file)
         else:
-            print(f"用户 {self.user_id} 文件夹为空")
+            print(f"用户 {user_id} 文件夹为空")
 
         # 返回文件列表
         return files
 
     # 删除指定文件或清空用户文件夹
-    def delete_uploaded_file(self, filename=None):
+    def delete_uploaded_file(self, filename=None, user_id: str | None = None) -> str | None:
         """
-        删除用户文件夹中的指定文件，或清空文件夹
+        删除用户文件夹中的指定文件，或清空文件夹。删除单个文件时在后台从用户的向量库中删除其向量
         
         Args:
             filename (str, optional): 要删除的文件名，如果为None则清空整个文件夹
+            user_id (str | None): 用户ID，未传入时使用实例上的user_id
+
+        Returns:
+            str | None: 删除单个文件时返回索引任务ID，否则返回None
         """
+        user_id = self._resolve_user_id(user_id)
         # 构建用户数据路径
-        user_data_path = os.path.join("user_data", self.user_id)
+        user_data_path = os.path.join("user_data", user_id)
         # 检查用户文件夹是否存在
         if not os.path.exists(user_data_path):
             print(f"用户文件夹 {user_data_path} 不存在")
@@ -419,28 +1198,38 @@ class Retrievemodel(Modelbase):
             if os.path.exists(file_path):
                 os.remove(file_path)
                 print(f"文件 {filename} 已成功删除")
-            else:
-                print(f"文件 {filename} 不存在")
+                # 在后台删除该文件的向量
+                return self._user_jobs.submit(
+                    user_id, "delete", filename, lambda: self._sync_user_file(user_id, filename)
+                )
+            print(f"文件 {filename} 不存在")
         else:
             # 如果未提供文件名，则清空文件夹
             # 遍历文件夹中的所有文件并删除
             for file in os.listdir(user_data_path):
                 file_path = os.path.join(user_data_path, file)
-                os.remove(file_path)
-            print(f"用户 {self.user_id} 文件夹已清空")
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+            # 同时删除内存中和磁盘上的用户向量库
+            with self._user_stores.user_lock(user_id):
+                self._user_stores.discard(user_id)
+                shutil.rmtree(self._user_index_path(user_id), ignore_errors=True)
+            print(f"用户 {user_id} 文件夹已清空")
 
-    def view_uploaded_file(self, filename):
+    def view_uploaded_file(self, filename, user_id: str | None = None):
         """
         根据文件名返回用户文件的路径
         
         Args:
             filename (str): 文件名
+            user_id (str | None): 用户ID，未传入时使用实例上的user_id
             
         Returns:
             str or None: 文件的完整路径或None（如果文件不存在）
         """
+        user_id = self._resolve_user_id(user_id)
         # 定义用户文件夹路径
-        user_data_path = os.path.join("user_data", self.user_id)  # 定义用户文件夹路径
+        user_data_path = os.path.join("user_data", user_id)  # 定义用户文件夹路径
         # 拼接完整的文件路径
         file_path = os.path.join(user_data_path, filename)  # 拼接完整的文件路径
 
@@ -454,5 +1243,20 @@ class Retrievemodel(Modelbase):
         return file_path
 
 
-# 创建Retrievemodel类的单例实例
-INSTANCE = Retrievemodel()
\ No newline at end of file
+_instance = None  # Retrievemodel类的单例实例，第一次使用时才创建
+_instance_lock = threading.Lock()  # 保护单例的创建
+
+
+def get_instance() -> Retrievemodel:
+    """
+    获取检索模型的单例实例，第一次调用时才加载嵌入模型和索引。
+    导入本模块不会创建实例，解析文档的子进程以spawn方式重新导入主模块时不会再加载一份模型或启动构建
+
+    Returns:
+        Retrievemodel: 检索模型
+    """
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = Retrievemodel()
+        return _instance
\ No newline at end of file
@@ -2,31 +2,42 @@
 # 这是一个检索服务模块，用于根据查询从知识库中检索相关文档
 
 # 从typing模块导入List类型，用于类型提示
-from typing import List
+from typing import Any, Dict, List
 
-# 从model.RAG.retrieve_model模块导入INSTANCE单例对象，用于访问检索器实例
-from model.RAG.retrieve_model import INSTANCE
+# 从model.RAG.retrieve_model模块导入get_instance函数，用于获取检索器单例，第一次检索时才加载模型和索引
+from model.RAG.retrieve_model import get_instance
 
 # 从langchain_core.documents模块导入Document类，用于表示检索到的文档
 from langchain_core.documents import Document
 
-def retrieve(query: str) -> List[Document]:
+def retrieve(
+    query: str,
+    k: int = 6,
+    user_id: str | None = None,
+    filter: Dict[str, Any] | None = None,
+) -> List[Document]:
     """
-    根据查询字符串检索相关文档
+    根据查询字符串检索相关文档。用户ID随请求传入，不读取单例上共享的user_id，并发请求之间互不影响
     
     Args:
         query (str): 查询字符串
+        k (int): 返回的文档数量
+        user_id (str | None): 用户ID，为None时检索公共知识库，否则检索该用户上传文件的向量库
+        filter (Dict[str, Any] | None): 元数据过滤条件，如 {"department": "心内科", "modified": {"gte": "2024-01-01"}}，只作用于公共知识库
         
     Returns:
         List[Document]: 检索到的文档列表
     """
-    # 检查实例是否有关联的用户ID
-    if INSTANCE.user_id is None:
-        # 如果没有用户ID，使用默认检索器进行检索
-        doc = INSTANCE.retriever.invoke(query)
+    # 检查请求是否关联了用户ID
+    if user_id is None:
+        # 如果没有用户ID，在知识库中进行向量与关键词的混合检索
+        doc = get_instance().search(query, k=k, filter=filter)
     else:
-        # 如果有用户ID，获取用户特定的检索器进行检索
-        doc = INSTANCE.get_user_retriever().invoke(query)
+        # 如果有用户ID，获取用户特定的向量库进行检索，向量库不在内存中时从用户文件夹加载
+        retriever = get_instance().get_user_retriever(user_id)
+        if retriever is None:
+            return []
+        doc = retriever.vectorstore.similarity_search(query, k=k)
         
     # 返回检索到的文档列表
     return doc
\ No newline at end of file
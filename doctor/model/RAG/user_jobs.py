@@ -0,0 +1,131 @@
+"""
+用户文件索引任务模块
+用户上传或删除文件后，在后台线程池中增量更新该用户的向量库，调用方凭任务ID查询进度
+"""
+
+# 导入标准库
+import time  # 时间相关功能，用于记录任务时间
+import uuid  # UUID模块，用于生成任务ID
+import threading  # 线程模块，用于保护任务表的并发访问
+from collections import OrderedDict  # 有序字典，按提交顺序保存任务
+from concurrent.futures import ThreadPoolExecutor  # 线程池，用于在后台执行任务
+from dataclasses import dataclass, asdict  # 数据类，用于描述任务状态
+from typing import Callable, Dict, List  # 类型提示
+
+# 任务状态
+PENDING = "pending"  # 等待执行
+RUNNING = "running"  # 正在执行
+DONE = "done"  # 执行成功
+FAILED = "failed"  # 执行失败
+
+
+@dataclass
+class UserJob:
+    """
+    一个用户文件索引任务的状态
+    """
+
+    job_id: str  # 任务ID
+    user_id: str  # 用户ID
+    kind: str  # 任务类型：upload或delete
+    filename: str  # 文件名
+    status: str = PENDING  # 任务状态
+    error: str | None = None  # 失败原因
+    created_at: float = 0.0  # 提交时间
+    finished_at: float | None = None  # 结束时间
+
+
+class UserJobQueue(object):
+    """
+    用户文件索引任务队列类
+    任务表只保留最近的若干个已结束任务，未结束的任务总会保留
+    """
+
+    def __init__(self, workers: int = 2, max_finished: int = 1000):
+        """
+        初始化任务队列
+
+        Args:
+            workers (int): 同时执行任务的线程数
+            max_finished (int): 保留的已结束任务数
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, int(workers)), thread_name_prefix="user-index"
+        )
+        self._max_finished = int(max_finished)
+        self._jobs: "OrderedDict[str, UserJob]" = OrderedDict()  # 任务ID -> 任务，按提交顺序排列
+        self._lock = threading.Lock()  # 保护任务表的锁
+
+    def submit(self, user_id: str, kind: str, filename: str, fn: Callable[[], None]) -> str:
+        """
+        提交任务
+
+        Args:
+            user_id (str): 用户ID
+            kind (str): 任务类型
+            filename (str): 文件名
+            fn (Callable[[], None]): 任务函数，抛出异常时任务记为失败
+
+        Returns:
+            str: 任务ID
+        """
+        job = UserJob(uuid.uuid4().hex, user_id, kind, filename, created_at=time.time())
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, fn)
+        return job.job_id
+
+    def _run(self, job: UserJob, fn: Callable[[], None]):
+        """
+        执行任务并记录结果
+
+        Args:
+            job (UserJob): 任务
+            fn (Callable[[], None]): 任务函数
+        """
+        job.status = RUNNING
+        try:
+            fn()
+            job.status = DONE
+        except Exception as e:
+            print(f"用户 {job.user_id} 的文件 {job.filename} 索引任务失败: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        job.finished_at = time.time()
+        with self._lock:
+            self._trim()
+
+    def _trim(self):
+        """
+        删除最早结束的任务，直到已结束任务数不超过上限，调用方需持有锁
+        """
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[: max(0, len(finished) - self._max_finished)]:
+            del self._jobs[job_id]
+
+    def status(self, job_id: str) -> Dict | None:
+        """
+        查询任务状态
+
+        Args:
+            job_id (str): 任务ID
+
+        Returns:
+            Dict | None: 任务状态字典，任务不存在或已被清理时返回None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else asdict(job)
+
+    def user_jobs(self, user_id: str) -> List[Dict]:
+        """
+        查询用户的全部任务
+
+        Args:
+            user_id (str): 用户ID
+
+        Returns:
+            List[Dict]: 按提交顺序排列的任务状态字典
+        """
+        with self._lock:
+            return [asdict(job) for job in self._jobs.values() if job.user_id == user_id]
@@ -0,0 +1,170 @@
+"""
+用户向量库缓存模块
+在总内存预算内按最近最少使用保留用户的向量库，被淘汰的向量库在下次查询时从磁盘重新加载
+"""
+
+# 导入标准库
+import threading  # 线程模块，用于保护缓存的并发访问
+from collections import OrderedDict  # 有序字典，用于实现LRU
+from typing import Callable, Dict  # 类型提示
+
+# 导入第三方库
+from langchain_community.vectorstores.faiss import FAISS  # FAISS向量存储
+
+
+def estimate_bytes(vectorstore: FAISS) -> int:
+    """
+    估算向量库占用的内存：向量编码加上文档库中文本的大小
+
+    Args:
+        vectorstore (FAISS): 向量库
+
+    Returns:
+        int: 估算的字节数
+    """
+    index = vectorstore.index
+    code_size = getattr(index, "code_size", index.d * 4)
+    text_bytes = sum(
+        len(doc.page_content.encode("utf-8"))
+        for doc in vectorstore.docstore._dict.values()
+    )
+    return index.ntotal * code_size + text_bytes
+
+
+class UserStoreCache(object):
+    """
+    用户向量库LRU缓存类
+    """
+
+    def __init__(self, max_bytes: int, loader: Callable[[str], FAISS | None]):
+        """
+        初始化用户向量库缓存
+
+        Args:
+            max_bytes (int): 内存中向量库的总大小上限
+            loader (Callable[[str], FAISS | None]): 根据用户ID从磁盘加载向量库的函数，不存在时返回None
+        """
+        self._max_bytes = max_bytes
+        self._loader = loader
+        self._stores: "OrderedDict[str, FAISS]" = OrderedDict()  # 用户ID -> 向量库，越靠后越近使用
+        self._sizes: Dict[str, int] = {}  # 用户ID -> 估算的字节数
+        self._bytes = 0  # 当前占用的总字节数
+        self._lock = threading.RLock()  # 保护缓存字典和统计的锁，只在短时间内持有
+        self._user_locks: Dict[str, threading.Lock] = {}  # 用户ID -> 该用户的加载和构建锁
+        self._hits = 0  # 命中次数
+        self._loads = 0  # 从磁盘加载次数
+        self._evictions = 0  # 淘汰次数
+
+    def user_lock(self, user_id: str) -> threading.Lock:
+        """
+        获取用户的加载和构建锁，同一用户的加载与构建互斥，不同用户之间互不阻塞
+
+        Args:
+            user_id (str): 用户ID
+
+        Returns:
+            threading.Lock: 该用户的锁
+        """
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    def _lookup(self, user_id: str) -> FAISS | None:
+        """
+        在内存中查找用户的向量库，命中时标记为最近使用
+
+        Args:
+            user_id (str): 用户ID
+
+        Returns:
+            FAISS | None: 用户的向量库，不在内存中时返回None
+        """
+        with self._lock:
+            store = self._stores.get(user_id)
+            if store is not None:
+                self._stores.move_to_end(user_id)
+                self._hits += 1
+            return store
+
+    def get(self, user_id: str) -> FAISS | None:
+        """
+        获取用户的向量库，不在内存中时从磁盘加载。加载只持有该用户的锁，不阻塞其他用户的查询
+
+        Args:
+            user_id (str): 用户ID
+
+        Returns:
+            FAISS | None: 用户的向量库，不存在时返回None
+        """
+        store = self._lookup(user_id)
+        if store is not None:
+            return store
+        with self.user_lock(user_id):
+            # 等待锁期间可能已被其他请求加载
+            store = self._lookup(user_id)
+            if store is not None:
+                return store
+            store = self._loader(user_id)
+            if store is None:
+                return None
+            with self._lock:
+                self._loads += 1
+                self._insert(user_id, store)
+            return store
+
+    def put(self, user_id: str, store: FAISS):
+        """
+        放入或替换用户的向量库
+
+        Args:
+            user_id (str): 用户ID
+            store (FAISS): 向量库
+        """
+        with self._lock:
+            self.discard(user_id)
+            self._insert(user_id, store)
+
+    def discard(self, user_id: str):
+        """
+        从内存中移除用户的向量库，磁盘上的向量库不受影响
+
+        Args:
+            user_id (str): 用户ID
+        """
+        with self._lock:
+            if self._stores.pop(user_id, None) is not None:
+                self._bytes -= self._sizes.pop(user_id)
+
+    def _insert(self, user_id: str, store: FAISS):
+        """
+        加入向量库并淘汰最近最少使用的向量库，直到总大小不超过上限（刚加入的向量库总会保留）
+
+        Args:
+            user_id (str): 用户ID
+            store (FAISS): 向量库
+        """
+        size = estimate_bytes(store)
+        self._stores[user_id] = store
+        self._sizes[user_id] = size
+        self._bytes += size
+        while self._bytes > self._max_bytes and len(self._stores) > 1:
+            victim, _ = self._stores.popitem(last=False)
+            self._bytes -= self._sizes.pop(victim)
+            self._evictions += 1
+            print(f"用户 {victim} 的向量库已移出内存")
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        获取缓存指标
+
+        Returns:
+            Dict[str, int]: 缓存的向量库数、占用字节数、上限、命中、加载和淘汰次数
+        """
+        with self._lock:
+            return {
+                "stores": len(self._stores),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "loads": self._loads,
+                "evictions": self._evictions,
+            }
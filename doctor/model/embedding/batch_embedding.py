@@ -0,0 +1,205 @@
+"""
+批量嵌入模块
+把待嵌入的文本按长度分桶、分批，可选多线程并行调用底层嵌入模型，并统计嵌入吞吐量
+配置了嵌入缓存时先查缓存，只嵌入缓存中没有的文本；查询文本另有内存中的查询向量缓存
+"""
+
+# 导入标准库
+import time  # 时间相关功能，用于统计吞吐量
+import threading  # 线程模块，用于保护统计数据
+from concurrent.futures import ThreadPoolExecutor  # 线程池，用于并行执行多个批次
+from typing import List, Dict  # 类型提示
+
+# 导入第三方库
+from langchain_core.embeddings import Embeddings  # 嵌入模型基类
+
+# 导入项目模块
+from model.embedding.embedding_cache import EmbeddingCache, round_vectors, text_key  # 嵌入向量缓存
+from model.embedding.query_cache import QueryCache  # 查询向量缓存
+
+# 嵌入过程中打印进度的最小间隔（秒）
+_REPORT_INTERVAL = 5.0
+
+
+class BatchEmbeddings(Embeddings):
+    """
+    批量嵌入类
+    包装一个嵌入模型，按长度排序后分批嵌入以减少填充，批次可以在多个线程中并行执行
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        batch_size: int = 32,
+        workers: int = 1,
+        cache: EmbeddingCache | None = None,
+        query_cache: QueryCache | None = None,
+    ):
+        """
+        初始化批量嵌入
+
+        Args:
+            embedding (Embeddings): 底层嵌入模型
+            batch_size (int): 每批文本数量
+            workers (int): 并行执行批次的线程数
+            cache (EmbeddingCache | None): 嵌入向量缓存，为None时不使用缓存
+            query_cache (QueryCache | None): 查询向量缓存，为None时每次查询都调用嵌入模型
+        """
+        self._embedding = embedding  # 底层嵌入模型
+        self._cache = cache  # 嵌入向量缓存
+        self._query_cache = query_cache  # 查询向量缓存
+        self._batch_size = max(1, int(batch_size))  # 每批文本数量
+        self._workers = max(1, int(workers))  # 并行线程数
+        self._lock = threading.Lock()  # 保护统计数据的锁
+        self._total_chunks = 0  # 累计嵌入的分块数
+        self._total_seconds = 0.0  # 累计嵌入耗时
+
+    @property
+    def embedding(self) -> Embeddings:
+        """
+        获取底层嵌入模型
+
+        Returns:
+            Embeddings: 底层嵌入模型
+        """
+        return self._embedding
+
+    def stats(self) -> Dict[str, float]:
+        """
+        获取累计的嵌入统计
+
+        Returns:
+            Dict[str, float]: 分块数、耗时、吞吐量（块/秒），使用缓存时还包括缓存和查询缓存统计
+        """
+        with self._lock:
+            seconds = self._total_seconds
+            chunks = self._total_chunks
+        stats = {
+            "chunks": chunks,
+            "seconds": seconds,
+            "chunks_per_second": chunks / seconds if seconds > 0 else 0.0,
+        }
+        if self._cache is not None:
+            stats["cache"] = self._cache.stats()
+        if self._query_cache is not None:
+            stats["query_cache"] = self._query_cache.stats()
+        return stats
+
+    def _batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        按文本长度排序后切分批次，同一批次内长度接近，减少模型输入的填充
+
+        Args:
+            texts (List[str]): 待嵌入的文本
+
+        Returns:
+            List[List[int]]: 每个批次包含的文本下标
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        return [
+            order[i : i + self._batch_size]
+            for i in range(0, len(order), self._batch_size)
+        ]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        嵌入文本，先查缓存，缓存中没有的文本去重后分批嵌入并写回缓存，返回结果与输入顺序一致
+
+        Args:
+            texts (List[str]): 待嵌入的文本
+
+        Returns:
+            List[List[float]]: 嵌入向量
+        """
+        if self._cache is None:
+            return self._embed_batches(texts)
+
+        keys = [text_key(text) for text in texts]
+        vectors = self._cache.get_many(keys)
+        # 缓存中没有的文本，同一文本只嵌入一次
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in vectors and key not in missing:
+                missing[key] = i
+        if missing:
+            # 舍入到缓存精度，与之后从缓存中读到的向量一致
+            new_vectors = round_vectors(self._embed_batches([texts[i] for i in missing.values()]))
+            self._cache.put_many(list(missing), new_vectors)
+            vectors.update(zip(missing, new_vectors))
+        if len(texts) > self._batch_size:
+            print(f"嵌入缓存命中 {len(texts) - len(missing)}/{len(texts)} 个分块")
+        return [vectors[key] for key in keys]
+
+    def _embed_batches(self, texts: List[str]) -> List[List[float]]:
+        """
+        分批嵌入文本，返回结果与输入顺序一致
+
+        Args:
+            texts (List[str]): 待嵌入的文本
+
+        Returns:
+            List[List[float]]: 嵌入向量
+        """
+        if not texts:
+            return []
+
+        vectors: List[List[float] | None] = [None] * len(texts)
+        batches = self._batches(texts)
+        start = time.perf_counter()
+        last_report = start
+        done = 0
+
+        def run(batch: List[int]) -> List[int]:
+            # 调用底层模型嵌入一个批次，并写回原来的位置
+            batch_vectors = self._embedding.embed_documents([texts[i] for i in batch])
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+            return batch
+
+        if self._workers > 1 and len(batches) > 1:
+            executor = ThreadPoolExecutor(max_workers=self._workers)
+            finished = executor.map(run, batches)
+        else:
+            executor = None
+            finished = map(run, batches)
+
+        try:
+            for batch in finished:
+                done += len(batch)
+                now = time.perf_counter()
+                if now - last_report >= _REPORT_INTERVAL:
+                    last_report = now
+                    print(
+                        f"已嵌入 {done}/{len(texts)} 个分块，{done / (now - start):.1f} 块/秒"
+                    )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._total_chunks += len(texts)
+            self._total_seconds += elapsed
+        if len(texts) > self._batch_size:
+            print(
+                f"嵌入完成：{len(texts)} 个分块，耗时 {elapsed:.1f} 秒，{len(texts) / max(elapsed, 1e-9):.1f} 块/秒"
+            )
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        嵌入查询文本，优先从查询向量缓存读取
+
+        Args:
+            text (str): 查询文本
+
+        Returns:
+            List[float]: 嵌入向量
+        """
+        if self._query_cache is None:
+            return self._embedding.embed_query(text)
+        vector = self._query_cache.get(text)
+        if vector is None:
+            vector = self._embedding.embed_query(text)
+            self._query_cache.put(text, vector)
+        return vector
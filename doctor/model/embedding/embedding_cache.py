@@ -0,0 +1,285 @@
+"""
+嵌入向量缓存模块
+以(嵌入模型, 规范化文本哈希)为键持久化嵌入向量，向量以float16行存放在内存映射文件中，索引存放在sqlite中
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于文件和目录操作
+import time  # 时间相关功能，用于记录最近使用时间
+import sqlite3  # 轻量级数据库，用于保存键到向量行号的索引
+import hashlib  # 哈希模块，用于计算文本哈希
+import threading  # 线程模块，用于保护缓存的并发访问
+import unicodedata  # Unicode处理，用于规范化文本
+from typing import Dict, List, Sequence  # 类型提示
+
+# 导入第三方库
+import numpy as np  # 数值计算库，用于读写内存映射的向量文件
+
+# 向量文件每次扩容的最少行数
+_MIN_GROW_ROWS = 1024
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化文本：全半角统一、合并连续空白、去掉首尾空白
+
+    Args:
+        text (str): 原始文本
+
+    Returns:
+        str: 规范化后的文本
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def round_vectors(vectors: Sequence[Sequence[float]]) -> List[List[float]]:
+    """
+    把向量舍入到缓存中存放的float16精度，新嵌入的向量与缓存命中的向量完全一致，
+    缓存冷热不同时重建出的索引也相同
+
+    Args:
+        vectors (Sequence[Sequence[float]]): 嵌入向量
+
+    Returns:
+        List[List[float]]: 舍入后的向量
+    """
+    return np.asarray(vectors, dtype=np.float16).astype(np.float32).tolist()
+
+
+def text_key(text: str) -> str:
+    """
+    计算文本的缓存键
+
+    Args:
+        text (str): 原始文本
+
+    Returns:
+        str: 规范化文本的sha1
+    """
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(object):
+    """
+    嵌入向量缓存类
+    每个嵌入模型使用独立的目录，超过容量时按最近最少使用淘汰
+    """
+
+    def __init__(self, cache_path: str, model_key: str, max_size_mb: int = 1024):
+        """
+        初始化嵌入向量缓存
+
+        Args:
+            cache_path (str): 缓存根目录
+            model_key (str): 嵌入模型名称和版本，不同模型的向量互不混用
+            max_size_mb (int): 向量文件的最大体积（MB）
+        """
+        self._dir = os.path.join(
+            cache_path, hashlib.sha1(model_key.encode("utf-8")).hexdigest()[:16]
+        )
+        os.makedirs(self._dir, exist_ok=True)
+        self._vectors_file = os.path.join(self._dir, "vectors.f16")  # float16向量文件
+        self._max_bytes = max(1, int(max_size_mb)) * 1024 * 1024  # 向量文件最大字节数
+        self._lock = threading.Lock()  # 保护数据库连接和内存映射
+
+        # 键到向量行号的索引
+        self._db = sqlite3.connect(
+            os.path.join(self._dir, "index.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        with open(os.path.join(self._dir, "model.txt"), "w", encoding="utf-8") as f:
+            f.write(model_key)
+
+        self._dim = self._get_meta("dim")  # 向量维度，第一次写入时确定
+        self._vectors = None  # 内存映射的向量矩阵
+        self._hits = 0  # 命中次数
+        self._misses = 0  # 未命中次数
+        self._evictions = 0  # 淘汰条目数
+
+    def _get_meta(self, name: str, default: int | None = None) -> int | None:
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, name: str, value: int):
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value)
+        )
+
+    @property
+    def _max_rows(self) -> int:
+        return max(1, self._max_bytes // (self._dim * 2))
+
+    def _mapped_rows(self) -> int:
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    def _map(self, min_rows: int):
+        """
+        保证内存映射至少覆盖min_rows行，文件不够大时扩容
+
+        Args:
+            min_rows (int): 需要访问的行数
+        """
+        if self._mapped_rows() >= min_rows:
+            return
+        # 先释放旧的映射，Windows下文件被映射时不能改变大小
+        self._vectors = None
+        row_bytes = self._dim * 2
+        file_rows = os.path.getsize(self._vectors_file) // row_bytes if os.path.exists(self._vectors_file) else 0
+        if file_rows < min_rows:
+            # 按倍数扩容，减少重新映射的次数
+            file_rows = min(self._max_rows, max(min_rows, file_rows * 2, _MIN_GROW_ROWS))
+            with open(self._vectors_file, "ab") as f:
+                f.truncate(file_rows * row_bytes)
+        self._vectors = np.memmap(
+            self._vectors_file, dtype=np.float16, mode="r+", shape=(file_rows, self._dim)
+        )
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        批量查询缓存
+
+        Args:
+            keys (Sequence[str]): 缓存键
+
+        Returns:
+            Dict[str, List[float]]: 命中的键到向量的映射
+        """
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            if self._dim is None:
+                self._misses += len(keys)
+                return found
+            unique_keys = list(dict.fromkeys(keys))
+            slots = {}
+            # sqlite单条语句的参数个数有限，分段查询
+            for i in range(0, len(unique_keys), 500):
+                part = unique_keys[i : i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                slots.update(rows)
+            if slots:
+                self._map(max(slots.values()) + 1)
+                for key, slot in slots.items():
+                    found[key] = self._vectors[slot].astype(np.float32).tolist()
+                now = time.time()
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in slots],
+                )
+                self._db.execute("COMMIT")
+            hits = sum(1 for key in keys if key in found)
+            self._hits += hits
+            self._misses += len(keys) - hits
+        return found
+
+    def put_many(self, keys: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """
+        批量写入缓存，容量不足时淘汰最近最少使用的条目
+
+        Args:
+            keys (Sequence[str]): 缓存键
+            vectors (Sequence[Sequence[float]]): 与键一一对应的向量
+        """
+        if not keys:
+            return
+        matrix = np.asarray(vectors, dtype=np.float16)
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(matrix.shape[1])
+                self._set_meta("dim", self._dim)
+            if matrix.shape[1] != self._dim:
+                print(f"嵌入向量维度 {matrix.shape[1]} 与缓存维度 {self._dim} 不一致，跳过缓存")
+                return
+
+            # 在一个写事务中分配行号，多个进程共享缓存时也不会分配到同一行
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = {}
+                now = time.time()
+                for key, vector in zip(keys, matrix):
+                    if key in rows:
+                        continue
+                    existing = self._db.execute(
+                        "SELECT slot FROM entries WHERE key = ?", (key,)
+                    ).fetchone()
+                    slot = existing[0] if existing else self._allocate_slot()
+                    rows[key] = (slot, vector)
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                        (key, slot, now),
+                    )
+                self._map(max(slot for slot, _ in rows.values()) + 1)
+                for slot, vector in rows.values():
+                    self._vectors[slot] = vector
+                self._vectors.flush()
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _allocate_slot(self) -> int:
+        """
+        分配一个空闲行号，优先复用被淘汰的行，文件达到上限时淘汰最近最少使用的条目
+
+        Returns:
+            int: 行号
+        """
+        row = self._db.execute("SELECT slot FROM free_slots LIMIT 1").fetchone()
+        if row is None:
+            next_slot = self._get_meta("next_slot", 0)
+            if next_slot < self._max_rows:
+                self._set_meta("next_slot", next_slot + 1)
+                return next_slot
+            self._evict(max(1, self._max_rows // 10))
+            row = self._db.execute("SELECT slot FROM free_slots LIMIT 1").fetchone()
+        self._db.execute("DELETE FROM free_slots WHERE slot = ?", (row[0],))
+        return row[0]
+
+    def _evict(self, count: int):
+        """
+        淘汰最近最少使用的条目，释放它们占用的行
+
+        Args:
+            count (int): 淘汰的条目数
+        """
+        victims = self._db.execute(
+            "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (count,)
+        ).fetchall()
+        self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+        self._db.executemany(
+            "INSERT OR IGNORE INTO free_slots (slot) VALUES (?)", [(slot,) for _, slot in victims]
+        )
+        self._evictions += len(victims)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict[str, float]: 命中次数、未命中次数、命中率、条目数、淘汰数和向量文件体积
+        """
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "entries": entries,
+                "evictions": self._evictions,
+                "size_bytes": os.path.getsize(self._vectors_file) if os.path.exists(self._vectors_file) else 0,
+            }
@@ -0,0 +1,145 @@
+"""
+嵌入模型管理模块
+按模型创建并复用嵌入模型实例，推理后端（PyTorch或ONNX Runtime）、批量大小、并行线程数和嵌入缓存从配置中读取
+同一嵌入模型的所有实例共享一个嵌入缓存和一个查询向量缓存，知识库检索和联网检索的相同问题只嵌入一次
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于拼接缓存路径
+import threading  # 线程模块，保证同一模型只加载一次
+
+# 导入第三方库
+from langchain_core.embeddings import Embeddings  # 嵌入模型基类
+from langchain_community.embeddings import ModelScopeEmbeddings  # ModelScope嵌入模型，用于文本向量化
+
+# 导入项目模块
+from config.config import Config  # 配置管理器，用于读取配置信息
+from env import get_app_root  # 获取应用根目录的函数
+from model.embedding.batch_embedding import BatchEmbeddings  # 批量嵌入
+from model.embedding.embedding_cache import EmbeddingCache  # 嵌入向量缓存
+from model.embedding.query_cache import QueryCache  # 查询向量缓存
+from model.embedding.onnx_embedding import load_onnx_embedding  # ONNX Runtime句向量
+
+# 已创建的嵌入模型，键为模型ID
+_instances = {}
+# 嵌入缓存，所有嵌入模型实例共享，未启用缓存时为None
+_cache = None
+# 查询向量缓存，所有嵌入模型实例共享，未启用时为None
+_query_cache = None
+# 实际加载的推理后端标识，ONNX加载失败退回PyTorch时为"torch"，尚未加载模型时为None
+_active_backend = None
+_lock = threading.Lock()
+
+
+def embedding_backend_key() -> str:
+    """
+    获取实际使用的推理后端标识，不同后端（尤其是int8量化）的向量有细微差别，嵌入缓存和索引指纹都要区分后端。
+    配置为ONNX但加载失败退回PyTorch时返回"torch"，避免PyTorch的向量被记在ONNX后端名下；
+    尚未加载模型时按配置返回
+
+    Returns:
+        str: PyTorch后端为"torch"，ONNX后端为"onnx-<量化方式>"
+    """
+    if _active_backend is not None:
+        return _active_backend
+    return _configured_backend()
+
+
+def _configured_backend() -> str:
+    """
+    获取配置的推理后端标识
+
+    Returns:
+        str: PyTorch后端为"torch"，ONNX后端为"onnx-<量化方式>"
+    """
+    config = Config.get_instance()
+    if config.get_with_nested_params("model", "embedding", "backend") != "onnx":
+        return "torch"
+    return "onnx-" + config.get_with_nested_params("model", "embedding", "onnx", "quantize")
+
+
+def _create_base(model_id: str, batch_size: int) -> Embeddings:
+    """
+    按配置的推理后端创建底层嵌入模型，ONNX后端加载失败时退回PyTorch，并记录实际使用的后端，需在持有_lock时调用
+
+    Args:
+        model_id (str): ModelScope模型ID或本地模型路径
+        batch_size (int): 每批文本数量
+
+    Returns:
+        Embeddings: 底层嵌入模型
+    """
+    global _active_backend
+    config = Config.get_instance()
+    if config.get_with_nested_params("model", "embedding", "backend") == "onnx":
+        settings = dict(config.get_with_nested_params("model", "embedding", "onnx"))
+        settings["path"] = os.path.join(get_app_root(), settings["path"])
+        try:
+            base = load_onnx_embedding(model_id, settings, batch_size=batch_size)
+            _active_backend = _configured_backend()
+            return base
+        except Exception as e:
+            print(f"加载ONNX嵌入模型失败，使用PyTorch后端: {e}")
+    _active_backend = "torch"
+    return ModelScopeEmbeddings(model_id=model_id)
+
+
+def _get_cache() -> EmbeddingCache | None:
+    """
+    获取嵌入缓存，缓存以配置中的模型名称和版本区分，需在持有_lock时调用
+
+    Returns:
+        EmbeddingCache | None: 嵌入缓存，未启用时返回None
+    """
+    global _cache
+    config = Config.get_instance()
+    if _cache is None and config.get_with_nested_params("model", "embedding", "cache", "enabled"):
+        model_key = "{}@{}#{}".format(
+            config.get_with_nested_params("model", "embedding", "model-name"),
+            config.get_with_nested_params("model", "embedding", "model-version"),
+            embedding_backend_key(),
+        )
+        _cache = EmbeddingCache(
+            os.path.join(get_app_root(), config.get_with_nested_params("model", "embedding", "cache", "path")),
+            model_key,
+            max_size_mb=config.get_with_nested_params("model", "embedding", "cache", "max-size-mb"),
+        )
+    return _cache
+
+
+def _get_query_cache() -> QueryCache | None:
+    """
+    获取查询向量缓存，需在持有_lock时调用
+
+    Returns:
+        QueryCache | None: 查询向量缓存，未启用时返回None
+    """
+    global _query_cache
+    settings = Config.get_instance().get_with_nested_params("model", "embedding", "query-cache")
+    if _query_cache is None and settings["enabled"]:
+        _query_cache = QueryCache(settings["max-entries"], settings["ttl-seconds"])
+    return _query_cache
+
+
+def get_embedding(model_id: str) -> BatchEmbeddings:
+    """
+    获取嵌入模型，同一模型ID在进程内只加载一次
+
+    Args:
+        model_id (str): ModelScope模型ID或本地模型路径
+
+    Returns:
+        BatchEmbeddings: 批量嵌入模型
+    """
+    with _lock:
+        if model_id not in _instances:
+            config = Config.get_instance()
+            batch_size = config.get_with_nested_params("model", "embedding", "batch-size")
+            _instances[model_id] = BatchEmbeddings(
+                _create_base(model_id, batch_size),
+                batch_size=batch_size,
+                workers=config.get_with_nested_params("model", "embedding", "workers"),
+                cache=_get_cache(),
+                query_cache=_get_query_cache(),
+            )
+        return _instances[model_id]
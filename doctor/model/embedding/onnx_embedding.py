@@ -0,0 +1,380 @@
+"""
+ONNX Runtime嵌入模块
+把句向量模型导出为ONNX（可选int8动态量化），在CPU上用ONNX Runtime推理，推理进程无需加载PyTorch。
+导出只进行一次，导出后与PyTorch的向量逐条比较，误差超出容差时放弃导出结果，并留下失败记录，之后启动时不再重复导出
+在doctor目录下手动导出并校验（忽略失败记录重新导出）：python -m model.embedding.onnx_embedding
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于文件和目录操作
+import json  # JSON处理，用于记录校验结果
+import time  # 时间相关功能，用于记录导出失败的时间
+import shutil  # 高级文件操作模块，用于清理校验失败的导出结果
+from typing import Dict, Any, List  # 类型提示
+
+# 导入第三方库
+import numpy as np  # 数值计算库
+from langchain_core.embeddings import Embeddings  # 嵌入模型基类
+
+# 导出目录中的文件名称
+_MODEL_FILE = "model.onnx"  # 导出的float32模型
+_QUANTIZED_FILE = "model.int8.onnx"  # 动态量化后的int8模型
+_VERIFY_FILE = "verify.json"  # 与PyTorch向量的比较结果
+_FAILED_SUFFIX = ".failed.json"  # 导出或校验失败的记录，保存在导出目录旁边（导出目录会被删除）
+
+# 校验时使用的文本，覆盖短问题、长段落和中英文混合
+_VERIFY_TEXTS = [
+    "秃头怎么办",
+    "糖尿病患者的饮食应该注意什么？",
+    "二甲双胍的常见不良反应包括胃肠道反应，如恶心、呕吐、腹泻等，通常在用药初期出现。",
+    "ICD-10编码E11.9表示2型糖尿病，不伴有并发症。",
+    "高血压患者应低盐饮食，每日食盐摄入量不超过5克，并坚持规律运动、戒烟限酒。",
+    # 超过512个token的长段落，与索引中的长分块一样会被截断，校验两边的截断位置是否一致
+    "慢性肾脏病患者应定期监测肾功能和尿蛋白，控制血压和血糖，避免使用肾毒性药物。"
+    "饮食上需限制蛋白质和钠的摄入，出现水肿时还应限制饮水量，并在医生指导下调整用药。"
+    * 12,
+]
+
+# ModelScope句向量预处理器在配置中未指定长度时的默认截断长度
+_PIPELINE_DEFAULT_LENGTH = 128
+
+
+def resolve_model_dir(model_id: str) -> str:
+    """
+    获取模型的本地目录，传入的是ModelScope模型ID时先下载
+
+    Args:
+        model_id (str): 本地模型目录或ModelScope模型ID
+
+    Returns:
+        str: 本地模型目录
+    """
+    if os.path.isdir(model_id):
+        return model_id
+    from modelscope.hub.snapshot_download import snapshot_download
+
+    return snapshot_download(model_id)
+
+
+def pipeline_max_length(model_dir: str) -> int:
+    """
+    读取ModelScope句向量管道的截断长度，ONNX推理使用相同的长度，保证长文本截断后的内容与PyTorch一致
+
+    Args:
+        model_dir (str): 本地模型目录
+
+    Returns:
+        int: 单条文本的最大token数
+    """
+    with open(os.path.join(model_dir, "configuration.json"), "r", encoding="utf-8") as f:
+        preprocessor = json.load(f).get("preprocessor", {})
+    # 与ModelScope预处理器相同的取值顺序：max_length优先，其次sequence_length
+    return int(
+        preprocessor.get("max_length")
+        or preprocessor.get("sequence_length")
+        or _PIPELINE_DEFAULT_LENGTH
+    )
+
+
+def export_onnx(model_dir: str, output_dir: str, quantize: bool = True, opset: int = 14):
+    """
+    用PyTorch把句向量模型导出为ONNX，取[CLS]位置的隐藏状态作为句向量，与ModelScope句向量管道一致
+
+    Args:
+        model_dir (str): 本地模型目录
+        output_dir (str): 导出目录
+        quantize (bool): 是否同时导出int8动态量化模型
+        opset (int): ONNX算子集版本
+    """
+    # 延迟导入，只有导出时才需要PyTorch
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModel.from_pretrained(model_dir)
+    model.eval()
+
+    class _SentenceEncoder(torch.nn.Module):
+        # 包装模型，只输出句向量
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            outputs = self.encoder(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids,
+            )
+            return outputs.last_hidden_state[:, 0]
+
+    sample = tokenizer(["导出示例"], return_tensors="pt")
+    dynamic_axes = {"batch": 0, "sequence": 1}
+    model_file = os.path.join(output_dir, _MODEL_FILE)
+    with torch.inference_mode():
+        torch.onnx.export(
+            _SentenceEncoder(model),
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            model_file,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["sentence_embedding"],
+            dynamic_axes={
+                "input_ids": dynamic_axes,
+                "attention_mask": dynamic_axes,
+                "token_type_ids": dynamic_axes,
+                "sentence_embedding": {0: "batch"},
+            },
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(output_dir)
+    print(f"句向量模型已导出到 {model_file}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            model_file,
+            os.path.join(output_dir, _QUANTIZED_FILE),
+            weight_type=QuantType.QInt8,
+        )
+        print(f"int8量化模型已导出到 {os.path.join(output_dir, _QUANTIZED_FILE)}")
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    ONNX Runtime句向量类
+    """
+
+    def __init__(
+        self,
+        onnx_dir: str,
+        quantized: bool = True,
+        intra_op_threads: int = 0,
+        max_length: int = 512,
+        batch_size: int = 32,
+    ):
+        """
+        初始化ONNX Runtime推理会话
+
+        Args:
+            onnx_dir (str): 导出目录，包含ONNX模型和分词器
+            quantized (bool): 是否使用int8量化模型
+            intra_op_threads (int): 单个算子使用的线程数，0表示由ONNX Runtime决定
+            max_length (int): 单条文本的最大token数，超出部分被截断
+            batch_size (int): embed_documents内部每次推理的文本数
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = max(0, int(intra_op_threads))
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model_file = os.path.join(onnx_dir, _QUANTIZED_FILE if quantized else _MODEL_FILE)
+        self._session = ort.InferenceSession(
+            model_file, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {item.name for item in self._session.get_inputs()}
+        self._tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        self._max_length = int(max_length)
+        self._batch_size = max(1, int(batch_size))
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        推理一批文本
+
+        Args:
+            texts (List[str]): 文本
+
+        Returns:
+            np.ndarray: 句向量，形状为(len(texts), dim)
+        """
+        inputs = self._tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self._max_length,
+            return_tensors="np",
+        )
+        feeds = {
+            name: value.astype(np.int64)
+            for name, value in inputs.items()
+            if name in self._input_names
+        }
+        return self._session.run(None, feeds)[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        嵌入文本
+
+        Args:
+            texts (List[str]): 待嵌入的文本
+
+        Returns:
+            List[List[float]]: 嵌入向量
+        """
+        vectors = []
+        for i in range(0, len(texts), self._batch_size):
+            vectors.extend(self._encode(texts[i : i + self._batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        嵌入查询文本
+
+        Args:
+            text (str): 查询文本
+
+        Returns:
+            List[float]: 嵌入向量
+        """
+        return self._encode([text])[0].tolist()
+
+
+def verify(reference: Embeddings, candidate: Embeddings, tolerance: float) -> Dict[str, Any]:
+    """
+    比较两个嵌入模型对同一批文本的向量
+
+    Args:
+        reference (Embeddings): 作为基准的PyTorch嵌入模型
+        candidate (Embeddings): 被校验的ONNX嵌入模型
+        tolerance (float): 允许的最大余弦距离
+
+    Returns:
+        Dict[str, Any]: 最小余弦相似度、最大余弦距离、是否通过
+    """
+    expected = np.asarray(reference.embed_documents(_VERIFY_TEXTS), dtype=np.float32)
+    actual = np.asarray(candidate.embed_documents(_VERIFY_TEXTS), dtype=np.float32)
+    cosine = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1) + 1e-12
+    )
+    max_distance = float(1 - cosine.min())
+    return {
+        "min_cosine": float(cosine.min()),
+        "max_distance": max_distance,
+        "tolerance": tolerance,
+        "passed": max_distance <= tolerance,
+    }
+
+
+def _failed_file(model_id: str, settings: Dict[str, Any]) -> str:
+    """
+    获取导出失败记录的路径
+
+    Args:
+        model_id (str): 本地模型目录或ModelScope模型ID
+        settings (Dict[str, Any]): model.embedding.onnx配置
+
+    Returns:
+        str: 失败记录文件路径
+    """
+    return _onnx_dir(model_id, settings) + _FAILED_SUFFIX
+
+
+def _onnx_dir(model_id: str, settings: Dict[str, Any]) -> str:
+    """
+    获取模型按量化方式导出的目录
+
+    Args:
+        model_id (str): 本地模型目录或ModelScope模型ID
+        settings (Dict[str, Any]): model.embedding.onnx配置
+
+    Returns:
+        str: 导出目录
+    """
+    return os.path.join(
+        settings["path"], os.path.basename(os.path.normpath(model_id)), settings["quantize"]
+    )
+
+
+def load_onnx_embedding(
+    model_id: str, settings: Dict[str, Any], batch_size: int = 32, retry_failed: bool = False
+) -> OnnxEmbeddings:
+    """
+    加载ONNX句向量模型，尚未导出时先导出并与PyTorch向量比较，导出或校验失败时删除导出结果、
+    写入失败记录并抛出异常。存在失败记录时不再导出，直接抛出异常，删除记录或以retry_failed=True调用可重新导出
+
+    Args:
+        model_id (str): 本地模型目录或ModelScope模型ID
+        settings (Dict[str, Any]): model.embedding.onnx配置
+        batch_size (int): 每次推理的文本数
+        retry_failed (bool): 是否忽略失败记录重新导出
+
+    Returns:
+        OnnxEmbeddings: ONNX句向量模型
+
+    Raises:
+        RuntimeError: 之前导出失败过，或导出结果与PyTorch向量的误差超出容差
+    """
+    quantized = settings["quantize"] == "int8"
+    onnx_dir = _onnx_dir(model_id, settings)
+    verify_file = os.path.join(onnx_dir, _VERIFY_FILE)
+    failed_path = _failed_file(model_id, settings)
+
+    def load(max_length: int) -> OnnxEmbeddings:
+        return OnnxEmbeddings(
+            onnx_dir,
+            quantized=quantized,
+            intra_op_threads=settings["intra-op-threads"],
+            max_length=max_length,
+            batch_size=batch_size,
+        )
+
+    if os.path.exists(verify_file):
+        with open(verify_file, "r", encoding="utf-8") as f:
+            verified = json.load(f)
+        # 没有记录截断长度的校验结果来自旧版本，需要重新导出校验
+        if verified.get("passed") and "max_length" in verified:
+            return load(verified["max_length"])
+
+    if os.path.exists(failed_path) and not retry_failed:
+        # 之前导出或校验失败过，每次启动都重新导出只会再次失败并拖慢启动
+        raise RuntimeError(f"ONNX导出此前已失败，删除 {failed_path} 后重新尝试")
+
+    # 第一次使用：导出并与PyTorch向量比较
+    from langchain_community.embeddings import ModelScopeEmbeddings
+
+    model_dir = resolve_model_dir(model_id)
+    try:
+        max_length = pipeline_max_length(model_dir)
+        export_onnx(model_dir, onnx_dir, quantize=quantized)
+        embedding = load(max_length)
+        result = verify(
+            ModelScopeEmbeddings(model_id=model_dir), embedding, float(settings["verify-tolerance"])
+        )
+        result["max_length"] = max_length
+        print(f"ONNX句向量校验结果: {result}")
+        if not result["passed"]:
+            raise RuntimeError(
+                f"ONNX句向量与PyTorch的最大余弦距离 {result['max_distance']:.4f} 超出容差 {result['tolerance']}"
+            )
+    except Exception as e:
+        shutil.rmtree(onnx_dir, ignore_errors=True)
+        os.makedirs(os.path.dirname(failed_path), exist_ok=True)
+        with open(failed_path, "w", encoding="utf-8") as f:
+            json.dump({"error": str(e), "failed_at": time.time()}, f, ensure_ascii=False, indent=2)
+        raise
+    if os.path.exists(failed_path):
+        os.remove(failed_path)
+    with open(verify_file, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return embedding
+
+
+if __name__ == "__main__":
+    # 按配置导出嵌入模型并校验，手动运行时忽略之前的失败记录
+    from config.config import Config
+    from env import get_app_root
+
+    config = Config.get_instance()
+    onnx_settings = dict(config.get_with_nested_params("model", "embedding", "onnx"))
+    onnx_settings["path"] = os.path.join(get_app_root(), onnx_settings["path"])
+    load_onnx_embedding(
+        os.path.join(
+            config.get_with_nested_params("model", "embedding", "model-path"),
+            config.get_with_nested_params("model", "embedding", "model-name"),
+        ),
+        onnx_settings,
+        retry_failed=True,
+    )
@@ -0,0 +1,92 @@
+"""
+查询向量缓存模块
+在内存中按规范化的查询文本缓存查询向量，常见问题重复提问时跳过嵌入模型
+"""
+
+# 导入标准库
+import time  # 时间相关功能，用于判断条目是否过期
+import threading  # 线程模块，用于保护缓存的并发访问
+from collections import OrderedDict  # 有序字典，用于实现LRU
+from typing import Dict, List, Tuple  # 类型提示
+
+# 导入项目模块
+from model.embedding.embedding_cache import text_key  # 规范化文本的缓存键
+
+
+class QueryCache(object):
+    """
+    查询向量LRU缓存类
+    条目数超过上限时淘汰最近最少使用的条目，超过有效期的条目视为未命中
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600):
+        """
+        初始化查询向量缓存
+
+        Args:
+            max_entries (int): 最多缓存的查询数
+            ttl_seconds (float): 条目有效期（秒），不大于0时永不过期
+        """
+        self._max_entries = max(1, int(max_entries))
+        self._ttl = float(ttl_seconds)
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()  # 键 -> (写入时间, 向量)
+        self._lock = threading.Lock()  # 保护缓存的锁
+        self._hits = 0  # 命中次数
+        self._misses = 0  # 未命中次数
+        self._evictions = 0  # 淘汰次数
+
+    def get(self, text: str) -> List[float] | None:
+        """
+        查询缓存
+
+        Args:
+            text (str): 查询文本
+
+        Returns:
+            List[float] | None: 查询向量，未命中或已过期时返回None
+        """
+        key = text_key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._ttl > 0 and time.time() - entry[0] > self._ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, text: str, vector: List[float]):
+        """
+        写入缓存，超过上限时淘汰最近最少使用的条目
+
+        Args:
+            text (str): 查询文本
+            vector (List[float]): 查询向量
+        """
+        key = text_key(text)
+        with self._lock:
+            self._entries[key] = (time.time(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict[str, float]: 命中次数、未命中次数、命中率、条目数和淘汰数
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,141 @@
+"""
+重排序模型类
+使用本地CPU上的交叉编码器为(问题, 文档片段)打分，所有候选在一个批次内完成打分；
+模型在后台线程中加载，加载完成前请求按原检索顺序返回，不会等待模型下载
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于拼接模型路径
+import time  # 时间相关功能，用于限制加载失败后的重试频率
+import threading  # 线程模块，保证模型只加载一次并在后台加载
+from typing import List  # 类型提示
+
+# 导入项目模块
+from model.model_base import Modelbase, ModelStatus  # 模型基类和状态枚举
+from config.config import Config  # 配置管理器，用于读取配置信息
+
+# 加载失败后重新尝试加载的最小间隔（秒）
+_RETRY_SECONDS = 60
+
+
+class Rerankmodel(Modelbase):
+    """
+    重排序模型类
+    第一次打分时才加载交叉编码器，未启用重排序时不占用内存
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        初始化重排序模型
+        """
+        super().__init__(*args, **kwargs)
+        config = Config.get_instance()
+        # 从配置中获取重排序模型的下载路径、名称和最大输入长度
+        self._model_download_path = config.get_with_nested_params("model", "rerank", "model-path")
+        self._model_name = config.get_with_nested_params("model", "rerank", "model-name")
+        self._max_length = config.get_with_nested_params("model", "rerank", "max-length")
+        self._lock = threading.Lock()
+        self._tokenizer = None
+        self._model = None
+        self._last_failure = 0.0  # 上次加载失败的时间，用于限制重试频率
+        self._model_status = ModelStatus.INITIAL
+
+    def build(self):
+        """
+        加载交叉编码器，本地不存在时从modelscope下载；上次加载失败且未超过重试间隔时不再尝试
+        """
+        with self._lock:
+            if self._model_status == ModelStatus.READY or not self._can_retry():
+                return
+            self._model_status = ModelStatus.BUILDING
+            try:
+                # 延迟导入，未启用重排序时不加载这些依赖
+                import torch
+                from modelscope.hub.snapshot_download import snapshot_download
+                from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+                model_path = os.path.join(self._model_download_path, self._model_name)
+                if not os.path.exists(model_path):
+                    model_path = snapshot_download(
+                        self._model_name, cache_dir=self._model_download_path
+                    )
+                self._tokenizer = AutoTokenizer.from_pretrained(model_path)
+                self._model = AutoModelForSequenceClassification.from_pretrained(model_path)
+                self._model.eval()
+                self._torch = torch
+            except Exception as e:
+                print(f"加载重排序模型失败，{_RETRY_SECONDS} 秒内不再尝试: {e}")
+                self._last_failure = time.time()
+                self._model_status = ModelStatus.FAILED
+                return
+            self._model_status = ModelStatus.READY
+
+    def _can_retry(self) -> bool:
+        """
+        判断是否可以尝试加载：从未失败过，或距上次失败已超过重试间隔
+
+        Returns:
+            bool: 是否可以尝试加载
+        """
+        return (
+            self._model_status != ModelStatus.FAILED
+            or time.time() - self._last_failure >= _RETRY_SECONDS
+        )
+
+    def warm_up(self):
+        """
+        在后台线程中加载交叉编码器，已就绪、正在加载或未到重试时间时直接返回
+        """
+        if self._model_status in (ModelStatus.READY, ModelStatus.BUILDING) or not self._can_retry():
+            return
+        if self._lock.locked():
+            return
+        threading.Thread(target=self.build, name="rerank-warm-up", daemon=True).start()
+
+    def count_tokens(self, text: str) -> int:
+        """
+        统计文本的token数，用于控制提示词的token预算
+
+        Args:
+            text (str): 文本
+
+        Returns:
+            int: token数，模型不可用时按字符数估计
+        """
+        if self._tokenizer is None:
+            return len(text)
+        return len(self._tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def score(self, query: str, passages: List[str]) -> List[float] | None:
+        """
+        在一个批次内为所有(问题, 文档片段)对打分
+
+        Args:
+            query (str): 用户问题
+            passages (List[str]): 候选文档片段
+
+        Returns:
+            List[float] | None: 与候选一一对应的相关性得分，模型尚未加载完成或不可用时返回None
+        """
+        if self._model_status != ModelStatus.READY:
+            # 请求不等待模型下载和加载，在后台加载后再对之后的请求生效
+            self.warm_up()
+            return None
+        if not passages:
+            return None
+
+        inputs = self._tokenizer(
+            [query] * len(passages),
+            passages,
+            padding=True,
+            truncation="only_second",
+            max_length=self._max_length,
+            return_tensors="pt",
+        )
+        with self._torch.inference_mode():
+            logits = self._model(**inputs).logits.view(-1).float()
+        return logits.tolist()
+
+
+# 创建Rerankmodel类的单例实例
+INSTANCE = Rerankmodel()
@@ -0,0 +1,55 @@
+"""
+重排序服务模块
+对检索到的候选文档重新排序，并在token预算内选出最相关的文档
+"""
+
+# 导入标准库
+from typing import List  # 类型提示
+
+# 导入第三方库
+from langchain_core.documents import Document  # 文档类
+
+# 导入项目模块
+from config.config import Config  # 配置管理器，用于读取重排序配置
+from model.rerank.rerank_model import INSTANCE  # 重排序模型实例
+
+
+def warm_up():
+    """
+    启用重排序时在后台预先加载交叉编码器，首批请求无需等待模型加载
+    """
+    if Config.get_instance().get_with_nested_params("model", "rerank", "enabled"):
+        INSTANCE.warm_up()
+
+
+def rerank(query: str, docs: List[Document], top_n: int, max_tokens: int) -> List[Document]:
+    """
+    用交叉编码器为候选文档打分，按得分从高到低选出最多top_n个文档，且总token数不超过max_tokens
+
+    Args:
+        query (str): 用户问题
+        docs (List[Document]): 候选文档
+        top_n (int): 最多保留的文档数
+        max_tokens (int): 保留文档的总token预算
+
+    Returns:
+        List[Document]: 重排序后保留的文档，模型不可用时按原检索顺序选取
+    """
+    scores = INSTANCE.score(query, [doc.page_content for doc in docs])
+    if scores is not None:
+        ranked = [doc for _, doc in sorted(zip(scores, docs), key=lambda item: item[0], reverse=True)]
+    else:
+        ranked = list(docs)
+
+    selected = []
+    used_tokens = 0
+    for doc in ranked:
+        if len(selected) >= top_n:
+            break
+        tokens = INSTANCE.count_tokens(doc.page_content)
+        # 超出预算的文档跳过，但至少保留得分最高的一个
+        if selected and used_tokens + tokens > max_tokens:
+            continue
+        selected.append(doc)
+        used_tokens += tokens
+    return selected
@@ -0,0 +1,272 @@
+"""
+语义答案缓存模块
+对知识库问答和普通文本问答的回答进行缓存，新问题与已回答问题的向量相似度超过阈值时直接以流式方式重放已有回答
+缓存按问题类型和知识库版本划分，知识库重新构建后旧版本的回答不再命中
+"""
+
+# 导入标准库
+import os  # 操作系统接口模块，用于拼接嵌入模型路径
+import time  # 时间相关功能，用于判断条目是否过期
+import threading  # 线程模块，用于保护缓存的并发访问
+from types import SimpleNamespace  # 简单对象，用于构造与流式回复结构相同的分块
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple  # 类型提示
+
+# 导入第三方库
+import numpy as np  # 数值计算库，用于计算余弦相似度
+
+# 导入项目模块
+from config.config import Config  # 配置管理器，用于读取配置信息
+from model.embedding.embedding_model import get_embedding  # 嵌入模型，与知识库共用查询向量缓存
+
+# 重放回答时每个分块的字符数
+_REPLAY_CHARS = 16
+
+
+class AnswerCache(object):
+    """
+    语义答案缓存类
+    每个(问题类型, 知识库版本)一个分区，分区内按余弦相似度查找最接近的已回答问题
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 86400, max_entries: int = 5000):
+        """
+        初始化语义答案缓存
+
+        Args:
+            threshold (float): 命中所需的最小余弦相似度
+            ttl_seconds (float): 条目有效期（秒），不大于0时永不过期
+            max_entries (int): 每个分区最多缓存的回答数，超过时淘汰最早写入的回答
+        """
+        self._threshold = float(threshold)
+        self._ttl = float(ttl_seconds)
+        self._max_entries = max(1, int(max_entries))
+        self._partitions: Dict[str, Tuple[str, List[Tuple[float, np.ndarray, str]]]] = {}  # 问题类型 -> (知识库版本, [(写入时间, 单位向量, 回答)])
+        self._retired: Set[str] = set()  # 已被替换的知识库版本，这些版本的查询和写入不再改变分区
+        self._lock = threading.Lock()  # 保护缓存的锁
+        self._hits = 0  # 命中次数
+        self._misses = 0  # 未命中次数
+
+    def _entries(
+        self, intent: str, version: str, switch: bool
+    ) -> List[Tuple[float, np.ndarray, str]] | None:
+        """
+        获取分区中的有效条目，需在持有_lock时调用。
+        只有查询可以把分区切换到新的知识库版本，被替换的版本不会再被切换回来；
+        知识库重建前开始的请求在重建后才写入时，其版本与分区不一致，回答被丢弃，不会清空新版本的分区
+
+        Args:
+            intent (str): 问题类型
+            version (str): 知识库版本
+            switch (bool): 版本与分区不一致时是否清空分区并切换到该版本
+
+        Returns:
+            List[Tuple[float, np.ndarray, str]] | None: 分区中未过期的条目，版本不一致且不切换时返回None
+        """
+        if version in self._retired:
+            return None
+        partition = self._partitions.get(intent)
+        if partition is not None and partition[0] != version:
+            if not switch:
+                return None
+            self._retired.add(partition[0])
+            partition = None
+        if partition is None:
+            partition = (version, [])
+            self._partitions[intent] = partition
+        entries = partition[1]
+        if self._ttl > 0:
+            deadline = time.time() - self._ttl
+            entries[:] = [entry for entry in entries if entry[0] >= deadline]
+        return entries
+
+    def get(self, intent: str, version: str, vector: np.ndarray) -> str | None:
+        """
+        查找与问题向量最相似的已有回答
+
+        Args:
+            intent (str): 问题类型
+            version (str): 知识库版本
+            vector (np.ndarray): 问题的单位向量
+
+        Returns:
+            str | None: 相似度超过阈值的回答，未命中时返回None
+        """
+        with self._lock:
+            entries = self._entries(intent, version, switch=True)
+            if entries:
+                scores = np.stack([entry[1] for entry in entries]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self._threshold:
+                    self._hits += 1
+                    return entries[best][2]
+            self._misses += 1
+            return None
+
+    def put(self, intent: str, version: str, vector: np.ndarray, answer: str):
+        """
+        写入回答，知识库版本与分区当前版本不一致时丢弃
+
+        Args:
+            intent (str): 问题类型
+            version (str): 知识库版本
+            vector (np.ndarray): 问题的单位向量
+            answer (str): 完整回答
+        """
+        with self._lock:
+            entries = self._entries(intent, version, switch=False)
+            if entries is None:
+                return
+            entries.append((time.time(), vector, answer))
+            del entries[: max(0, len(entries) - self._max_entries)]
+
+    def clear(self):
+        """
+        清空全部缓存
+        """
+        with self._lock:
+            self._partitions.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict[str, float]: 命中次数、未命中次数、命中率和条目数
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "entries": sum(len(entries) for _, entries in self._partitions.values()),
+            }
+
+
+def replay(answer: str) -> Iterator[SimpleNamespace]:
+    """
+    把已缓存的回答切成小段，按流式回复的结构逐段返回，调用方与处理真实流式回复的代码相同
+
+    Args:
+        answer (str): 完整回答
+
+    Yields:
+        SimpleNamespace: 具有 choices[0].delta.content 结构的分块
+    """
+    for i in range(0, len(answer), _REPLAY_CHARS):
+        delta = SimpleNamespace(content=answer[i : i + _REPLAY_CHARS])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def record(stream: Iterable, on_complete: Callable[[str], None]) -> Iterator:
+    """
+    原样转发流式回复，并在回复完整结束后把拼接的回答交给on_complete，中途出错或被中断时不写入缓存
+
+    Args:
+        stream (Iterable): 大模型的流式回复
+        on_complete (Callable[[str], None]): 回复结束后的回调
+
+    Yields:
+        流式回复的分块
+    """
+    parts = []
+    for chunk in stream:
+        if chunk.choices:
+            parts.append(chunk.choices[0].delta.content or "")
+        yield chunk
+    answer = "".join(parts)
+    if answer:
+        on_complete(answer)
+
+
+_cache = None  # 全局语义答案缓存，首次使用时创建
+_lock = threading.Lock()
+
+
+def _get_cache(settings: Dict) -> AnswerCache:
+    """
+    获取全局语义答案缓存
+
+    Args:
+        settings (Dict): 语义答案缓存配置
+
+    Returns:
+        AnswerCache: 语义答案缓存
+    """
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = AnswerCache(
+                settings["threshold"], settings["ttl-seconds"], settings["max-entries"]
+            )
+        return _cache
+
+
+def _embed_question(question: str) -> np.ndarray:
+    """
+    用知识库的嵌入模型把问题编码为单位向量
+
+    Args:
+        question (str): 用户问题
+
+    Returns:
+        np.ndarray: 单位向量
+    """
+    config = Config.get_instance()
+    embedding = get_embedding(
+        os.path.join(
+            config.get_with_nested_params("model", "embedding", "model-path"),
+            config.get_with_nested_params("model", "embedding", "model-name"),
+        )
+    )
+    vector = np.asarray(embedding.embed_query(question), dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+def cached_stream(
+    intent: str,
+    question: str,
+    history: List[List | None] | None,
+    generate: Callable[[], Iterable],
+    version: str = "",
+) -> Iterable:
+    """
+    带语义缓存的流式回答。未启用缓存或对话已有上文时直接调用generate，
+    命中时重放缓存的回答，未命中时转发generate的流式回复并在结束后写入缓存
+
+    Args:
+        intent (str): 问题类型
+        question (str): 用户问题
+        history (List[List | None] | None): 对话历史，已有回复的多轮对话答案依赖上文，不使用缓存
+        generate (Callable[[], Iterable]): 生成流式回复的函数
+        version (str): 知识库版本，知识库问答传入当前索引版本
+
+    Returns:
+        Iterable: 流式回复或重放的分块
+    """
+    settings = Config.get_instance().get_with_nested_params("model", "answer-cache")
+    if not settings["enabled"] or any(turn and turn[1] for turn in history or []):
+        return generate()
+
+    cache = _get_cache(settings)
+    try:
+        vector = _embed_question(question)
+    except Exception as e:
+        print(f"语义答案缓存嵌入问题失败，跳过缓存: {e}")
+        return generate()
+
+    answer = cache.get(intent, version, vector)
+    if answer is not None:
+        print(f"语义答案缓存命中，命中率 {cache.stats()['hit_rate']:.1%}")
+        return replay(answer)
+    return record(generate(), lambda text: cache.put(intent, version, vector, text))
+
+
+def answer_cache_stats() -> Dict[str, float]:
+    """
+    获取语义答案缓存统计
+
+    Returns:
+        Dict[str, float]: 缓存统计，尚未使用缓存时为空字典
+    """
+    return {} if _cache is None else _cache.stats()
@@ -18,6 +18,8 @@ from ppt_docx.ppt_content import generate_ppt_content  # PPT内容生成函数
 from ppt_docx.docx_generation import generate_docx_content as generate_docx  # Word文档生成函数，用于创建Word文件
 from ppt_docx.docx_content import generate_docx_content  # Word内容生成函数，用于生成Word内容文本
 from rag import rag_chain  # RAG链，用于检索增强生成
+from model.RAG.retrieve_model import get_instance as get_retrieve_model  # 知识库检索模型，用于获取索引版本
+from question_answer.answer_cache import cached_stream  # 语义答案缓存，相似问题直接重放已有回答
 from audio.audio_extract import (  # 音频相关处理函数
     extract_text,  # 从问题中提取需要转换为语音的文本
     extract_language,  # 从问题中提取目标语言类型
@@ -176,8 +178,13 @@ def process_text_tool(
     Returns:
         tuple: 包含响应和问题类型的元组
     """
-    # 调用客户端获取响应，使用流式方式与AI模型交互
-    response = Clientfactory().get_client().chat_with_ai_stream(question, history)
+    # 调用客户端获取响应，使用流式方式与AI模型交互，启用语义答案缓存时相似问题直接重放已有回答
+    response = cached_stream(
+        question_type.name,
+        question,
+        history,
+        lambda: Clientfactory().get_client().chat_with_ai_stream(question, history),
+    )
     # 返回响应和问题类型的元组
     return (response, question_type)
 
@@ -200,8 +207,14 @@ def RAG_tool(
     Returns:
         tuple: 包含响应和问题类型的元组
     """
-    # 先利用question去检索得到docs，调用RAG链处理问题
-    response = rag_chain.invoke(question, history)
+    # 先利用question去检索得到docs，调用RAG链处理问题；缓存按知识库版本划分，知识库重建后旧回答失效
+    response = cached_stream(
+        question_type.name,
+        question,
+        history,
+        lambda: rag_chain.invoke(question, history),
+        version=str(get_retrieve_model().index_version),
+    )
     # 返回响应和问题类型的元组
     return (response, question_type)
 
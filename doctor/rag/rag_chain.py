@@ -17,13 +17,16 @@ from openai.types.chat import ChatCompletionChunk
 from client.clientfactory import Clientfactory
 
 
-def invoke(question: str, history: List[List]) -> Stream[ChatCompletionChunk]:
+def invoke(
+    question: str, history: List[List], user_id: str | None = None
+) -> Stream[ChatCompletionChunk]:
     """
     调用RAG链处理问答
     
     Args:
         question (str): 用户提出的问题
         history (List[List]): 对话历史记录，每个元素是包含[用户消息, AI回复]的列表
+        user_id (str | None): 用户ID，为None时检索公共知识库
         
     Returns:
         Stream[ChatCompletionChunk]: 流式响应对象，包含AI的回答
@@ -31,7 +34,7 @@ def invoke(question: str, history: List[List]) -> Stream[ChatCompletionChunk]:
     try:
         # 尝试检索与问题相关的文档和上下文
         docs, _context = retrieve_docs(
-            question
+            question, user_id=user_id
         )  # 此处得到的是检索到的文件片段和文件处理后的文本
     except Exception as e:
         # 如果检索过程中出现异常，将上下文设置为空字符串
@@ -1,8 +1,11 @@
 # 该文件实现了文档检索功能，用于从知识库中检索与用户问题相关的文档
 # 并将检索到的文档格式化为文本形式供后续处理
 
-# 从typing模块导入List和Tuple类型，用于类型注解
-from typing import List, Tuple
+# 从time模块导入perf_counter，用于统计各阶段耗时
+from time import perf_counter
+
+# 从typing模块导入List、Tuple和Dict类型，用于类型注解
+from typing import Any, List, Tuple, Dict
 
 # 从langchain_core.documents模块导入Document类，用于表示文档对象
 from langchain_core.documents import Document
@@ -10,6 +13,12 @@ from langchain_core.documents import Document
 # 从model.RAG.retrieve_service模块导入retrieve函数，用于实际执行文档检索操作
 from model.RAG.retrieve_service import retrieve
 
+# 从model.rerank.rerank_service模块导入rerank函数，用于对候选文档重排序
+from model.rerank.rerank_service import rerank
+
+# 从config.config模块导入Config类，用于读取重排序配置
+from config.config import Config
+
 
 def format_docs(docs: List[Document]) -> str:
     """
@@ -25,24 +34,56 @@ def format_docs(docs: List[Document]) -> str:
     return "\n-------------分割线--------------\n".join(doc.page_content for doc in docs)
 
 
-def retrieve_docs(question: str) -> Tuple[List[Document], str]:
+def retrieve_docs(
+    question: str,
+    timings: Dict[str, float] | None = None,
+    user_id: str | None = None,
+    filter: Dict[str, Any] | None = None,
+) -> Tuple[List[Document], str]:
     """
-    检索与问题相关的文档并返回文档列表和格式化后的文本
+    检索与问题相关的文档并返回文档列表和格式化后的文本。
+    启用重排序时先召回更多候选，再用交叉编码器重排序，只把token预算内最相关的文档放入提示词
     
     Args:
         question (str): 用户提出的问题
+        timings (Dict[str, float] | None): 传入字典时写入各阶段耗时（毫秒）
+        user_id (str | None): 用户ID，为None时检索公共知识库
+        filter (Dict[str, Any] | None): 元数据过滤条件，在向量检索内部生效，只作用于公共知识库
         
     Returns:
         Tuple[List[Document], str]: 包含文档列表和格式化文本的元组
     """
-    # 调用retrieve函数检索与问题相关的文档，返回文档列表
-    docs = retrieve(question)  # 这里的到的是文件
+    # 读取重排序配置
+    rerank_config = Config.get_instance().get_with_nested_params("model", "rerank")
+    timings = {} if timings is None else timings
+    start = perf_counter()
+
+    if rerank_config["enabled"]:
+        # 召回更多候选文档，再重排序选出最相关的几个
+        candidates = retrieve(
+            question, k=rerank_config["candidates"], user_id=user_id, filter=filter
+        )
+        timings["retrieve_ms"] = (perf_counter() - start) * 1000
+        rerank_start = perf_counter()
+        docs = rerank(
+            question,
+            candidates,
+            top_n=rerank_config["top-n"],
+            max_tokens=rerank_config["context-tokens"],
+        )
+        timings["rerank_ms"] = (perf_counter() - rerank_start) * 1000
+    else:
+        # 调用retrieve函数检索与问题相关的文档，返回文档列表
+        docs = retrieve(question, user_id=user_id, filter=filter)  # 这里的到的是文件
+        timings["retrieve_ms"] = (perf_counter() - start) * 1000
     
     # 调用format_docs函数将文档列表格式化为文本形式
     _context = format_docs(docs)  # 这里处理成文本
+    timings["total_ms"] = (perf_counter() - start) * 1000
     
-    # 打印格式化后的文档内容到控制台
+    # 打印格式化后的文档内容和各阶段耗时到控制台
     print(_context)
+    print("检索耗时：" + "，".join(f"{name} {value:.1f}" for name, value in timings.items()))
     
     # 返回包含原始文档列表和格式化文本的元组
-    return (docs, _context)
\ No newline at end of file
+    return (docs, _context)